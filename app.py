@@ -1,10 +1,13 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
 from flask_restful import Api
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.memory import MemoryJobStore
 import os
+import atexit
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import metrics
 
 # 确保logs目录存在
 os.makedirs('logs', exist_ok=True)
@@ -29,7 +32,13 @@ task_logger = logging.getLogger('task_logger')
 task_logger.setLevel(logging.INFO)
 task_handler = RotatingFileHandler('logs/tasks.log', maxBytes=10000, backupCount=3, encoding='utf-8')
 task_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-task_logger.addHandler(task_handler)
+# 任务日志通过队列由后台线程写入文件，任务线程不等待磁盘IO
+task_log_queue = queue.Queue()
+task_logger.addHandler(QueueHandler(task_log_queue))
+task_log_listener = QueueListener(task_log_queue, task_handler, respect_handler_level=True)
+task_log_listener.start()
+atexit.register(task_log_listener.stop)
+metrics.LOG_QUEUE_DEPTH.set_function(task_log_queue.qsize)
 
 # 创建应用
 app = Flask(__name__)
@@ -37,22 +46,68 @@ api = Api(app)
 app.logger.addHandler(app_handler)
 
 # 初始化调度器
+from job_executor import InstrumentedThreadPoolExecutor
+
+executor = InstrumentedThreadPoolExecutor(max_workers=10)
 scheduler = BackgroundScheduler(
     jobstores={
         'default': MemoryJobStore()
+    },
+    executors={
+        'default': executor
     }
 )
-scheduler.start()
+metrics.EXECUTOR_QUEUE_DEPTH.set_function(executor.queue_depth)
+metrics.EXECUTOR_BUSY_THREADS.set_function(executor.busy_threads)
+metrics.EXECUTOR_MAX_THREADS.set(executor.max_workers)
+
+# 任务持久化存储（SQLite），任务定义和调度配置在重启后自动恢复
+from task_store import TaskStore
+
+TASK_DB_PATH = os.environ.get('TASK_DB_PATH', 'data/tasks.db')
+task_store = TaskStore(TASK_DB_PATH)
+atexit.register(task_store.close)
 
 # 导入路由
-from routes import register_routes
+from routes import register_routes, task_manager
+from coordinator import SchedulerCoordinator
 
 register_routes(api, scheduler)
+metrics.MANUAL_RUNS_IN_FLIGHT.set_function(task_manager.manual_executor.in_flight)
+metrics.RESULT_STORE_BYTES.labels('memory').set_function(task_manager.results.memory_bytes)
+metrics.RESULT_STORE_BYTES.labels('disk').set_function(task_manager.results.disk_bytes)
+
+# 多个WSGI工作进程中只有获得调度器锁的进程恢复任务并启动调度器，
+# 其他进程把修改类请求转发给它，读请求使用从数据库加载的只读副本
+SCHEDULER_LOCK_PATH = os.environ.get(
+    'SCHEDULER_LOCK_PATH', os.path.join(os.path.dirname(TASK_DB_PATH) or '.', 'scheduler.lock'))
+# 队列模式下调度器触发时只写入持久化工作队列，由queue_worker.py启动的工作进程执行
+if os.environ.get('TASK_EXECUTION', '').lower() == 'queue':
+    from work_queue import WorkQueue
+
+    work_queue = WorkQueue(os.environ.get('TASK_QUEUE_DB_PATH', 'data/queue.db'))
+    task_manager.set_work_queue(work_queue)
+    metrics.QUEUE_PENDING.set_function(lambda: work_queue.stats()['pending'])
+    metrics.QUEUE_IN_FLIGHT.set_function(lambda: work_queue.stats()['in_flight'])
+    metrics.QUEUE_OLDEST_WAIT.set_function(lambda: work_queue.stats()['oldest_wait'])
+    metrics.QUEUE_THROUGHPUT.set_function(lambda: work_queue.stats()['completed_per_sec'])
+
+# 分片模式下作业由scheduler_node.py启动的调度节点执行
+SCHEDULER_SHARDING = os.environ.get('SCHEDULER_SHARDING', '').lower() in ('1', 'true', 'yes')
+coordinator = SchedulerCoordinator(app, scheduler, task_manager, task_store, SCHEDULER_LOCK_PATH,
+                                   sharded=SCHEDULER_SHARDING)
+coordinator.start()
+atexit.register(coordinator.stop)
 
 # 添加前端页面路由
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Prometheus指标
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+持久化基准测试 - 测量SQLite存储的热重启时间和每次运行的写入开销
+
+用法:
+    python benchmarks/bench_persistence.py --tasks 5000 --groups 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from task_manager import TaskManager
+from task_store import TaskStore
+
+
+def build_fleet(db_path, task_count, group_count):
+    """创建并启动一批任务和任务组，写入数据库"""
+    store = TaskStore(db_path, flush_interval=0.5)
+    scheduler = BackgroundScheduler()
+    scheduler.start(paused=True)
+    manager = TaskManager()
+    manager.set_scheduler(scheduler)
+    manager.set_store(store)
+
+    task_ids = []
+    for i in range(task_count):
+        task_id = manager.create_task(f"bench-{i}", 'hello_world', {'name': str(i)})['id']
+        manager.start_task(task_id, {'interval': 60 + i % 600})
+        task_ids.append(task_id)
+    for i in range(group_count):
+        members = task_ids[i * 3 % task_count:i * 3 % task_count + 3]
+        group_id = manager.create_task_group(f"bench-group-{i}", members)['id']
+        manager.start_task_group(group_id, {'interval': 300})
+    scheduler.shutdown(wait=False)
+    store.close()
+    return manager
+
+
+def measure_restart(db_path):
+    """测量从数据库恢复并重新调度全部作业的耗时"""
+    started = time.perf_counter()
+    store = TaskStore(db_path, flush_interval=0.5)
+    scheduler = BackgroundScheduler()
+    manager = TaskManager()
+    manager.set_scheduler(scheduler)
+    manager.set_store(store)
+    restored = manager.restore()
+    scheduler.start(paused=True)
+    elapsed = time.perf_counter() - started
+    job_count = len(scheduler.get_jobs())
+    scheduler.shutdown(wait=False)
+    return manager, store, restored, job_count, elapsed
+
+
+def measure_run_overhead(manager, store, runs):
+    """测量每次运行更新计数并持久化的开销（含摊销后的批量写入）"""
+    task_ids = list(manager.tasks)
+    started = time.perf_counter()
+    for i in range(runs):
+        task_id = task_ids[i % len(task_ids)]
+        manager.tasks[task_id].run_count += 1
+        manager._persist_task(task_id)
+    enqueue = time.perf_counter() - started
+
+    started = time.perf_counter()
+    written = store.flush()
+    flush = time.perf_counter() - started
+    return enqueue, flush, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite持久化基准测试')
+    parser.add_argument('--tasks', type=int, default=5000, help='任务数量')
+    parser.add_argument('--groups', type=int, default=500, help='任务组数量')
+    parser.add_argument('--runs', type=int, default=20000, help='模拟运行次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+
+        started = time.perf_counter()
+        build_fleet(db_path, args.tasks, args.groups)
+        print(f"创建并持久化 {args.tasks} 个任务、{args.groups} 个任务组: {time.perf_counter() - started:.2f} 秒")
+
+        manager, store, restored, job_count, elapsed = measure_restart(db_path)
+        print(f"热重启: 恢复 {restored['tasks']} 个任务、{restored['task_groups']} 个任务组，"
+              f"重新调度 {job_count} 个作业，耗时 {elapsed * 1000:.1f} 毫秒")
+
+        enqueue, flush, written = measure_run_overhead(manager, store, args.runs)
+        print(f"运行计数写入: {args.runs} 次运行，入队 {enqueue / args.runs * 1e6:.2f} 微秒/次，"
+              f"批量写入 {written} 条记录 {flush * 1000:.1f} 毫秒（摊销 {flush / args.runs * 1e6:.2f} 微秒/次）")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+离线基准测试套件 - 测量TaskManager、调度器、http_request和REST API的吞吐量、延迟和内存峰值
+
+所有测试都在临时目录中进行，不需要启动服务：
+1. 用tracemalloc测量每个任务和任务组占用的内存
+2. 通过TaskManager创建并启动1万个任务和1千个任务组
+3. 用虚拟时钟驱动调度器，在几秒内跑完几十分钟的调度
+4. 对本地HTTP服务执行http_request任务
+5. 生成大体积的合成日志，请求/api/tasks、/api/task-groups和/api/logs
+
+结果与benchmarks/baselines.json中的基线比较，超出容差时以非零状态退出。
+
+用法:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --log-mb 4096          # 使用4GB的合成日志
+    python benchmarks/bench_suite.py --update-baselines     # 用本次结果更新基线
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import apscheduler.executors.base as executor_base
+import apscheduler.schedulers.base as scheduler_base
+from apscheduler.executors.debug import DebugExecutor
+from apscheduler.schedulers.base import BaseScheduler
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+
+def percentiles(samples):
+    """计算p50/p95/p99（最近秩法），单位与输入相同"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'p50': None, 'p95': None, 'p99': None}
+    pick = lambda pct: ordered[max(0, -(-pct * len(ordered) // 100) - 1)]
+    return {'p50': pick(50), 'p95': pick(95), 'p99': pick(99)}
+
+
+def peak_rss_mb():
+    """进程启动以来的内存峰值（MB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return usage / 1024 / 1024 if sys.platform == 'darwin' else usage / 1024
+
+
+class FakeClock:
+    """虚拟时钟，替换APScheduler调度器和执行器中的datetime.now()"""
+
+    def __init__(self, start):
+        self.now = start
+        clock = self
+
+        class FakeDatetime(datetime.datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.now.astimezone(tz) if tz else clock.now.replace(tzinfo=None)
+
+        self._fake = FakeDatetime
+        self._patched = []
+
+    def install(self):
+        for module in (scheduler_base, executor_base):
+            self._patched.append((module, module.datetime))
+            module.datetime = self._fake
+
+    def uninstall(self):
+        for module, original in self._patched:
+            module.datetime = original
+        self._patched = []
+
+
+class FakeClockScheduler(BaseScheduler):
+    """不启动后台线程的调度器，由run_until()按虚拟时钟逐轮处理到期作业"""
+
+    def __init__(self, clock, **options):
+        super().__init__(**options)
+        self.clock = clock
+
+    def wakeup(self):
+        pass
+
+    def shutdown(self, wait=True):
+        # BaseScheduler.shutdown()声明为抽象方法，这里直接使用基类实现
+        super().shutdown(wait)
+
+    def run_until(self, end):
+        """推进虚拟时钟直到end，返回每轮处理的耗时（秒）"""
+        ticks = []
+        while self.clock.now < end:
+            started = time.perf_counter()
+            wait = self._process_jobs()
+            ticks.append(time.perf_counter() - started)
+            if wait is None:
+                break
+            self.clock.now = min(end, self.clock.now + datetime.timedelta(seconds=max(wait, 0.001)))
+        return ticks
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """本地替身HTTP服务，返回固定的JSON响应"""
+
+    body = json.dumps({'status': 'ok', 'items': list(range(50))}).encode()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_memory(manager_class, record_count):
+    """测量每个任务和任务组的内存占用（字节），包括发布给读接口的快照"""
+    manager = manager_class()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        task_ids = [manager.create_task(f"bench-{i}", 'hello_world', {'name': str(i)})['id']
+                    for i in range(record_count)]
+        after_tasks = tracemalloc.get_traced_memory()[0]
+        group_count = record_count // 10
+        for i in range(group_count):
+            manager.create_task_group(f"bench-group-{i}", task_ids[i * 10:i * 10 + 10])
+        after_groups = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    task_bytes = (after_tasks - before) / record_count
+    group_bytes = (after_groups - after_tasks) / group_count
+
+    print(f"[内存] 每个任务约 {task_bytes:.0f} 字节，每个任务组（10个任务）约 {group_bytes:.0f} 字节")
+    return {
+        'memory.task_bytes': task_bytes,
+        'memory.group_bytes': group_bytes,
+    }
+
+
+def bench_fleet(manager, task_count, group_count):
+    """通过TaskManager创建并启动任务和任务组"""
+    started = time.perf_counter()
+    task_ids = [manager.create_task(f"bench-{i}", 'hello_world', {'name': str(i)})['id'] for i in range(task_count)]
+    created = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i, task_id in enumerate(task_ids):
+        manager.start_task(task_id, {'interval': 60 + i % 600})
+    task_started = time.perf_counter() - started
+
+    started = time.perf_counter()
+    group_ids = []
+    for i in range(group_count):
+        offset = i * 3 % task_count
+        group_id = manager.create_task_group(f"bench-group-{i}", task_ids[offset:offset + 3])['id']
+        manager.start_task_group(group_id, {'interval': 300})
+        group_ids.append(group_id)
+    groups = time.perf_counter() - started
+
+    print(f"[任务] 创建 {task_count} 个任务 {created:.2f} 秒，启动 {task_started:.2f} 秒；"
+          f"创建并启动 {group_count} 个任务组 {groups:.2f} 秒")
+    return task_ids, group_ids, {
+        'fleet.create_tasks_per_sec': task_count / created,
+        'fleet.start_tasks_per_sec': task_count / task_started,
+        'fleet.groups_per_sec': group_count / groups,
+    }
+
+
+def bench_scheduler(scheduler, manager, minutes):
+    """用虚拟时钟驱动调度器运行指定的分钟数"""
+    runs_before = sum(task.run_count for task in manager.tasks.values())
+    end = scheduler.clock.now + datetime.timedelta(minutes=minutes)
+    started = time.perf_counter()
+    ticks = scheduler.run_until(end)
+    elapsed = time.perf_counter() - started
+    runs = sum(task.run_count for task in manager.tasks.values()) - runs_before
+    tick_ms = {k: v * 1000 for k, v in percentiles(ticks).items()}
+
+    print(f"[调度] 虚拟时间 {minutes} 分钟，执行 {runs} 次任务，耗时 {elapsed:.2f} 秒（{runs / elapsed:.0f} 次/秒），"
+          f"每轮处理 p50 {tick_ms['p50']:.2f} / p95 {tick_ms['p95']:.2f} / p99 {tick_ms['p99']:.2f} 毫秒")
+    return {
+        'scheduler.runs_per_sec': runs / elapsed,
+        'scheduler.tick_p95_ms': tick_ms['p95'],
+        'scheduler.tick_p99_ms': tick_ms['p99'],
+    }
+
+
+def bench_http(manager, requests_count, concurrency):
+    """对本地替身服务执行http_request任务"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/data'
+    task_ids = [manager.create_task(f"bench-http-{i}", 'http_request', {'url': url})['id'] for i in range(concurrency)]
+
+    def execute(index):
+        started = time.perf_counter()
+        body, status = manager.execute_task_now(task_ids[index % concurrency])
+        if status != 202:
+            raise RuntimeError(body.get('error'))
+        run = manager.run_handles.wait(body['run_id'])
+        if run['status'] != 'success':
+            raise RuntimeError(run.get('error'))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(execute, range(requests_count)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    server.server_close()
+    latency_ms = {k: v * 1000 for k, v in percentiles(latencies).items()}
+
+    print(f"[HTTP] {requests_count} 次请求（并发 {concurrency}），{requests_count / elapsed:.0f} 次/秒，"
+          f"p50 {latency_ms['p50']:.2f} / p95 {latency_ms['p95']:.2f} / p99 {latency_ms['p99']:.2f} 毫秒")
+    return {
+        'http.requests_per_sec': requests_count / elapsed,
+        'http.p50_ms': latency_ms['p50'],
+        'http.p99_ms': latency_ms['p99'],
+    }
+
+
+def write_synthetic_log(path, size_mb, task_ids, group_names):
+    """按任务日志的格式生成指定大小的合成日志"""
+    today = datetime.datetime.now().strftime('%Y-%m-%d')
+    rng = random.Random(42)
+    lines = []
+    for i in range(20000):
+        stamp = f"{today} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d},{i % 1000:03d}"
+        task_id = rng.choice(task_ids)
+        kind = i % 4
+        if kind == 0:
+            lines.append(f"{stamp} - INFO - 正在执行任务: bench (ID: {task_id})\n")
+        elif kind == 1:
+            lines.append(f"{stamp} - INFO - [任务ID: {task_id}] 开始执行HTTP请求: GET http://127.0.0.1/data\n")
+        elif kind == 2:
+            lines.append(f"{stamp} - INFO - [任务ID: {task_id}] HTTP请求完成: 状态码 200, 耗时 0.01 秒\n")
+        else:
+            lines.append(f"{stamp} - INFO - 开始执行任务组: {rng.choice(group_names)}\n")
+    block = ''.join(lines).encode('utf-8')
+
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, 'wb') as f:
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def bench_api(app, task_ids, group_ids, log_mb, list_rounds, log_rounds):
+    """请求任务列表、任务组列表和日志接口"""
+    # 停止任务日志写入，避免合成日志被滚动
+    task_logger = logging.getLogger('task_logger')
+    for handler in list(task_logger.handlers):
+        task_logger.removeHandler(handler)
+        handler.close()
+
+    from routes import task_manager
+    group_names = [task_manager.task_groups[group_id].name for group_id in group_ids]
+    started = time.perf_counter()
+    size = write_synthetic_log(os.path.join('logs', 'tasks.log'), log_mb, task_ids, group_names)
+    print(f"[API] 生成 {size / 1024 / 1024:.0f} MB 合成日志，耗时 {time.perf_counter() - started:.2f} 秒")
+
+    client = app.test_client()
+    endpoints = [
+        ('tasks', '/api/tasks', list_rounds),
+        ('task_groups', '/api/task-groups', list_rounds),
+        ('logs', '/api/logs?lines=100', log_rounds),
+        ('task_logs', f'/api/logs/{task_ids[0]}?lines=100', log_rounds),
+        ('group_logs', f'/api/logs/{group_ids[0]}?lines=100', log_rounds),
+    ]
+    results = {}
+    for name, url, rounds in endpoints:
+        latencies = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} 返回 {response.status_code}")
+        latency_ms = {k: v * 1000 for k, v in percentiles(latencies).items()}
+        print(f"[API] {url}: {rounds} 次，p50 {latency_ms['p50']:.1f} / p95 {latency_ms['p95']:.1f} 毫秒，"
+              f"响应 {len(response.data) / 1024:.0f} KB")
+        results[f'api.{name}_p50_ms'] = latency_ms['p50']
+        results[f'api.{name}_p95_ms'] = latency_ms['p95']
+    return results
+
+
+def compare_with_baselines(results, baselines, tolerance):
+    """与基线比较，名称以_per_sec结尾的指标越大越好，其余越小越好
+
+    Returns:
+        超出容差的指标说明列表
+    """
+    regressions = []
+    for name, baseline in baselines.items():
+        value = results.get(name)
+        if value is None or not baseline:
+            continue
+        if name.endswith('_per_sec'):
+            change = (baseline - value) / baseline
+        else:
+            change = (value - baseline) / baseline
+        if change > tolerance:
+            regressions.append(f"{name}: {value:.2f}（基线 {baseline:.2f}，退化 {change:.0%}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TaskManager和REST API离线基准测试')
+    parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    parser.add_argument('--groups', type=int, default=1000, help='任务组数量')
+    parser.add_argument('--memory-records', type=int, default=20000, help='测量内存占用时创建的任务数量')
+    parser.add_argument('--minutes', type=int, default=30, help='虚拟时钟运行的分钟数')
+    parser.add_argument('--http-requests', type=int, default=2000, help='http_request执行次数')
+    parser.add_argument('--concurrency', type=int, default=8, help='http_request并发数')
+    parser.add_argument('--log-mb', type=int, default=256, help='合成日志大小（MB）')
+    parser.add_argument('--list-rounds', type=int, default=10, help='列表接口请求次数')
+    parser.add_argument('--log-rounds', type=int, default=3, help='日志接口请求次数')
+    parser.add_argument('--tolerance', type=float, default=None, help='允许的退化比例，默认使用基线文件中的值')
+    parser.add_argument('--baselines', default=BASELINE_FILE, help='基线文件路径')
+    parser.add_argument('--update-baselines', action='store_true', help='用本次结果覆盖基线')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # 任务日志、性能分析文件等都使用相对路径，切换到临时目录后再导入路由
+        os.chdir(workdir)
+        from flask import Flask
+        from flask_restful import Api
+        from routes import register_routes, task_manager
+        from task_manager import TaskManager
+
+        clock = FakeClock(datetime.datetime.now(datetime.timezone.utc))
+        clock.install()
+        scheduler = FakeClockScheduler(clock, executors={'default': DebugExecutor()})
+        app = Flask(__name__)
+        api = Api(app)
+        register_routes(api, scheduler)
+        scheduler.start()
+
+        results = bench_memory(TaskManager, args.memory_records)
+        try:
+            task_ids, group_ids, fleet = bench_fleet(task_manager, args.tasks, args.groups)
+            results.update(fleet)
+            results.update(bench_scheduler(scheduler, task_manager, args.minutes))
+        finally:
+            scheduler.shutdown(wait=False)
+            clock.uninstall()
+        results.update(bench_http(task_manager, args.http_requests, args.concurrency))
+        results.update(bench_api(app, task_ids, group_ids, args.log_mb, args.list_rounds, args.log_rounds))
+        os.chdir(ROOT_DIR)
+
+    results['process.peak_rss_mb'] = peak_rss_mb()
+    print(f"[内存] 峰值RSS {results['process.peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline_data = {'tolerance': 0.25, 'metrics': {}}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, encoding='utf-8') as f:
+            baseline_data = json.load(f)
+
+    if args.update_baselines:
+        baseline_data['metrics'] = {name: round(value, 3) for name, value in results.items()}
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump(baseline_data, f, indent=2)
+            f.write('\n')
+        print(f"已更新基线: {args.baselines}")
+        return
+
+    tolerance = args.tolerance if args.tolerance is not None else baseline_data.get('tolerance', 0.25)
+    regressions = compare_with_baselines(results, baseline_data.get('metrics', {}), tolerance)
+    if regressions:
+        print(f"以下指标超出基线容差（{tolerance:.0%}）:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"所有指标均在基线容差（{tolerance:.0%}）内")
+
+
+if __name__ == '__main__':
+    main()
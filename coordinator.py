@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+
+import requests
+from flask import Response, request
+from werkzeug.serving import make_server
+
+from sharding import RunReportConsumer
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# 需要转发给调度器主进程处理的请求方法
+MUTATING_METHODS = frozenset(['POST', 'PUT', 'PATCH', 'DELETE'])
+
+# 只保存在主进程内存中、需要转发给主进程的查询（立即执行的运行句柄、运行结果、运行历史和调度延迟，
+# 以及按调度器作业或运行历史计算的触发时间、负载和容量模拟）
+OWNER_ONLY_PATH = re.compile(
+    r'^/api/(runs/[^/]+(/result|/profile)?|schedule(/load|/simulate)?|(tasks|task-groups)/[^/]+/(schedule|runs|lag))$')
+
+
+class FileLock:
+    """非阻塞的进程间文件锁，持有锁的进程退出时由操作系统自动释放"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """尝试获取锁
+
+        Returns:
+            是否获取成功
+        """
+        if self._file is not None:
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class SchedulerCoordinator:
+    """保证多个WSGI工作进程中只有一个进程运行调度器
+
+    所有进程启动时竞争同一个文件锁，获得锁的进程成为主进程：从存储恢复任务、
+    启动调度器，并在本机回环地址上启动内部控制服务，把地址写入主进程信息文件。
+    其他进程作为从进程：修改类请求（POST/PUT/PATCH/DELETE）、/metrics和立即执行的运行状态转发给主进程，
+    读请求直接使用从SQLite加载的只读副本，数据库版本号变化时重新加载（有订阅变更事件的
+    连接时也会定期检查），重新加载时变化的记录推送给本进程的订阅者。
+    从进程定期重试获取锁，主进程退出后由其中一个从进程接管调度。
+    """
+
+    def __init__(self, app, scheduler, task_manager, store, lock_path, sharded=False,
+                 retry_interval=2.0, refresh_interval=0.5, forward_timeout=60):
+        """
+        Args:
+            app: Flask应用
+            scheduler: 调度器（只在主进程中启动）
+            task_manager: 任务管理器
+            store: TaskStore对象
+            lock_path: 锁文件路径，同目录下的.owner文件保存主进程信息
+            sharded: 分片模式，主进程的调度器保持暂停（只用于计算下次运行时间），
+                作业由scheduler_node.py启动的调度节点执行，主进程合并节点上报的运行结果
+            retry_interval: 从进程重试获取锁的间隔（秒）
+            refresh_interval: 从进程检查数据库版本的最小间隔（秒）
+            forward_timeout: 转发请求的超时时间（秒）
+        """
+        self.app = app
+        self.scheduler = scheduler
+        self.task_manager = task_manager
+        self.store = store
+        self.lock = FileLock(lock_path)
+        self.owner_file = os.path.splitext(lock_path)[0] + '.owner'
+        self.retry_interval = retry_interval
+        self.refresh_interval = refresh_interval
+        self.forward_timeout = forward_timeout
+        self.sharded = sharded
+
+        self.is_owner = False
+        self.token = secrets.token_hex(16)
+        self._control_server = None
+        self._report_consumer = None
+        self._owner_info = None
+        self._data_version = None
+        self._last_refresh = 0
+        self._refresh_lock = threading.Lock()
+        self._role_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def start(self):
+        """竞争调度器锁并按结果以主进程或从进程方式运行"""
+        with self._role_lock:
+            if self.lock.acquire():
+                self._become_owner()
+                return
+            self._refresh(force=True)
+        logger.info(f"调度器由其他进程运行，当前进程（PID: {os.getpid()}）作为从进程")
+        threading.Thread(target=self._watch_lock, name='SchedulerLockWatcher', daemon=True).start()
+
+    def stop(self):
+        """停止内部控制服务并释放锁"""
+        self._stopped.set()
+        if self._report_consumer is not None:
+            self._report_consumer.stop()
+            self._report_consumer = None
+        if self._control_server is not None:
+            self._control_server.shutdown()
+            self._control_server = None
+        if self.is_owner:
+            try:
+                os.remove(self.owner_file)
+            except OSError:
+                pass
+            self.lock.release()
+            self.is_owner = False
+
+    def _become_owner(self):
+        self.task_manager.set_store(self.store)
+        self.task_manager.restore()
+        self.scheduler.start(paused=self.sharded)
+        if self.sharded or self.task_manager.work_queue is not None:
+            # 作业由调度节点或队列工作进程执行，运行结果通过上报表合并
+            self._report_consumer = RunReportConsumer(self.task_manager, self.store.db_path)
+            self._report_consumer.start()
+
+        self._control_server = make_server('127.0.0.1', 0, self._control_app, threaded=True)
+        threading.Thread(target=self._control_server.serve_forever, name='SchedulerControlServer', daemon=True).start()
+        owner_info = {
+            'pid': os.getpid(),
+            'url': f'http://127.0.0.1:{self._control_server.server_port}',
+            'token': self.token
+        }
+        temp_file = f'{self.owner_file}.{os.getpid()}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(owner_info, f)
+        os.replace(temp_file, self.owner_file)
+        self.is_owner = True
+        logger.info(f"当前进程（PID: {os.getpid()}）获得调度器锁，内部控制服务: {owner_info['url']}")
+
+    def _watch_lock(self):
+        """从进程定期重试获取锁，主进程退出后接管调度"""
+        while not self._stopped.wait(self.retry_interval):
+            if self.task_manager.events.client_count():
+                # 有浏览器订阅变更事件时定期重新加载，不依赖新的请求触发
+                self._refresh()
+            with self._role_lock:
+                if self.lock.acquire():
+                    logger.info(f"调度器主进程已退出，当前进程（PID: {os.getpid()}）接管调度")
+                    self._become_owner()
+                    return
+
+    def _control_app(self, environ, start_response):
+        """内部控制服务，只接受带有主进程令牌的请求"""
+        if environ.get('HTTP_X_SCHEDULER_TOKEN') != self.token:
+            start_response('403 FORBIDDEN', [('Content-Type', 'application/json')])
+            return [b'{"error": "forbidden"}']
+        return self.app(environ, start_response)
+
+    def _refresh(self, force=False):
+        """数据库版本变化时重新加载只读副本"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._refresh_lock:
+            self._last_refresh = now
+            version = self.store.data_version()
+            if version == self._data_version:
+                return
+            # 每次运行都会写入数据库，这里只重新解析有变化的记录；运行历史只在主进程的内存中
+            # 维护，相关查询转发给主进程
+            self.task_manager.load_snapshot(self.store, include_runs=False, incremental=True)
+            self._data_version = version
+
+    def _load_owner_info(self, reload=False):
+        if self._owner_info is None or reload:
+            try:
+                with open(self.owner_file, encoding='utf-8') as f:
+                    self._owner_info = json.load(f)
+            except (OSError, ValueError):
+                self._owner_info = None
+        return self._owner_info
+
+    def _forward(self):
+        """把当前请求转发给主进程"""
+        headers = {key: value for key, value in request.headers.items()
+                   if key.lower() in ('content-type', 'accept', 'if-none-match', 'range')}
+        response = None
+        # 主进程信息可能已过期（主进程重启或被接管），失败时重新读取一次
+        for reload in (False, True):
+            owner_info = self._load_owner_info(reload)
+            if owner_info is None:
+                continue
+            headers['X-Scheduler-Token'] = owner_info['token']
+            try:
+                response = requests.request(
+                    request.method, owner_info['url'] + request.full_path.rstrip('?'),
+                    data=request.get_data(), headers=headers, timeout=self.forward_timeout
+                )
+                break
+            except requests.exceptions.ConnectionError:
+                continue
+        if response is None:
+            return {'error': '调度器主进程不可用，请稍后重试'}, 503
+
+        if request.method in MUTATING_METHODS:
+            # 主进程在返回前已写入数据库，立即刷新副本以读到自己的修改
+            self._refresh(force=True)
+        excluded = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+        return Response(response.content, status=response.status_code,
+                        headers=[(k, v) for k, v in response.headers.items() if k.lower() not in excluded])
+
+    def _before_request(self):
+        if self.is_owner:
+            return None
+        if request.path.startswith('/api/') and request.method in MUTATING_METHODS or request.path == '/metrics' \
+                or OWNER_ONLY_PATH.match(request.path):
+            return self._forward()
+        if request.path.startswith('/api/'):
+            self._refresh()
+        return None
+
+    def _after_request(self, response):
+        # 主进程处理完修改类请求后立即写入数据库，从进程可以马上读到
+        if self.is_owner and request.method in MUTATING_METHODS and request.path.startswith('/api/'):
+            self.store.flush()
+        return response
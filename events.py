@@ -0,0 +1,135 @@
+import threading
+import time
+
+
+class EventSubscription:
+    """一个客户端的待发送变更
+
+    同一条记录在发送前的多次变更只保留最后一次，待发送的记录数超过上限时
+    丢弃全部待发送变更并标记为需要重置，客户端收到重置事件后重新获取完整列表。
+    这样发送慢的客户端占用的内存有上限，也不会阻塞写入变更的线程。
+    """
+
+    def __init__(self, max_pending):
+        self.max_pending = max_pending
+        self._pending = {}  # (类型, ID) -> (版本号, 操作)，按最后一次变更的先后排列
+        self._reset = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def push(self, version, kind, record_id, op):
+        with self._lock:
+            if self._reset:
+                return
+            key = (kind, record_id)
+            self._pending.pop(key, None)
+            self._pending[key] = (version, op)
+            if len(self._pending) > self.max_pending:
+                self._pending.clear()
+                self._reset = True
+        self._ready.set()
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._reset = True
+        self._ready.set()
+
+    def wait(self, timeout):
+        """等待有待发送的变更
+
+        Returns:
+            是否有待发送的变更（超时返回False）
+        """
+        return self._ready.wait(timeout)
+
+    def drain(self):
+        """取出全部待发送的变更
+
+        Returns:
+            (是否需要重置, [(类型, ID, 版本号, 操作)])
+        """
+        with self._lock:
+            self._ready.clear()
+            pending, self._pending = self._pending, {}
+            reset, self._reset = self._reset, False
+        return reset, [(kind, record_id, version, op) for (kind, record_id), (version, op) in pending.items()]
+
+
+class EventBroadcaster:
+    """把任务和任务组的变更广播给所有订阅的客户端（SSE连接）
+
+    publish()在TaskManager的写锁内调用，只把变更放入每个客户端的待发送集合，
+    不等待网络IO；每个连接的发送线程自己取出变更、生成事件并写入响应。
+    """
+
+    def __init__(self, max_clients=100, max_pending=1000):
+        """
+        Args:
+            max_clients: 最大订阅客户端数
+            max_pending: 每个客户端最多待发送的记录数，超过时改为发送重置事件
+        """
+        self.max_clients = max_clients
+        self.max_pending = max_pending
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """
+        Returns:
+            EventSubscription对象，客户端数已达上限时返回None
+        """
+        with self._lock:
+            if len(self._subscriptions) >= self.max_clients:
+                return None
+            subscription = EventSubscription(self.max_pending)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def client_count(self):
+        return len(self._subscriptions)
+
+    def publish(self, version, kind, record_id, op):
+        """广播一条变更"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(version, kind, record_id, op)
+
+    def reset(self):
+        """通知所有客户端重新获取完整列表（版本号序列更换时）"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.reset()
+
+
+def event_stream(subscription, heartbeat=15, min_interval=0.2):
+    """依次取出一个客户端的待发送变更
+
+    Args:
+        subscription: EventSubscription对象
+        heartbeat: 没有变更时产生(False, [])的间隔（秒），调用方据此发送保持连接的数据，
+            也用于及时发现已断开的连接
+        min_interval: 两次发送之间的最小间隔（秒），期间的变更合并到下一次发送
+
+    Yields:
+        (是否需要重置, [(类型, ID, 版本号, 操作)])
+    """
+    last_sent = 0
+    while True:
+        if not subscription.wait(heartbeat):
+            yield False, []
+            continue
+        delay = min_interval - (time.monotonic() - last_sent)
+        if delay > 0:
+            time.sleep(delay)
+        reset, changes = subscription.drain()
+        if not reset and not changes:
+            continue
+        last_sent = time.monotonic()
+        yield reset, changes
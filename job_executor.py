@@ -0,0 +1,140 @@
+import concurrent.futures
+import datetime
+import threading
+
+from apscheduler.executors.pool import BasePoolExecutor
+
+# 当前线程正在执行的作业的计划触发时间列表（由执行器在调用作业前设置）
+_fire_context = threading.local()
+
+
+def take_scheduled_time():
+    """在作业函数内获取本次执行对应的计划触发时间
+
+    APScheduler按顺序处理一次提交中的多个计划时间，跳过超出容错时间的部分，
+    这里按同样的规则依次取出。
+
+    Returns:
+        计划触发时间（带时区的datetime），不是由调度器触发时返回None
+    """
+    run_times = getattr(_fire_context, 'run_times', None)
+    if not run_times:
+        return None
+    grace_time = _fire_context.grace_time
+    if grace_time is not None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        limit = datetime.timedelta(seconds=grace_time)
+        while len(run_times) > 1 and now - run_times[0] > limit:
+            run_times.pop(0)
+    return run_times.pop(0)
+
+
+class _FireTimeThreadPool(concurrent.futures.ThreadPoolExecutor):
+    """在提交APScheduler作业时附带计划触发时间，并统计排队和执行中的作业数"""
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers)
+        self.queued = 0
+        self.busy = 0
+        self._count_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._count_lock:
+            self.queued += 1
+        return super().submit(self._run_with_fire_times, fn, *args, **kwargs)
+
+    def _run_with_fire_times(self, fn, job, jobstore_alias, run_times, logger_name):
+        """在工作线程中记录本次提交的计划触发时间，然后交给APScheduler执行作业"""
+        with self._count_lock:
+            self.queued -= 1
+            self.busy += 1
+        _fire_context.run_times = list(run_times)
+        _fire_context.grace_time = job.misfire_grace_time
+        try:
+            return fn(job, jobstore_alias, run_times, logger_name)
+        finally:
+            _fire_context.run_times = None
+            with self._count_lock:
+                self.busy -= 1
+
+
+class InstrumentedThreadPoolExecutor(BasePoolExecutor):
+    """线程池执行器，作业函数可以通过take_scheduled_time()获取计划触发时间
+
+    Args:
+        max_workers: 最大线程数
+    """
+
+    def __init__(self, max_workers=10):
+        super().__init__(_FireTimeThreadPool(int(max_workers)))
+        self.max_workers = int(max_workers)
+
+    def queue_depth(self):
+        """等待线程执行的作业数"""
+        return self._pool.queued
+
+    def busy_threads(self):
+        """正在执行作业的线程数"""
+        return self._pool.busy
+
+
+class BoundedExecutor:
+    """有容量上限的线程池，用于立即执行的任务和任务组
+
+    正在执行和排队等待的作业总数达到上限后拒绝新的提交（准入控制），
+    调用方据此返回429，而不是无限制地创建线程或堆积请求。
+
+    Args:
+        max_workers: 最大线程数
+        max_queued: 线程全忙时最多排队的作业数
+        thread_name_prefix: 线程名前缀
+    """
+
+    def __init__(self, max_workers, max_queued, thread_name_prefix=''):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queued
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+
+    def reserve(self):
+        """预留一个位置，之后必须调用submit_reserved()或release()
+
+        Returns:
+            是否预留成功（已满时返回False）
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._count_lock:
+            self._in_flight += 1
+        return True
+
+    def release(self):
+        """释放预留的位置"""
+        with self._count_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit_reserved(self, fn, *args, **kwargs):
+        """在预留的位置上提交作业，作业结束后自动释放位置"""
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    def submit(self, fn, *args, **kwargs):
+        """提交作业
+
+        Returns:
+            Future对象，已满时返回None
+        """
+        if not self.reserve():
+            return None
+        return self.submit_reserved(fn, *args, **kwargs)
+
+    def in_flight(self):
+        """正在执行和排队的作业数"""
+        return self._in_flight
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,268 @@
+import bisect
+import math
+import threading
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标基类，按标签值缓存子指标
+
+    标签值在热路径上只作为元组键使用，格式化推迟到导出时进行。
+    """
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """获取指定标签值对应的子指标（首次访问时创建）"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def collect(self):
+        """生成文本格式的指标行"""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        # +=是读取、相加、写回三步，执行器线程并发自增时不加锁会丢失计数
+        with self.lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}']
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set_function(self, function):
+        """设置在导出时调用的取值函数"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值，也可以在导出时通过回调取值"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}']
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """分桶直方图，导出累计计数、总和与样本数"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(float(bound))}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """导出Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 任务与任务组
+TASK_RUNS = REGISTRY.register(Counter(
+    'taskautorun_task_runs_total', '任务执行次数', ('function', 'status')))
+TASK_DURATION = REGISTRY.register(Histogram(
+    'taskautorun_task_run_duration_seconds', '任务执行耗时', ('function',)))
+GROUP_RUNS = REGISTRY.register(Counter(
+    'taskautorun_group_runs_total', '任务组执行次数', ('status',)))
+GROUP_DURATION = REGISTRY.register(Histogram(
+    'taskautorun_group_run_duration_seconds', '任务组执行耗时'))
+
+# 调度器
+SCHEDULER_LAG = REGISTRY.register(Histogram(
+    'taskautorun_scheduler_lag_seconds', '计划触发时间与实际开始时间之差',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60)))
+SCHEDULER_MISFIRES = REGISTRY.register(Counter(
+    'taskautorun_scheduler_misfires_total', '超出容错时间而错过的执行次数'))
+
+# 执行器
+EXECUTOR_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'taskautorun_executor_queue_depth', '等待线程池执行的作业数'))
+EXECUTOR_BUSY_THREADS = REGISTRY.register(Gauge(
+    'taskautorun_executor_busy_threads', '正在执行作业的线程数'))
+EXECUTOR_MAX_THREADS = REGISTRY.register(Gauge(
+    'taskautorun_executor_max_threads', '线程池大小'))
+
+# 立即执行
+MANUAL_RUNS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'taskautorun_manual_runs_in_flight', '立即执行线程池中正在执行和排队的运行数'))
+MANUAL_RUNS_REJECTED = REGISTRY.register(Counter(
+    'taskautorun_manual_runs_rejected_total', '立即执行线程池已满而被拒绝（429）的请求数', ('type',)))
+
+# 运行结果存储
+RESULT_STORE_BYTES = REGISTRY.register(Gauge(
+    'taskautorun_result_store_bytes', '保存的任务返回值占用的字节数（按压缩后的大小计）', ('tier',)))
+
+# 工作队列（队列模式）
+QUEUE_PENDING = REGISTRY.register(Gauge(
+    'taskautorun_queue_pending', '工作队列中等待执行的运行请求数'))
+QUEUE_IN_FLIGHT = REGISTRY.register(Gauge(
+    'taskautorun_queue_in_flight', '已被工作进程领取、正在执行的运行请求数'))
+QUEUE_OLDEST_WAIT = REGISTRY.register(Gauge(
+    'taskautorun_queue_oldest_wait_seconds', '最早的未完成运行请求已等待的时间'))
+QUEUE_THROUGHPUT = REGISTRY.register(Gauge(
+    'taskautorun_queue_completed_per_second', '最近一分钟每秒完成的运行请求数'))
+
+# HTTP请求
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'taskautorun_http_request_duration_seconds', 'http_request任务的请求耗时', ('host', 'status_code')))
+HTTP_REQUESTS_DEDUPLICATED = REGISTRY.register(Counter(
+    'taskautorun_http_requests_deduplicated_total', '与进行中的相同请求合并、未单独发送的http_request请求数', ('host',)))
+
+# 日志
+LOG_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'taskautorun_log_queue_depth', '等待写入日志文件的记录数'))
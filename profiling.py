@@ -0,0 +1,109 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+
+# 性能分析文件保存目录
+PROFILE_DIR = os.path.join('logs', 'profiles')
+
+# 分析模式 -> 分析文件扩展名
+PROFILE_MODES = {'cpu': '.prof', 'memory': '.txt'}
+
+# cProfile和tracemalloc都是进程级的，同一时间只允许一次分析
+_profile_lock = threading.Lock()
+
+
+def profile_path(run_id, mode, directory=None):
+    """获取运行对应的分析文件路径"""
+    return os.path.join(directory or PROFILE_DIR, f'{run_id}{PROFILE_MODES[mode]}')
+
+
+def find_profile(run_id, directory=None):
+    """查找运行对应的分析文件
+
+    Returns:
+        (文件路径, 分析模式)，不存在时返回(None, None)
+    """
+    for mode in PROFILE_MODES:
+        path = profile_path(run_id, mode, directory)
+        if os.path.exists(path):
+            return path, mode
+    return None, None
+
+
+def run_profiled(mode, func, kwargs, run_id, directory=None, top=50):
+    """在性能分析下执行一次函数，并把结果写入分析文件
+
+    cpu模式使用cProfile，保存为pstats格式（可用snakeviz等工具打开）；
+    memory模式在执行前后各取一次tracemalloc快照，保存峰值内存和按代码行
+    统计的内存增长。函数抛出异常时同样会写入分析文件，异常继续向上抛出。
+
+    Args:
+        mode: 分析模式，cpu或memory
+        func: 要执行的函数
+        kwargs: 函数参数
+        run_id: 运行ID，用作文件名
+        directory: 保存目录，默认为logs/profiles
+        top: memory模式下输出的代码行数
+
+    Returns:
+        (函数返回值, 分析文件路径)
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'不支持的分析模式: {mode}')
+
+    path = profile_path(run_id, mode, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with _profile_lock:
+        if mode == 'cpu':
+            profiler = cProfile.Profile()
+            try:
+                result = profiler.runcall(func, **kwargs)
+            finally:
+                profiler.dump_stats(path)
+            return result, path
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            result = func(**kwargs)
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            _write_memory_report(path, before, after, current, peak, top)
+        return result, path
+
+
+def _write_memory_report(path, before, after, current, peak, top):
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diffs = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'峰值内存: {peak / 1024:.1f} KiB\n')
+        f.write(f'结束时内存: {current / 1024:.1f} KiB\n')
+        f.write(f'按代码行统计的内存增长（前{top}项）:\n')
+        for stat in diffs[:top]:
+            f.write(f'{stat}\n')
+
+
+def cpu_profile_text(path, sort='cumulative', limit=50):
+    """把pstats格式的分析文件转换为文本报告"""
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def remove_profile(path):
+    """删除分析文件（文件不存在时忽略）"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
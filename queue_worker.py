@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+队列工作进程 - 从持久化工作队列领取运行请求并执行
+
+API服务需要以队列模式启动（环境变量TASK_EXECUTION=queue），此时调度器触发时只把
+运行请求写入队列，由工作进程执行：
+
+    python queue_worker.py --processes 4 --threads 8
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+
+from task_manager import TaskManager
+from task_store import TaskStore
+from work_queue import QueueWorker, WorkQueue
+
+
+def run_worker(index, args):
+    """在当前进程中运行一个工作进程"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = TaskStore(args.db)
+    work_queue = WorkQueue(args.queue_db, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    worker = QueueWorker(TaskManager(), store, work_queue, f'{socket.gethostname()}-{os.getpid()}-{index}',
+                         threads=args.threads)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    finally:
+        work_queue.close()
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='队列工作进程')
+    parser.add_argument('--db', default=os.environ.get('TASK_DB_PATH', 'data/tasks.db'), help='共享的任务数据库路径')
+    parser.add_argument('--queue-db', default=os.environ.get('TASK_QUEUE_DB_PATH', 'data/queue.db'), help='工作队列数据库路径')
+    parser.add_argument('--processes', type=int, default=1, help='工作进程数')
+    parser.add_argument('--threads', type=int, default=4, help='每个进程同时执行的请求数')
+    parser.add_argument('--visibility-timeout', type=float, default=300, help='领取后的可见性超时（秒）')
+    parser.add_argument('--max-attempts', type=int, default=3, help='最大执行次数')
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker(0, args)
+        return
+
+    processes = [multiprocessing.Process(target=run_worker, args=(index, args)) for index in range(args.processes)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in processes])
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+import collections
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# 溢出到磁盘的结果文件保存目录
+RESULT_DIR = os.path.join('logs', 'results')
+
+# 结果文件头：是否压缩、序列化后的字节数
+_HEADER = struct.Struct('>?Q')
+
+# 分段读取和解压时每次产生的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 写入结果文件时重新扫描目录的最小间隔（秒），其他进程写入和删除的文件在扫描后计入磁盘用量
+DIRECTORY_SCAN_INTERVAL = 5.0
+
+
+def encode_result(result):
+    """把任务返回值序列化为UTF-8编码的JSON，无法序列化的值转换为字符串"""
+    return json.dumps(result, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _iter_chunks(data):
+    view = memoryview(data)
+    for offset in range(0, len(view), READ_CHUNK_SIZE):
+        yield bytes(view[offset:offset + READ_CHUNK_SIZE])
+
+
+def _iter_file(path, offset, length=None):
+    """从文件的offset处开始按块读取，文件已被删除时不产生数据"""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return
+    with f:
+        f.seek(offset)
+        while length is None or length > 0:
+            chunk = f.read(READ_CHUNK_SIZE if length is None else min(READ_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+def _iter_decompressed(chunks):
+    """逐块解压，每次最多产生READ_CHUNK_SIZE字节，不会一次解压出整个结果"""
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk, READ_CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+            if data:
+                yield data
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def _iter_slice(chunks, start, stop):
+    """从按顺序产生的数据块中截取[start, stop)字节，到达stop后不再读取后面的块"""
+    position = 0
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > start:
+            yield chunk[max(start - position, 0):min(stop, end) - position]
+        if end >= stop:
+            return
+        position = end
+
+
+class StoredResult:
+    """一个已保存的结果，可以按字节范围读取序列化后的JSON"""
+
+    __slots__ = ('run_id', 'size', 'compressed', 'data', 'path')
+
+    def __init__(self, run_id, size, compressed, data=None, path=None):
+        self.run_id = run_id
+        self.size = size  # 序列化后（解压后）的字节数
+        self.compressed = compressed
+        self.data = data  # 保存在内存中的数据（可能已压缩）
+        self.path = path  # 保存在磁盘上时的文件路径
+
+    def iter_range(self, start=0, stop=None):
+        """按块读取序列化后的第start到stop - 1字节
+
+        未压缩的结果直接定位到start读取；压缩的结果需要从头解压，
+        但到达stop后即停止，不会解压后面的数据。
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return iter(())
+        if self.data is not None:
+            if not self.compressed:
+                return _iter_chunks(self.data[start:stop])
+            return _iter_slice(_iter_decompressed(_iter_chunks(self.data)), start, stop)
+        if not self.compressed:
+            return _iter_file(self.path, _HEADER.size + start, stop - start)
+        return _iter_slice(_iter_decompressed(_iter_file(self.path, _HEADER.size)), start, stop)
+
+    def read(self, start=0, stop=None):
+        return b''.join(self.iter_range(start, stop))
+
+
+class ResultStore:
+    """按运行ID保存任务的返回值
+
+    返回值序列化为JSON，超过compress_threshold字节时用zlib压缩。内存中按LRU顺序
+    最多保存memory_limit字节（按压缩后的大小计），超出时把最久未读取的结果写入磁盘；
+    磁盘上最多保存disk_limit字节，超出时删除最早写入的结果文件。
+
+    结果文件名只由运行ID决定，同一目录下其他进程（如队列工作进程）写入的结果
+    也可以按运行ID读取。写入文件时定期重新扫描目录，其他进程的结果文件同样计入磁盘用量
+    并按写入时间参与淘汰，所有共用目录的进程合计不超过disk_limit。
+    """
+
+    def __init__(self, memory_limit=32 * 1024 * 1024, disk_limit=512 * 1024 * 1024,
+                 compress_threshold=4096, directory=None):
+        """
+        Args:
+            memory_limit: 内存中保存的最大字节数，为0时结果直接写入磁盘
+            disk_limit: 磁盘上保存的最大字节数
+            compress_threshold: 序列化后超过该字节数的结果压缩保存
+            directory: 结果文件保存目录，默认为logs/results
+        """
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.compress_threshold = compress_threshold
+        self.directory = directory or RESULT_DIR
+        self._memory = collections.OrderedDict()  # 运行ID -> StoredResult，按最近读取的先后排列
+        self._memory_bytes = 0
+        self._spilling = {}  # 运行ID -> 正在写入磁盘的StoredResult
+        self._disk = collections.OrderedDict()  # 运行ID -> (文件字节数, 写入时间)，按写入的先后排列
+        self._disk_bytes = 0
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+        self._sync_directory()
+
+    def path(self, run_id):
+        return os.path.join(self.directory, f'{run_id}.result')
+
+    def _scan_directory(self):
+        """列出结果目录中的结果文件
+
+        Returns:
+            运行ID -> (文件字节数, 修改时间)，目录不存在时返回空字典
+        """
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.result')]
+        except OSError:
+            return {}
+        files = {}
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            files[name[:-len('.result')]] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def _sync_directory(self):
+        """按目录中实际的文件重建磁盘索引并淘汰超出上限的文件
+
+        加入其他进程（和上次运行）写入的文件，移除已被其他进程删除的文件。
+        扫描开始后本进程写入的文件不在扫描结果中，保留在索引里。
+        """
+        started = time.time()
+        files = self._scan_directory()
+        with self._lock:
+            self._last_scan = started
+            entries = {run_id: entry for run_id, entry in self._disk.items()
+                       if run_id in files or entry[1] >= started}
+            for run_id, entry in files.items():
+                entries.setdefault(run_id, entry)
+            self._disk = collections.OrderedDict(sorted(entries.items(), key=lambda item: item[1][1]))
+            self._disk_bytes = sum(stored_bytes for stored_bytes, _ in self._disk.values())
+            evicted = self._evict_disk()
+        self._remove_files(evicted)
+
+    def put(self, run_id, result):
+        """保存一次运行的返回值
+
+        Returns:
+            序列化后的字节数，无法序列化或超过磁盘上限而未保存时返回None
+        """
+        try:
+            data = encode_result(result)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"无法保存运行 {run_id} 的结果: {e}")
+            return None
+        size = len(data)
+        compressed = size > self.compress_threshold
+        if compressed:
+            data = zlib.compress(data, 6)
+        stored = StoredResult(run_id, size, compressed, data=data)
+
+        if len(data) > self.memory_limit:
+            if _HEADER.size + len(data) > self.disk_limit:
+                return None
+            self._write(stored)
+            return size
+
+        with self._lock:
+            self._memory[run_id] = stored
+            self._memory_bytes += len(data)
+            spilled = []
+            while self._memory_bytes > self.memory_limit:
+                _, oldest = self._memory.popitem(last=False)
+                self._memory_bytes -= len(oldest.data)
+                self._spilling[oldest.run_id] = oldest
+                spilled.append(oldest)
+        # 在锁外写文件，写入期间仍可以从_spilling读取
+        for oldest in spilled:
+            self._write(oldest)
+        return size
+
+    def _write(self, stored):
+        path = self.path(stored.run_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(_HEADER.pack(stored.compressed, stored.size))
+                f.write(stored.data)
+        except OSError as e:
+            logger.warning(f"无法把运行 {stored.run_id} 的结果写入磁盘: {e}")
+            with self._lock:
+                self._spilling.pop(stored.run_id, None)
+            return
+        stored_bytes = _HEADER.size + len(stored.data)
+        with self._lock:
+            self._spilling.pop(stored.run_id, None)
+            previous = self._disk.pop(stored.run_id, None)
+            if previous is not None:
+                self._disk_bytes -= previous[0]
+            self._disk[stored.run_id] = (stored_bytes, time.time())
+            self._disk_bytes += stored_bytes
+            evicted = self._evict_disk()
+            rescan = time.time() - self._last_scan >= DIRECTORY_SCAN_INTERVAL
+        self._remove_files(evicted)
+        if rescan:
+            self._sync_directory()
+
+    def _evict_disk(self):
+        """从磁盘索引中移除最早写入的结果直到不超过上限，需持有锁
+
+        Returns:
+            需要删除的运行ID
+        """
+        evicted = []
+        while self._disk_bytes > self.disk_limit and self._disk:
+            run_id, (stored_bytes, _) = self._disk.popitem(last=False)
+            self._disk_bytes -= stored_bytes
+            evicted.append(run_id)
+        return evicted
+
+    def _remove_files(self, run_ids):
+        for run_id in run_ids:
+            try:
+                os.remove(self.path(run_id))
+            except OSError:
+                pass
+
+    def get(self, run_id):
+        """获取保存的结果
+
+        Returns:
+            StoredResult对象，不存在或已被淘汰时返回None
+        """
+        with self._lock:
+            stored = self._memory.get(run_id)
+            if stored is not None:
+                self._memory.move_to_end(run_id)
+                return stored
+            stored = self._spilling.get(run_id)
+            if stored is not None:
+                return stored
+        path = self.path(run_id)
+        try:
+            with open(path, 'rb') as f:
+                compressed, size = _HEADER.unpack(f.read(_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        return StoredResult(run_id, size, compressed, path=path)
+
+    def __contains__(self, run_id):
+        with self._lock:
+            if run_id in self._memory or run_id in self._spilling or run_id in self._disk:
+                return True
+        return os.path.exists(self.path(run_id))
+
+    def discard(self, run_ids):
+        """删除运行的结果（包括其他进程写入、尚未扫描到的结果文件）"""
+        removed = []
+        with self._lock:
+            for run_id in run_ids:
+                stored = self._memory.pop(run_id, None)
+                if stored is not None:
+                    self._memory_bytes -= len(stored.data)
+                    continue
+                entry = self._disk.pop(run_id, None)
+                if entry is not None:
+                    self._disk_bytes -= entry[0]
+                removed.append(run_id)
+        self._remove_files(removed)
+
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    def disk_bytes(self):
+        return self._disk_bytes
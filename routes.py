@@ -1,8 +1,11 @@
 from flask_restful import Resource, reqparse
-from flask import current_app as app, jsonify, request
+from flask import current_app as app, jsonify, request, Response, send_file
 from task_manager import TaskManager
+from events import event_stream
+from profiling import cpu_profile_text
 import logging
 import inspect
+import json
 import tasks
 import os
 import re
@@ -10,6 +13,39 @@ from datetime import datetime, timedelta
 
 task_manager = TaskManager()
 
+def list_arg(name):
+    """读取逗号分隔的查询参数，未提供时返回None"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def json_or_error(result, etag=None):
+    """列表查询返回JSON响应体时直接作为响应，返回错误时交给flask_restful处理"""
+    if isinstance(result, tuple):
+        return result
+    response = Response(result, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+    return response
+
+def not_modified(etag):
+    """客户端的If-None-Match与当前ETag相同时返回304响应，否则返回None"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def run_submitted(result):
+    """立即执行接口的响应：提交成功时在Location中给出运行状态的地址，线程池已满时带上Retry-After"""
+    body, status = result if isinstance(result, tuple) else (result, 200)
+    if status == 202:
+        return body, 202, {'Location': f"/api/runs/{body['run_id']}"}
+    if status == 429:
+        return body, 429, {'Retry-After': '1'}
+    return body, status
+
 # 任务组API相关类
 class TaskGroupListAPI(Resource):
     def __init__(self):
@@ -21,8 +57,29 @@ class TaskGroupListAPI(Resource):
         super(TaskGroupListAPI, self).__init__()
     
     def get(self):
-        """获取所有任务组列表"""
-        return task_manager.get_all_task_groups()
+        """获取任务组列表（由缓存的JSON片段拼接而成）
+        
+        查询参数:
+            status: 状态，多个用逗号分隔
+            name_prefix: 名称前缀
+            fields: 返回的字段，多个用逗号分隔
+            limit: 每页记录数，不指定时返回全部
+            cursor: 上一页返回的next_cursor
+        """
+        if 'limit' in request.args and request.args.get('limit', type=int) is None:
+            return {'error': 'limit必须是整数'}, 400
+        # 在生成列表之前获取ETag，列表未变化的轮询直接返回304
+        etag = task_manager.list_etag('task_groups')
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return json_or_error(task_manager.query_task_groups(
+            status=list_arg('status'),
+            name_prefix=request.args.get('name_prefix'),
+            fields=list_arg('fields'),
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor')
+        ), etag)
     
     def post(self):
         """创建新任务组"""
@@ -97,6 +154,12 @@ class TaskGroupStartAPI(Resource):
                                 help='运行间隔（秒）')
         self.parser.add_argument('cron', type=str, 
                                 help='Cron表达式 (例如: "*/5 * * * *")')
+        self.parser.add_argument('misfire_policy', type=str, 
+                                help='错过执行时间后的处理策略 (skip, run_once, run_all)')
+        self.parser.add_argument('misfire_grace_time', type=int, 
+                                help='错过执行的容错时间（秒）')
+        self.parser.add_argument('jitter', type=int, 
+                                help='按ID错开触发时间的窗口（秒），0表示不错开')
         super(TaskGroupStartAPI, self).__init__()
     
     def post(self, group_id):
@@ -115,7 +178,33 @@ class TaskGroupExecuteAPI(Resource):
     def post(self, group_id):
         """立即执行任务组"""
         app.logger.info(f"正在立即执行任务组 {group_id}")
-        return task_manager.execute_task_group_now(group_id)
+        return run_submitted(task_manager.execute_task_group_now(group_id))
+
+class TaskGroupRunsAPI(Resource):
+    def get(self, group_id):
+        """获取任务组的运行历史和延迟统计"""
+        limit = request.args.get('limit', default=100, type=int)
+        if group_id not in task_manager.task_groups:
+            return {'error': '任务组不存在'}, 404
+        return task_manager.get_runs(group_id, limit)
+
+class TaskGroupLagAPI(Resource):
+    def get(self, group_id):
+        """获取任务组的调度延迟统计和错过执行次数"""
+        if group_id not in task_manager.task_groups:
+            return {'error': '任务组不存在'}, 404
+        return task_manager.get_schedule_lag(group_id)
+
+class TaskGroupScheduleAPI(Resource):
+    def get(self, group_id):
+        """获取任务组接下来的触发时间
+        
+        参数:
+            count: 返回的触发次数，默认10，最大1000
+        """
+        if group_id not in task_manager.task_groups:
+            return {'error': '任务组不存在'}, 404
+        return task_manager.get_fire_preview(group_id, request.args.get('count', default=10, type=int))
 
 # 原有的任务相关类
 class TaskListAPI(Resource):
@@ -130,8 +219,33 @@ class TaskListAPI(Resource):
         super(TaskListAPI, self).__init__()
     
     def get(self):
-        """获取所有任务列表"""
-        return task_manager.get_all_tasks()
+        """获取任务列表（由缓存的JSON片段拼接而成）
+        
+        查询参数:
+            status: 状态，多个用逗号分隔
+            function: 函数名，多个用逗号分隔
+            name_prefix: 名称前缀
+            group_id: 只返回该任务组中的任务
+            fields: 返回的字段，多个用逗号分隔
+            limit: 每页记录数，不指定时返回全部
+            cursor: 上一页返回的next_cursor
+        """
+        if 'limit' in request.args and request.args.get('limit', type=int) is None:
+            return {'error': 'limit必须是整数'}, 400
+        # 在生成列表之前获取ETag，列表未变化的轮询直接返回304
+        etag = task_manager.list_etag('tasks')
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        return json_or_error(task_manager.query_tasks(
+            status=list_arg('status'),
+            function=list_arg('function'),
+            name_prefix=request.args.get('name_prefix'),
+            group_id=request.args.get('group_id'),
+            fields=list_arg('fields'),
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor')
+        ), etag)
     
     def post(self):
         """创建新任务"""
@@ -184,6 +298,12 @@ class TaskStartAPI(Resource):
                                 help='运行间隔（秒）')
         self.parser.add_argument('cron', type=str, 
                                 help='Cron表达式 (例如: "*/5 * * * *")')
+        self.parser.add_argument('misfire_policy', type=str, 
+                                help='错过执行时间后的处理策略 (skip, run_once, run_all)')
+        self.parser.add_argument('misfire_grace_time', type=int, 
+                                help='错过执行的容错时间（秒）')
+        self.parser.add_argument('jitter', type=int, 
+                                help='按ID错开触发时间的窗口（秒），0表示不错开')
         super(TaskStartAPI, self).__init__()
     
     def post(self, task_id):
@@ -200,9 +320,250 @@ class TaskStopAPI(Resource):
 
 class TaskExecuteAPI(Resource):
     def post(self, task_id):
-        """立即执行任务"""
-        app.logger.info(f"正在立即执行任务 {task_id}")
-        return task_manager.execute_task_now(task_id)
+        """提交立即执行，返回运行ID，通过/api/runs/<run_id>查询结果
+        
+        参数:
+            profile: 性能分析模式，cpu或memory（可选）
+        """
+        profile = request.args.get('profile')
+        app.logger.info(f"正在立即执行任务 {task_id}" + (f"（性能分析: {profile}）" if profile else ""))
+        return run_submitted(task_manager.execute_task_now(task_id, profile))
+
+class RunAPI(Resource):
+    def get(self, run_id):
+        """获取立即执行的运行状态和结果（queued、running、success、error）"""
+        return task_manager.get_run(run_id)
+
+class RunResultAPI(Resource):
+    def get(self, run_id):
+        """获取运行的返回值（JSON）
+        
+        支持单个字节范围的Range请求头分段读取较大的结果，返回206和Content-Range；
+        范围超出结果大小时返回416。
+        """
+        stored = task_manager.results.get(run_id)
+        if stored is None:
+            return {'error': '该运行没有保存的结果或结果已过期'}, 404
+        
+        start, stop, status = 0, stored.size, 200
+        headers = {'Accept-Ranges': 'bytes'}
+        if request.range is not None and len(request.range.ranges) == 1:
+            byte_range = request.range.range_for_length(stored.size)
+            if byte_range is None:
+                return Response(status=416, headers={'Content-Range': f'bytes */{stored.size}'})
+            start, stop = byte_range
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{stop - 1}/{stored.size}'
+        headers['Content-Length'] = str(stop - start)
+        return Response(stored.iter_range(start, stop), status=status, headers=headers,
+                        mimetype='application/json')
+
+class RunProfileAPI(Resource):
+    def get(self, run_id):
+        """下载运行关联的性能分析文件
+        
+        参数:
+            format: cpu分析文件的格式，raw（默认，pstats格式）或text
+            sort: text格式的排序字段，默认cumulative
+        """
+        path = task_manager.run_history.get_profile(run_id)
+        if not path or not os.path.exists(path):
+            return {'error': '该运行没有性能分析文件'}, 404
+        
+        if path.endswith('.prof') and request.args.get('format') == 'text':
+            try:
+                text = cpu_profile_text(path, request.args.get('sort', 'cumulative'))
+            except KeyError as e:
+                return {'error': f"不支持的排序字段: {str(e)}"}, 400
+            return Response(text, mimetype='text/plain; charset=utf-8')
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+
+class TaskRunsAPI(Resource):
+    def get(self, task_id):
+        """获取任务的运行历史和延迟统计
+        
+        参数:
+            limit: 返回的运行记录条数，默认100，0表示全部
+        """
+        limit = request.args.get('limit', default=100, type=int)
+        if task_id not in task_manager.tasks:
+            return {'error': '任务不存在'}, 404
+        return task_manager.get_runs(task_id, limit)
+
+class TaskLagAPI(Resource):
+    def get(self, task_id):
+        """获取任务的调度延迟统计和错过执行次数"""
+        return task_manager.get_schedule_lag(task_id)
+
+class TaskScheduleAPI(Resource):
+    def get(self, task_id):
+        """获取任务接下来的触发时间
+        
+        参数:
+            count: 返回的触发次数，默认10，最大1000
+        """
+        if task_id not in task_manager.tasks:
+            return {'error': '任务不存在'}, 404
+        return task_manager.get_fire_preview(task_id, request.args.get('count', default=10, type=int))
+
+class ScheduleAPI(Resource):
+    def get(self):
+        """获取一段时间内所有任务和任务组的触发时间（按时间排序）
+        
+        参数:
+            from: 开始时间（ISO格式），默认为当前时间
+            to: 结束时间（ISO格式），默认为开始时间后1小时
+            limit: 最多返回的条数，默认1000，最大10000
+        """
+        return task_manager.get_fire_schedule(request.args.get('from'), request.args.get('to'),
+                                              request.args.get('limit', default=1000, type=int))
+
+class ScheduleLoadAPI(Resource):
+    def get(self):
+        """获取接下来一段时间内每个时间段预计的触发次数
+        
+        参数:
+            window: 统计时长（秒），默认3600
+            bucket: 每个时间段的长度（秒），默认1
+        """
+        window = request.args.get('window', default=3600, type=int)
+        bucket = request.args.get('bucket', default=1, type=int)
+        return task_manager.get_schedule_load(window, bucket)
+
+class ScheduleSimulationAPI(Resource):
+    def get(self):
+        """用虚拟时钟模拟当前的调度，估算不同线程池大小下的并发数、排队延迟和错过执行
+        
+        参数:
+            pools: 逗号分隔的线程池大小，默认1,2,4,8,16,32,64
+            hours: 模拟时长（小时），默认24
+            default_duration: 没有运行记录的任务使用的耗时（秒），默认1
+        """
+        try:
+            pools = [int(size) for size in list_arg('pools') or []]
+        except ValueError:
+            return {'error': 'pools必须是逗号分隔的整数'}, 400
+        hours = request.args.get('hours', default=24, type=float)
+        default_duration = request.args.get('default_duration', default=1.0, type=float)
+        return task_manager.simulate_schedule(pools, hours, default_duration)
+
+class TaskBatchAPI(Resource):
+    def post(self):
+        """批量创建、更新、启动、停止、删除任务
+
+        参数:
+            operations: 操作列表，如[{"op": "start", "id": "...", "interval": 60}]
+        """
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        app.logger.info(f"正在批量执行 {len(operations) if isinstance(operations, list) else 0} 个任务操作")
+        return task_manager.apply_batch('tasks', operations)
+
+class TaskGroupBatchAPI(Resource):
+    def post(self):
+        """批量创建、更新、启动、停止、删除任务组
+
+        参数:
+            operations: 操作列表，如[{"op": "create", "name": "...", "task_ids": [...]}]
+        """
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        app.logger.info(f"正在批量执行 {len(operations) if isinstance(operations, list) else 0} 个任务组操作")
+        return task_manager.apply_batch('task_groups', operations)
+
+class ExportAPI(Resource):
+    def get(self):
+        """以JSON lines格式逐行导出所有任务和任务组"""
+        filename = f"taskautorun-{datetime.now().strftime('%Y%m%d%H%M%S')}.jsonl"
+        return Response(task_manager.export_records(), mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+class ImportAPI(Resource):
+    def post(self):
+        """导入/api/export导出的JSON lines，请求体逐行读取
+
+        参数:
+            on_conflict: ID已存在时的处理方式，skip（默认，跳过）或replace（替换）
+        """
+        on_conflict = request.args.get('on_conflict', 'skip')
+        if on_conflict not in ('skip', 'replace'):
+            return {'error': 'on_conflict必须是skip或replace'}, 400
+        app.logger.info("正在导入任务和任务组")
+        return task_manager.import_records(request.stream, replace=on_conflict == 'replace')
+
+class TaskMembershipAPI(Resource):
+    def get(self, task_id):
+        """获取包含该任务的任务组"""
+        return task_manager.get_task_memberships(task_id)
+
+class QueueStatsAPI(Resource):
+    def get(self):
+        """获取工作队列的积压数量和吞吐量（队列模式）
+        
+        参数:
+            window: 计算吞吐量的时间窗口（秒），默认60
+        """
+        if task_manager.work_queue is None:
+            return {'error': '未启用队列模式'}, 404
+        window = request.args.get('window', default=60, type=int)
+        return task_manager.work_queue.stats(max(window, 1))
+
+class ChangesAPI(Resource):
+    def get(self):
+        """获取某个版本之后的任务和任务组变更
+        
+        参数:
+            since: 已经同步到的版本号（列表接口或上一次调用返回的version）
+            epoch: 版本号所属的epoch，与当前不同时返回reset
+        """
+        since = request.args.get('since', type=int)
+        if since is None:
+            return {'error': 'since必须是整数'}, 400
+        return task_manager.get_changes(since, request.args.get('epoch'))
+
+class EventsAPI(Resource):
+    def get(self):
+        """以SSE推送任务和任务组的变更
+
+        每个事件的格式与/api/changes的响应相同，短时间内的多次变更合并为一个事件。
+        连接建立时先补发since之后的变更；浏览器断线重连时通过Last-Event-ID补发。
+
+        参数:
+            since: 已经同步到的版本号（可选）
+            epoch: 版本号所属的epoch（可选）
+        """
+        since, epoch = request.args.get('since', type=int), request.args.get('epoch')
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        if '-' in last_event_id:
+            epoch, _, version = last_event_id.rpartition('-')
+            since = int(version) if version.isdigit() else None
+
+        subscription = task_manager.events.subscribe()
+        if subscription is None:
+            return {'error': '订阅事件的客户端过多，请稍后重试'}, 503
+        # 先订阅再补发，补发和推送之间的变更不会丢失（重复推送的是记录的当前内容，不影响结果）
+        initial = None
+        if since is not None:
+            initial = task_manager.get_changes(since, epoch)
+
+        def render(event_id, data):
+            return f'id: {event_id}\nevent: changes\ndata: {data}\n\n'
+
+        def stream():
+            try:
+                yield 'retry: 3000\n\n'
+                if initial is not None:
+                    yield render(f"{initial['epoch']}-{initial['version']}", json.dumps(initial))
+                for reset, changes in event_stream(subscription):
+                    if reset or changes:
+                        yield render(*task_manager.changes_json(reset, changes))
+                    else:
+                        yield ': keepalive\n\n'
+            finally:
+                task_manager.events.unsubscribe(subscription)
+
+        return Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 class TaskFunctionsAPI(Resource):
     def get(self):
@@ -236,7 +597,8 @@ class TaskFunctionsAPI(Resource):
             {'name': 'headers', 'default': {}, 'description': '请求头（字典）'},
             {'name': 'body', 'default': None, 'description': '请求体（字典或字符串）'},
             {'name': 'timeout', 'default': 30, 'description': '超时时间（秒）'},
-            {'name': 'verify', 'default': True, 'description': '是否验证SSL证书'}
+            {'name': 'verify', 'default': True, 'description': '是否验证SSL证书'},
+            {'name': 'single_flight', 'default': None, 'description': '是否合并并发的相同请求（仅幂等方法），默认由HTTP_SINGLE_FLIGHT环境变量决定'}
         ]
         
         functions.append({
@@ -330,7 +692,7 @@ class TaskLogsAPI(Resource):
                     if not task_in_group:
                         continue
                     
-                    task_name = task_in_group['name']
+                    task_name = task_in_group.name
                     task_pattern = f"ID: {task_id_in_group}"
                     task_id_pattern = f"任务ID: {task_id_in_group}"
                     
@@ -575,23 +937,46 @@ class TaskLogsAPI(Resource):
             app.logger.error(f"清除日志失败: {e}")
             return {'status': 'error', 'message': f'清除日志失败: {str(e)}'}, 500
 
-def register_routes(api, scheduler):
+def register_routes(api, scheduler, store=None):
     task_manager.set_scheduler(scheduler)
+    if store is not None:
+        task_manager.set_store(store)
+        task_manager.restore()
     
     # 任务相关路由
     api.add_resource(TaskListAPI, '/api/tasks')
+    api.add_resource(TaskBatchAPI, '/api/tasks/batch')
     api.add_resource(TaskAPI, '/api/tasks/<string:task_id>')
     api.add_resource(TaskStartAPI, '/api/tasks/<string:task_id>/start')
     api.add_resource(TaskStopAPI, '/api/tasks/<string:task_id>/stop')
     api.add_resource(TaskExecuteAPI, '/api/tasks/<string:task_id>/execute')
+    api.add_resource(TaskRunsAPI, '/api/tasks/<string:task_id>/runs')
+    api.add_resource(TaskLagAPI, '/api/tasks/<string:task_id>/lag')
+    api.add_resource(TaskScheduleAPI, '/api/tasks/<string:task_id>/schedule')
+    api.add_resource(ScheduleAPI, '/api/schedule')
+    api.add_resource(ScheduleLoadAPI, '/api/schedule/load')
+    api.add_resource(ScheduleSimulationAPI, '/api/schedule/simulate')
+    api.add_resource(TaskMembershipAPI, '/api/tasks/<string:task_id>/groups')
+    api.add_resource(RunAPI, '/api/runs/<string:run_id>')
+    api.add_resource(RunResultAPI, '/api/runs/<string:run_id>/result')
+    api.add_resource(RunProfileAPI, '/api/runs/<string:run_id>/profile')
     api.add_resource(TaskFunctionsAPI, '/api/functions')
+    api.add_resource(QueueStatsAPI, '/api/queue')
+    api.add_resource(ChangesAPI, '/api/changes')
+    api.add_resource(EventsAPI, '/api/events')
+    api.add_resource(ExportAPI, '/api/export')
+    api.add_resource(ImportAPI, '/api/import')
     api.add_resource(TaskLogsAPI, '/api/logs', '/api/logs/<string:task_id>')
     
     # 任务组相关路由
     api.add_resource(TaskGroupListAPI, '/api/task-groups')
+    api.add_resource(TaskGroupBatchAPI, '/api/task-groups/batch')
     api.add_resource(TaskGroupAPI, '/api/task-groups/<string:group_id>')
     api.add_resource(TaskGroupTaskAPI, '/api/task-groups/<string:group_id>/tasks')
     api.add_resource(TaskGroupReorderAPI, '/api/task-groups/<string:group_id>/reorder')
     api.add_resource(TaskGroupStartAPI, '/api/task-groups/<string:group_id>/start')
     api.add_resource(TaskGroupStopAPI, '/api/task-groups/<string:group_id>/stop')
-    api.add_resource(TaskGroupExecuteAPI, '/api/task-groups/<string:group_id>/execute') 
\ No newline at end of file
+    api.add_resource(TaskGroupExecuteAPI, '/api/task-groups/<string:group_id>/execute')
+    api.add_resource(TaskGroupRunsAPI, '/api/task-groups/<string:group_id>/runs')
+    api.add_resource(TaskGroupLagAPI, '/api/task-groups/<string:group_id>/lag')
+    api.add_resource(TaskGroupScheduleAPI, '/api/task-groups/<string:group_id>/schedule') 
\ No newline at end of file
@@ -0,0 +1,327 @@
+import collections
+import datetime
+import math
+import threading
+import time
+import uuid
+from array import array
+
+from profiling import remove_profile
+
+# 运行状态和触发来源在环形缓冲区中以小整数保存
+RUN_STATUSES = ('success', 'error')
+RUN_SOURCES = ('schedule', 'manual', 'group')
+
+
+def new_run_id():
+    """生成运行ID"""
+    return uuid.uuid4().hex
+
+
+def result_size(result):
+    """估算任务结果的大小（字节数或字符数）"""
+    if result is None:
+        return 0
+    if isinstance(result, dict) and isinstance(result.get('content'), str):
+        return len(result['content'])
+    if isinstance(result, (str, bytes, bytearray)):
+        return len(result)
+    return len(str(result))
+
+
+def percentile(sorted_values, pct):
+    """按最近秩法计算百分位数，sorted_values需已排序"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class RunRing:
+    """单个任务的定长运行记录环形缓冲区，数值字段保存在array中"""
+
+    __slots__ = ('capacity', 'size', 'head', 'run_ids', 'error_classes',
+                 'scheduled', 'started', 'ended', 'result_sizes', 'statuses', 'sources')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0  # 下一条记录写入的位置
+        self.run_ids = [None] * capacity
+        self.error_classes = [None] * capacity
+        self.scheduled = array('d', bytes(8 * capacity))
+        self.started = array('d', bytes(8 * capacity))
+        self.ended = array('d', bytes(8 * capacity))
+        self.result_sizes = array('q', bytes(8 * capacity))
+        self.statuses = array('b', bytes(capacity))
+        self.sources = array('b', bytes(capacity))
+
+    def append(self, run_id, scheduled, started, ended, status, size, error_class, source):
+        """追加一条记录
+
+        Returns:
+            被覆盖的最旧记录的运行ID，缓冲区未满时返回None
+        """
+        index = self.head
+        evicted = self.run_ids[index] if self.size == self.capacity else None
+        self.run_ids[index] = run_id
+        self.error_classes[index] = error_class
+        self.scheduled[index] = scheduled
+        self.started[index] = started
+        self.ended[index] = ended
+        self.result_sizes[index] = size
+        self.statuses[index] = RUN_STATUSES.index(status)
+        self.sources[index] = RUN_SOURCES.index(source)
+        self.head = (index + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        return evicted
+
+    def indices(self):
+        """按从新到旧的顺序返回有效记录的下标"""
+        return [(self.head - offset) % self.capacity for offset in range(1, self.size + 1)]
+
+    def record(self, index):
+        """把指定下标的记录转换为字典"""
+        return {
+            'run_id': self.run_ids[index],
+            'scheduled_at': _iso(self.scheduled[index]),
+            'started_at': _iso(self.started[index]),
+            'ended_at': _iso(self.ended[index]),
+            'duration': round(self.ended[index] - self.started[index], 6),
+            'lag': round(self.started[index] - self.scheduled[index], 6),
+            'status': RUN_STATUSES[self.statuses[index]],
+            'result_size': self.result_sizes[index],
+            'error': self.error_classes[index],
+            'source': RUN_SOURCES[self.sources[index]]
+        }
+
+
+class RunHistory:
+    """任务和任务组的运行历史
+
+    每个任务保留最近capacity条运行记录，可选地通过TaskStore持久化，
+    被环形缓冲区覆盖的记录会同时从存储中删除，关联的性能分析文件也一并删除。
+    """
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.store = None
+        self._rings = {}
+        self._profiles = {}  # 运行ID -> 性能分析文件路径（只有少数运行有）
+        self._lock = threading.Lock()
+
+    def set_store(self, store):
+        """设置持久化存储"""
+        self.store = store
+
+    def record(self, owner_id, run_id, scheduled, started, ended, status,
+               size=0, error_class=None, source='schedule', profile=None):
+        """追加一条运行记录
+
+        Args:
+            owner_id: 任务ID或任务组ID
+            run_id: 运行ID
+            scheduled: 计划执行时间（时间戳）
+            started: 开始时间（时间戳）
+            ended: 结束时间（时间戳）
+            status: 运行状态，success或error
+            size: 结果大小
+            error_class: 异常类型名
+            source: 触发来源，schedule、manual或group
+            profile: 性能分析文件路径
+        """
+        with self._lock:
+            ring = self._rings.get(owner_id)
+            if ring is None:
+                ring = self._rings[owner_id] = RunRing(self.capacity)
+            evicted = ring.append(run_id, scheduled, started, ended, status, size, error_class, source)
+            if profile:
+                self._profiles[run_id] = profile
+            evicted_profile = self._profiles.pop(evicted, None) if evicted else None
+
+        if evicted_profile:
+            remove_profile(evicted_profile)
+        if self.store is not None:
+            record = {
+                'owner_id': owner_id, 'run_id': run_id, 'scheduled': scheduled, 'started': started,
+                'ended': ended, 'status': status, 'size': size, 'error_class': error_class, 'source': source
+            }
+            if profile:
+                record['profile'] = profile
+            self.store.save('runs', run_id, record)
+            if evicted:
+                self.store.delete('runs', evicted)
+
+    def load(self, records):
+        """从持久化记录恢复运行历史（按写入顺序）"""
+        with self._lock:
+            for item in records:
+                ring = self._rings.get(item['owner_id'])
+                if ring is None:
+                    ring = self._rings[item['owner_id']] = RunRing(self.capacity)
+                evicted = ring.append(item['run_id'], item['scheduled'], item['started'], item['ended'],
+                                      item['status'], item['size'], item['error_class'], item['source'])
+                self._profiles.pop(evicted, None)
+                if item.get('profile'):
+                    self._profiles[item['run_id']] = item['profile']
+
+    def get_runs(self, owner_id, limit=100):
+        """获取最近的运行记录（从新到旧）"""
+        with self._lock:
+            ring = self._rings.get(owner_id)
+            if ring is None:
+                return []
+            indices = ring.indices()
+            if limit and limit > 0:
+                indices = indices[:limit]
+            records = [ring.record(index) for index in indices]
+            for record in records:
+                if record['run_id'] in self._profiles:
+                    record['profile'] = f"/api/runs/{record['run_id']}/profile"
+            return records
+
+    def get_profile(self, run_id):
+        """获取运行关联的性能分析文件路径"""
+        return self._profiles.get(run_id)
+
+    def get_stats(self, owner_id):
+        """计算缓冲区内所有记录的延迟百分位数和错误率"""
+        with self._lock:
+            ring = self._rings.get(owner_id)
+            if ring is None or ring.size == 0:
+                return {'count': 0, 'error_rate': None, 'p50': None, 'p95': None, 'p99': None, 'mean': None}
+            indices = ring.indices()
+            durations = sorted(ring.ended[i] - ring.started[i] for i in indices)
+            errors = sum(1 for i in indices if ring.statuses[i] != 0)
+        return {
+            'count': len(durations),
+            'error_rate': errors / len(durations),
+            'p50': percentile(durations, 50),
+            'p95': percentile(durations, 95),
+            'p99': percentile(durations, 99),
+            'mean': sum(durations) / len(durations)
+        }
+
+    def get_lag_stats(self, owner_id):
+        """计算由调度器触发的运行中，实际开始时间相对计划时间的延迟（秒）"""
+        schedule_source = RUN_SOURCES.index('schedule')
+        with self._lock:
+            ring = self._rings.get(owner_id)
+            lags = [] if ring is None else sorted(
+                ring.started[i] - ring.scheduled[i] for i in ring.indices() if ring.sources[i] == schedule_source
+            )
+        if not lags:
+            return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+        return {
+            'count': len(lags),
+            'p50': percentile(lags, 50),
+            'p95': percentile(lags, 95),
+            'p99': percentile(lags, 99),
+            'max': lags[-1],
+            'mean': sum(lags) / len(lags)
+        }
+
+    def forget_all(self):
+        """清空内存中的全部运行记录（不修改持久化存储）"""
+        with self._lock:
+            self._rings = {}
+            self._profiles = {}
+
+    def forget(self, owner_id):
+        """删除任务的全部运行记录
+
+        Returns:
+            被删除的运行ID
+        """
+        with self._lock:
+            ring = self._rings.pop(owner_id, None)
+            run_ids = [] if ring is None else [ring.run_ids[index] for index in ring.indices()]
+            profiles = [self._profiles.pop(run_id) for run_id in run_ids if run_id in self._profiles]
+        for path in profiles:
+            remove_profile(path)
+        if self.store is not None:
+            for run_id in run_ids:
+                self.store.delete('runs', run_id)
+        return run_ids
+
+
+class RunHandles:
+    """立即执行的运行句柄，按运行ID查询排队、执行中或已完成的运行
+
+    提交时创建句柄，执行开始和结束时更新。只在内存中保留所有未完成的句柄
+    和最近max_finished个已完成的句柄。
+    """
+
+    def __init__(self, max_finished=1000):
+        self.max_finished = max_finished
+        self._handles = {}
+        self._done = {}  # 运行ID -> 完成事件（只有未完成的句柄有）
+        self._finished = collections.deque()  # 已完成句柄的运行ID，按完成顺序
+        self._lock = threading.Lock()
+
+    def create(self, run_id, owner_id, kind):
+        """创建排队中的句柄
+
+        Args:
+            run_id: 运行ID
+            owner_id: 任务ID或任务组ID
+            kind: task或task_group
+        """
+        with self._lock:
+            self._handles[run_id] = {
+                'run_id': run_id, 'owner_id': owner_id, 'type': kind, 'status': 'queued',
+                'submitted_at': _iso(time.time()), 'started_at': None, 'ended_at': None
+            }
+            self._done[run_id] = threading.Event()
+
+    def start(self, run_id):
+        with self._lock:
+            handle = self._handles.get(run_id)
+            if handle is not None:
+                self._handles[run_id] = dict(handle, status='running', started_at=_iso(time.time()))
+
+    def finish(self, run_id, status, **fields):
+        """标记运行结束
+
+        Args:
+            run_id: 运行ID
+            status: success或error
+            fields: 其他字段，如result、error、profile
+        """
+        with self._lock:
+            handle = self._handles.get(run_id)
+            if handle is None:
+                return
+            self._handles[run_id] = dict(handle, status=status, ended_at=_iso(time.time()), **fields)
+            self._finished.append(run_id)
+            while len(self._finished) > self.max_finished:
+                self._handles.pop(self._finished.popleft(), None)
+            done = self._done.pop(run_id, None)
+        if done is not None:
+            done.set()
+
+    def discard(self, run_id):
+        """删除未能提交的句柄"""
+        with self._lock:
+            self._handles.pop(run_id, None)
+            self._done.pop(run_id, None)
+
+    def get(self, run_id):
+        """获取句柄（句柄更新时整体替换，返回的字典不会再被修改）"""
+        return self._handles.get(run_id)
+
+    def wait(self, run_id, timeout=None):
+        """等待运行结束
+
+        Returns:
+            句柄，超时时返回当前状态的句柄，句柄不存在时返回None
+        """
+        done = self._done.get(run_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.get(run_id)
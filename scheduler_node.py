@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分片调度节点 - 与其他节点按一致性哈希分担任务的调度和执行
+
+API服务需要以分片模式启动（环境变量SCHEDULER_SHARDING=1），此时API主进程只负责
+任务管理，不执行作业。可以在同一台主机或共享磁盘上启动任意多个节点：
+
+    python scheduler_node.py --node-id node-1 --workers 10
+"""
+
+import argparse
+import logging
+import os
+import signal
+
+from sharding import ShardNode
+from task_manager import TaskManager
+from task_store import TaskStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分片调度节点')
+    parser.add_argument('--node-id', help='节点ID，默认为主机名和进程号')
+    parser.add_argument('--db', default=os.environ.get('TASK_DB_PATH', 'data/tasks.db'), help='共享的任务数据库路径')
+    parser.add_argument('--workers', type=int, default=10, help='执行作业的线程数')
+    parser.add_argument('--heartbeat', type=float, default=2.0, help='心跳间隔（秒）')
+    parser.add_argument('--lease-ttl', type=float, default=10.0, help='租约有效期（秒）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = TaskStore(args.db)
+    node = ShardNode(TaskManager(), store, node_id=args.node_id, max_workers=args.workers,
+                     heartbeat_interval=args.heartbeat, lease_ttl=args.lease_ttl)
+    signal.signal(signal.SIGTERM, lambda signum, frame: node.stop())
+    try:
+        node.run()
+    except KeyboardInterrupt:
+        node.stop()
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
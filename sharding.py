@@ -0,0 +1,362 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from job_executor import InstrumentedThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环，节点增减时只有约1/N的任务需要迁移"""
+
+    def __init__(self, nodes, replicas=64):
+        """
+        Args:
+            nodes: 节点ID列表
+            replicas: 每个节点在环上的虚拟节点数
+        """
+        points = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """获取负责指定键的节点，环为空时返回None"""
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+class ShardTable:
+    """保存在共享SQLite数据库中的节点心跳、任务租约和运行上报
+
+    租约只能由当前持有者续期，或在过期后被其他节点获取，因此任一时刻
+    每个任务最多只有一个节点持有有效租约。
+    """
+
+    def __init__(self, db_path):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS shard_nodes ('
+            'node_id TEXT PRIMARY KEY, heartbeat REAL NOT NULL, pid INTEGER, host TEXT)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS shard_leases ('
+            'owner_id TEXT PRIMARY KEY, node_id TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS run_reports (seq INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)'
+        )
+        self._lock = threading.Lock()
+
+    def heartbeat(self, node_id, now):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO shard_nodes (node_id, heartbeat, pid, host) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(node_id) DO UPDATE SET heartbeat=excluded.heartbeat',
+                (node_id, now, os.getpid(), socket.gethostname())
+            )
+
+    def live_nodes(self, now, ttl):
+        """获取心跳未超时的节点ID列表"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT node_id FROM shard_nodes WHERE heartbeat >= ? ORDER BY node_id', (now - ttl,))]
+
+    def sync_leases(self, node_id, wanted, now, ttl):
+        """在一个事务中续期、释放和获取租约
+
+        Args:
+            node_id: 当前节点ID
+            wanted: 当前节点应当负责的任务/任务组ID集合
+            now: 当前时间戳
+            ttl: 租约有效期（秒）
+
+        Returns:
+            当前节点持有有效租约的ID集合
+        """
+        expires_at = now + ttl
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                held = {row[0] for row in self._conn.execute(
+                    'SELECT owner_id FROM shard_leases WHERE node_id = ?', (node_id,))}
+                released = held - wanted
+                if released:
+                    self._conn.executemany('DELETE FROM shard_leases WHERE owner_id = ? AND node_id = ?',
+                                           [(owner_id, node_id) for owner_id in released])
+                self._conn.execute('UPDATE shard_leases SET expires_at = ? WHERE node_id = ?', (expires_at, node_id))
+                claims = wanted - held
+                if claims:
+                    self._conn.executemany(
+                        'INSERT INTO shard_leases (owner_id, node_id, expires_at) VALUES (?, ?, ?) '
+                        'ON CONFLICT(owner_id) DO UPDATE SET node_id=excluded.node_id, expires_at=excluded.expires_at '
+                        'WHERE shard_leases.expires_at < ?',
+                        [(owner_id, node_id, expires_at, now) for owner_id in claims]
+                    )
+                held = {row[0] for row in self._conn.execute(
+                    'SELECT owner_id FROM shard_leases WHERE node_id = ?', (node_id,))}
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return held
+
+    def leave(self, node_id):
+        """删除节点的心跳和全部租约，其他节点可以立即接管"""
+        with self._lock:
+            self._conn.execute('DELETE FROM shard_leases WHERE node_id = ?', (node_id,))
+            self._conn.execute('DELETE FROM shard_nodes WHERE node_id = ?', (node_id,))
+
+    def purge(self, now, ttl):
+        """清理长时间没有心跳的节点和已过期的租约"""
+        with self._lock:
+            self._conn.execute('DELETE FROM shard_nodes WHERE heartbeat < ?', (now - 10 * ttl,))
+            self._conn.execute('DELETE FROM shard_leases WHERE expires_at < ?', (now - ttl,))
+
+    def add_reports(self, reports):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT INTO run_reports (data) VALUES (?)',
+                                   [(json.dumps(report, ensure_ascii=False),) for report in reports])
+            self._conn.execute('COMMIT')
+
+    def take_reports(self, limit=5000):
+        """按上报顺序取出并删除运行上报"""
+        with self._lock:
+            rows = self._conn.execute('SELECT seq, data FROM run_reports ORDER BY seq LIMIT ?', (limit,)).fetchall()
+            if rows:
+                self._conn.execute('DELETE FROM run_reports WHERE seq <= ?', (rows[-1][0],))
+        return [json.loads(data) for _, data in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ReportSink:
+    """运行历史的存储替身，把运行记录缓存起来，由调度节点或工作进程批量上报"""
+
+    def __init__(self):
+        self._reports = []
+        self._lock = threading.Lock()
+
+    def save(self, table, record_id, record):
+        with self._lock:
+            self._reports.append(record)
+
+    def delete(self, table, record_id):
+        # 运行记录的淘汰由接收上报的主进程负责
+        pass
+
+    def drain(self):
+        with self._lock:
+            reports, self._reports = self._reports, []
+        return reports
+
+
+class ShardNode:
+    """分片调度节点
+
+    节点从共享数据库读取任务和任务组，按一致性哈希只调度分配给自己的部分。
+    每个心跳周期：写入心跳、根据存活节点重建哈希环、在一个事务中续期/释放/获取
+    租约，然后让本地调度器中的作业与持有的租约保持一致。作业执行前检查租约
+    是否仍然有效，心跳中断的节点不会与接管节点同时执行同一任务。
+    运行结果写入上报表，由运行API的主进程合并到任务状态和运行历史中。
+    """
+
+    def __init__(self, task_manager, store, node_id=None, max_workers=10,
+                 heartbeat_interval=2.0, lease_ttl=10.0, report_interval=0.5):
+        """
+        Args:
+            task_manager: 节点自己的TaskManager（不设置持久化存储）
+            store: 共享的TaskStore，只用于读取任务定义
+            node_id: 节点ID，默认为主机名和进程号
+            max_workers: 执行作业的线程数
+            heartbeat_interval: 心跳和重新分配的间隔（秒）
+            lease_ttl: 租约有效期（秒），应为心跳间隔的数倍
+            report_interval: 运行上报的写入间隔（秒）
+        """
+        self.node_id = node_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.task_manager = task_manager
+        self.store = store
+        self.table = ShardTable(store.db_path)
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_ttl = lease_ttl
+        self.report_interval = report_interval
+
+        self.scheduler = BackgroundScheduler(executors={'default': InstrumentedThreadPoolExecutor(max_workers)})
+        self.task_manager.set_scheduler(self.scheduler)
+        self._sink = ReportSink()
+        self.task_manager.run_history.set_store(self._sink)
+        # 结果直接写入磁盘，API进程按运行ID从同一目录读取
+        self.task_manager.results.memory_limit = 0
+
+        self.held = set()
+        self._lease_deadline = 0
+        self._fingerprints = {}  # 任务/任务组ID -> 调度时的定义指纹
+        self._data_version = None
+        self._stopped = threading.Event()
+
+    def run(self):
+        """启动调度器并循环处理心跳和上报，直到stop()被调用"""
+        self.scheduler.start()
+        logger.info(f"调度节点 {self.node_id} 已启动")
+        next_tick = 0
+        try:
+            while not self._stopped.is_set():
+                if time.monotonic() >= next_tick:
+                    try:
+                        self.reconcile()
+                    except sqlite3.Error as e:
+                        logger.error(f"调度节点 {self.node_id} 同步租约失败: {str(e)}")
+                    next_tick = time.monotonic() + self.heartbeat_interval
+                self.flush_reports()
+                self._stopped.wait(self.report_interval)
+        finally:
+            self.scheduler.shutdown(wait=True)
+            self.flush_reports()
+            self.table.leave(self.node_id)
+            self.table.close()
+            logger.info(f"调度节点 {self.node_id} 已退出")
+
+    def stop(self):
+        self._stopped.set()
+
+    def flush_reports(self):
+        reports = self._sink.drain()
+        if reports:
+            self.table.add_reports(reports)
+
+    def reconcile(self):
+        """执行一次心跳、租约同步和本地作业调整"""
+        now = time.time()
+        self.table.heartbeat(self.node_id, now)
+        ring = HashRing(self.table.live_nodes(now, self.lease_ttl))
+
+        version = self.store.data_version()
+        if version != self._data_version:
+            self.task_manager.load_snapshot(self.store, include_runs=False)
+            self._data_version = version
+
+        wanted = {owner_id for owner_id in self._schedulable() if ring.node_for(owner_id) == self.node_id}
+        # 先停止不再负责的作业，再释放租约
+        for owner_id in self.held - wanted:
+            self._unschedule(owner_id)
+        self.held = self.table.sync_leases(self.node_id, wanted, now, self.lease_ttl)
+        self._lease_deadline = now + self.lease_ttl
+        self.table.purge(now, self.lease_ttl)
+
+        for owner_id in list(self._fingerprints):
+            if owner_id not in self.held:
+                self._unschedule(owner_id)
+        for owner_id in self.held:
+            fingerprint = self._fingerprint(owner_id)
+            if self._fingerprints.get(owner_id) != fingerprint:
+                self._unschedule(owner_id)
+                self._schedule(owner_id, fingerprint)
+
+    def _schedulable(self):
+        """需要调度的任务（运行状态且有触发器配置）和任务组（有触发器配置）"""
+        manager = self.task_manager
+        for task_id, task in manager.tasks.items():
+            if task.status == 'running' and task_id in manager.trigger_configs:
+                yield task_id
+        for group_id in manager.task_groups:
+            if group_id in manager.trigger_configs:
+                yield group_id
+
+    def _fingerprint(self, owner_id):
+        manager = self.task_manager
+        task = manager.tasks.get(owner_id)
+        if task is not None:
+            definition = {'function': task.function, 'args': task.args}
+        else:
+            task_group = manager.task_groups.get(owner_id)
+            definition = {'task_ids': task_group.task_ids} if task_group else {}
+        definition['trigger'] = manager.trigger_configs.get(owner_id)
+        return json.dumps(definition, sort_keys=True, default=str)
+
+    def _schedule(self, owner_id, fingerprint):
+        job = self.task_manager.schedule_saved(owner_id)
+        if isinstance(job, dict):
+            logger.error(f"调度节点 {self.node_id} 无法调度 {owner_id}: {job['error']}")
+            return
+        job.modify(func=self._guarded(owner_id, job.func))
+        self._fingerprints[owner_id] = fingerprint
+
+    def _unschedule(self, owner_id):
+        if self._fingerprints.pop(owner_id, None) is None:
+            return
+        for job_id in (owner_id, f'group_{owner_id}'):
+            try:
+                self.scheduler.remove_job(job_id)
+            except JobLookupError:
+                pass
+
+    def _guarded(self, owner_id, func):
+        """作业执行前检查租约，租约失效时跳过本次执行"""
+        def run():
+            if owner_id not in self.held or time.time() >= self._lease_deadline:
+                logger.warning(f"调度节点 {self.node_id} 的租约已失效，跳过执行: {owner_id}")
+                return None
+            return func()
+        return run
+
+
+class RunReportConsumer:
+    """在运行API的主进程中合并各调度节点的运行上报"""
+
+    def __init__(self, task_manager, db_path, interval=1.0):
+        self.task_manager = task_manager
+        self.table = ShardTable(db_path)
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='RunReportConsumer', daemon=True)
+        self._thread.start()
+
+    def consume(self):
+        """处理一批运行上报，返回处理的条数
+
+        取出的上报已从表中删除，逐条捕获异常，一条上报处理失败时只记录日志，不影响同一批的其他上报。
+        """
+        reports = self.table.take_reports()
+        for report in reports:
+            try:
+                self.task_manager.apply_run_report(report)
+            except Exception as e:
+                logger.error(f"处理运行上报失败: {report.get('run_id')}: {type(e).__name__}: {e}")
+        return len(reports)
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.consume()
+            except Exception as e:
+                logger.error(f"处理运行上报失败: {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.consume()
+        self.table.close()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+容量模拟 - 用虚拟时钟重放任务数据库中处于运行状态的任务和任务组的调度
+
+不执行任何任务，按运行历史中的平均耗时估算不同线程池大小下的并发数、排队延迟和
+错过执行的次数，几秒内模拟完一整天：
+
+    python simulate.py --pools 4,8,16,32 --hours 24
+"""
+
+import argparse
+import json
+import logging
+import os
+
+from task_manager import TaskManager
+from task_store import TaskStore
+
+
+def print_report(result):
+    """以表格形式输出模拟结果"""
+    demand = result['demand']
+    print(f"模拟 {result['start']} 至 {result['end']}：{result['jobs']} 个作业，触发 {result['fires']} 次，"
+          f"{result['estimated_durations']} 个作业没有运行记录（使用默认耗时）")
+    print(f"线程数不受限制时平均并发 {demand['mean_concurrency']:.2f}，最大并发 {demand['peak_concurrency']}")
+    print(f"{'线程数':>6} {'执行':>10} {'错过':>8} {'跳过':>8} {'利用率':>8} {'p50延迟':>10} {'p99延迟':>10} {'最大延迟':>10}")
+    for pool in result['pools']:
+        delay = pool['queue_delay']
+        print(f"{pool['pool_size']:>8} {pool['executed']:>12} {pool['missed']:>10} {pool['skipped']:>10} "
+              f"{pool['utilization']:>10.1%} {delay['p50'] or 0:>12.3f} {delay['p99'] or 0:>12.3f} {delay['max'] or 0:>12.3f}")
+    recommended = result['recommended_pool_size']
+    print(f"没有错过执行且p99排队延迟不超过1秒的最小线程数: {recommended if recommended else '无（请模拟更大的线程池）'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='容量模拟')
+    parser.add_argument('--db', default=os.environ.get('TASK_DB_PATH', 'data/tasks.db'), help='任务数据库路径')
+    parser.add_argument('--pools', default='1,2,4,8,16,32,64', help='逗号分隔的线程池大小')
+    parser.add_argument('--hours', type=float, default=24, help='模拟时长（小时）')
+    parser.add_argument('--default-duration', type=float, default=1.0, help='没有运行记录的任务使用的耗时（秒）')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    store = TaskStore(args.db)
+    try:
+        manager = TaskManager()
+        manager.load_snapshot(store)
+    finally:
+        store.close()
+
+    result = manager.simulate_schedule([int(size) for size in args.pools.split(',')], args.hours,
+                                       args.default_duration)
+    if isinstance(result, tuple):
+        parser.error(result[0]['error'])
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import collections
+import heapq
+import math
+
+from run_history import percentile
+from triggers import expand_fire_times
+
+# 一个作业：ID、类型（task或task_group）、触发器、平均执行耗时（秒）、容错时间（秒，None表示不限）
+SimulatedJob = collections.namedtuple('SimulatedJob', 'owner_id kind trigger duration grace_time')
+
+
+def _delay_stats(delays, zero_count):
+    """计算排队延迟的统计值，delays只包含大于0的延迟（已排序）"""
+    total = zero_count + len(delays)
+    if not total:
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    def pick(pct):
+        rank = max(1, math.ceil(pct / 100 * total))
+        return 0.0 if rank <= zero_count else delays[rank - zero_count - 1]
+
+    return {
+        'mean': sum(delays) / total,
+        'p50': pick(50),
+        'p95': pick(95),
+        'p99': pick(99),
+        'max': delays[-1] if delays else 0.0
+    }
+
+
+def _simulate_pool(arrivals, jobs, pool_size, start_ts, end_ts):
+    """按先进先出的线程池模拟整个时间段的执行
+
+    与APScheduler的行为一致：同一作业上一次运行（包括排队）尚未结束时新的触发被跳过
+    （max_instances=1）；在线程池中排队超过容错时间的运行在开始时被判定为错过执行，不占用线程。
+    """
+    free = [start_ts] * pool_size  # 每个线程空闲的时间（最小堆）
+    busy_until = [0.0] * len(jobs)
+    delays = []
+    zero_delays = 0
+    executed = missed = skipped = 0
+    busy_time = 0.0
+    for fire_time, index in arrivals:
+        if fire_time < busy_until[index]:
+            skipped += 1
+            continue
+        job = jobs[index]
+        earliest = free[0]
+        if earliest <= fire_time:
+            started = fire_time
+            zero_delays += 1
+        else:
+            started = earliest
+            delay = started - fire_time
+            delays.append(delay)
+            if job.grace_time is not None and delay > job.grace_time:
+                missed += 1
+                busy_until[index] = started
+                continue
+        ended = started + job.duration
+        heapq.heapreplace(free, ended)
+        busy_until[index] = ended
+        executed += 1
+        busy_time += min(ended, end_ts) - min(started, end_ts)
+
+    delays.sort()
+    fired = len(arrivals)
+    return {
+        'pool_size': pool_size,
+        'executed': executed,
+        'missed': missed,
+        'skipped': skipped,
+        'miss_rate': missed / fired if fired else 0.0,
+        'mean_concurrency': busy_time / (end_ts - start_ts),
+        'utilization': busy_time / (end_ts - start_ts) / pool_size,
+        'queue_delay': _delay_stats(delays, zero_delays)
+    }
+
+
+def _demand(arrivals, jobs, start_ts, end_ts):
+    """线程数不受限制时的并发数（只受同一作业不能重叠执行的限制）"""
+    busy_until = [0.0] * len(jobs)
+    starts, ends = [], []
+    busy_time = 0.0
+    for fire_time, index in arrivals:
+        if fire_time < busy_until[index]:
+            continue
+        ended = fire_time + jobs[index].duration
+        busy_until[index] = ended
+        starts.append(fire_time)
+        ends.append(ended)
+        busy_time += min(ended, end_ts) - fire_time
+
+    # 开始时间已按顺序排列，与排序后的结束时间归并得到最大并发数
+    ends.sort()
+    peak = running = position = 0
+    for started in starts:
+        while position < len(ends) and ends[position] <= started:
+            running -= 1
+            position += 1
+        running += 1
+        peak = max(peak, running)
+    return {'mean_concurrency': busy_time / (end_ts - start_ts), 'peak_concurrency': peak}
+
+
+def simulate(jobs, pool_sizes, start, end, max_runs):
+    """用虚拟时钟重放[start, end)内所有作业的触发，估算不同线程池大小下的并发数、排队延迟和错过执行
+
+    不执行任何任务，每次运行的耗时使用作业的平均执行耗时。
+
+    Args:
+        jobs: SimulatedJob列表
+        pool_sizes: 要模拟的线程池大小列表
+        start: 开始时间（aware datetime）
+        end: 结束时间（aware datetime）
+        max_runs: 最多模拟的触发次数
+
+    Returns:
+        模拟结果字典，触发次数超过max_runs时返回None
+    """
+    fire_times = expand_fire_times([job.trigger for job in jobs], start, end, max_runs + 1)
+    if sum(len(times) for times in fire_times) > max_runs:
+        return None
+    arrivals = sorted((fire_time, index) for index, times in enumerate(fire_times) for fire_time in times)
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+
+    pools = [_simulate_pool(arrivals, jobs, pool_size, start_ts, end_ts) for pool_size in sorted(set(pool_sizes))]
+    recommended = next((pool['pool_size'] for pool in pools if pool['missed'] == 0
+                        and (pool['queue_delay']['p99'] or 0) <= 1), None)
+    durations = sorted(job.duration for job in jobs)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'jobs': len(jobs),
+        'fires': len(arrivals),
+        'duration': {
+            'mean': sum(durations) / len(durations) if durations else None,
+            'p50': percentile(durations, 50),
+            'max': durations[-1] if durations else None
+        },
+        'demand': _demand(arrivals, jobs, start_ts, end_ts),
+        'pools': pools,
+        'recommended_pool_size': recommended
+    }
@@ -0,0 +1,55 @@
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并相同键的并发调用
+
+    第一个调用者执行函数，执行期间以相同的键到达的调用者等待并共享它的结果（或异常）；
+    调用结束后键即被移除，之后的调用重新执行，不缓存结果。
+    """
+
+    def __init__(self):
+        self._calls = {}  # 键 -> 进行中的_Call
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """执行function，或等待相同键的进行中调用
+
+        Returns:
+            (结果, 是否共享了其他调用者的结果)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """进行中的调用数"""
+        return len(self._calls)
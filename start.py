@@ -5,6 +5,7 @@
 启动脚本 - 自动化定时任务执行系统
 """
 
+import argparse
 import os
 import sys
 import webbrowser
@@ -12,10 +13,28 @@ import time
 
 def ensure_directories():
     """确保必要的目录存在"""
-    directories = ['logs', 'static/css', 'static/js', 'templates']
+    directories = ['logs', 'data', 'static/css', 'static/js', 'templates']
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
 
+def serve_production(host, port, threads):
+    """使用waitress多线程WSGI服务器运行应用
+    
+    多进程部署时使用gunicorn等服务器直接加载app:app（不要使用--preload），
+    调度器只在获得调度器锁的一个工作进程中运行。
+    """
+    try:
+        from waitress import serve
+    except ImportError:
+        print("生产模式需要安装waitress: pip install waitress")
+        sys.exit(1)
+    
+    # 变更事件（SSE）连接会一直占用处理线程，按线程数限制连接数
+    os.environ['SERVER_THREADS'] = str(threads)
+    from app import app
+    print(f"\n生产模式: http://{host}:{port}，{threads} 个工作线程")
+    serve(app, host=host, port=port, threads=threads)
+
 def start_application():
     """启动应用程序"""
     print("=" * 50)
@@ -55,4 +74,15 @@ def start_application():
     app.run(debug=True, use_reloader=False)
 
 if __name__ == "__main__":
-    start_application() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='自动化定时任务执行系统')
+    parser.add_argument('--production', action='store_true', help='使用多线程WSGI服务器运行（不打开浏览器）')
+    parser.add_argument('--host', default='0.0.0.0', help='生产模式监听地址')
+    parser.add_argument('--port', type=int, default=5000, help='生产模式监听端口')
+    parser.add_argument('--threads', type=int, default=16, help='生产模式工作线程数')
+    args = parser.parse_args()
+    
+    if args.production:
+        ensure_directories()
+        serve_production(args.host, args.port, args.threads)
+    else:
+        start_application() 
\ No newline at end of file
@@ -9,6 +9,22 @@ let currentTaskName = null;
 let currentTaskGroupId = null;
 let currentTaskGroupName = null;
 
+// 本地缓存的任务和任务组（按列表顺序），增量刷新时只更新发生变化的记录
+const taskCache = new Map();
+const taskGroupCache = new Map();
+
+// 任务列表和任务组列表已同步到的版本号
+const syncState = {epoch: null, tasks: null, task_groups: null};
+
+// 浏览器不支持SSE或SSE连接无法恢复时增量刷新的轮询间隔（毫秒）
+const CHANGES_POLL_INTERVAL = 5000;
+
+// 接收服务器推送变更的SSE连接
+let eventSource = null;
+
+// 轮询变更的定时器，未开始轮询时为null
+let changesPollTimer = null;
+
 // DOM元素加载完成后执行
 document.addEventListener('DOMContentLoaded', function() {
     // 初始化加载任务列表
@@ -20,6 +36,11 @@ document.addEventListener('DOMContentLoaded', function() {
     // 加载可用的任务函数
     loadFunctions();
     
+    // 不支持SSE时定时获取任务和任务组的变更，否则在列表加载完成后订阅服务器推送
+    if (!window.EventSource) {
+        startChangesPolling();
+    }
+    
     // 刷新按钮点击事件
     document.getElementById('refreshBtn').addEventListener('click', loadTasks);
     
@@ -84,57 +105,93 @@ document.addEventListener('DOMContentLoaded', function() {
 // 任务组相关功能
 // ===================
 
+// 获取任务和任务组在上次同步之后的变更
+function syncChanges() {
+    if (syncState.tasks === null || syncState.task_groups === null) {
+        return;
+    }
+    const since = Math.min(syncState.tasks, syncState.task_groups);
+    fetch(`${API_BASE_URL}/changes?since=${since}&epoch=${syncState.epoch}`)
+        .then(response => response.json())
+        .then(applyChanges)
+        .catch(error => {
+            console.error('Error syncing changes:', error);
+        });
+}
+
+// 开始定时获取变更（只启动一次）
+function startChangesPolling() {
+    if (changesPollTimer === null) {
+        changesPollTimer = setInterval(syncChanges, CHANGES_POLL_INTERVAL);
+    }
+}
+
+// 订阅服务器推送的变更，任务和任务组列表都加载完成后调用，断线后浏览器自动重连并补发错过的变更
+function connectEvents() {
+    if (!window.EventSource || eventSource !== null ||
+            syncState.tasks === null || syncState.task_groups === null) {
+        return;
+    }
+    const since = Math.min(syncState.tasks, syncState.task_groups);
+    eventSource = new EventSource(`${API_BASE_URL}/events?since=${since}&epoch=${syncState.epoch}`);
+    eventSource.addEventListener('changes', event => applyChanges(JSON.parse(event.data)));
+    // 连接数已满（503）或服务器拒绝连接时浏览器不再重连，改为轮询，页面不会停止更新
+    eventSource.onerror = () => {
+        if (eventSource.readyState === EventSource.CLOSED) {
+            console.warn('变更事件连接已关闭，改为定时获取变更');
+            syncChanges();
+            startChangesPolling();
+        }
+    };
+}
+
+// 把变更（/changes的响应或推送的事件）应用到本地缓存，只重新渲染发生变化的列表
+function applyChanges(data) {
+    // 服务重启、切换到其他进程或落后太多时重新加载完整列表
+    if (data.reset) {
+        loadTasks();
+        loadTaskGroups();
+        return;
+    }
+    
+    let tasksChanged = false;
+    let taskGroupsChanged = false;
+    data.changes.forEach(change => {
+        const cache = change.type === 'tasks' ? taskCache : taskGroupCache;
+        if (change.data) {
+            cache.set(change.id, change.data);
+        } else {
+            cache.delete(change.id);
+        }
+        if (change.type === 'tasks') {
+            tasksChanged = true;
+        } else {
+            taskGroupsChanged = true;
+        }
+    });
+    syncState.epoch = data.epoch;
+    syncState.tasks = data.version;
+    syncState.task_groups = data.version;
+    
+    if (tasksChanged) {
+        renderTasks();
+    }
+    if (taskGroupsChanged) {
+        renderTaskGroups();
+    }
+}
+
 // 加载任务组列表
 function loadTaskGroups() {
-    fetch(`${API_BASE_URL}/task-groups`)
+    fetch(`${API_BASE_URL}/task-groups?fields=id,name,task_ids,status,last_run,next_run,run_count`)
         .then(response => response.json())
         .then(data => {
-            const taskGroupList = document.getElementById('taskGroupList');
-            
-            if (!data.task_groups || data.task_groups.length === 0) {
-                taskGroupList.innerHTML = '<tr><td colspan="7" class="text-center">暂无任务组数据</td></tr>';
-                return;
-            }
-            
-            let html = '';
-            data.task_groups.forEach(group => {
-                html += `
-                <tr data-id="${group.id}">
-                    <td>${escapeHtml(group.name)}</td>
-                    <td>${group.task_ids.length}</td>
-                    <td><span class="task-status status-${group.status}">${getGroupStatusText(group.status)}</span></td>
-                    <td>${formatDateTime(group.last_run)}</td>
-                    <td>${formatDateTime(group.next_run)}</td>
-                    <td>${group.run_count}</td>
-                    <td>
-                        <div class="action-group">
-                            <button class="btn btn-sm btn-info btn-action" onclick="viewTaskGroupDetail('${group.id}')">
-                                <i class="fas fa-info-circle"></i> 详情
-                            </button>
-                            <button class="btn btn-sm btn-secondary btn-action" onclick="viewTaskLogs('${group.id}', '${escapeHtml(group.name)}')">
-                                <i class="fas fa-list-alt"></i> 日志
-                            </button>
-                            ${group.status !== 'running' ? 
-                            `<button class="btn btn-sm btn-success btn-action" onclick="openStartTaskGroupModal('${group.id}')">
-                                <i class="fas fa-play"></i> 启动
-                            </button>` : ''}
-                            ${group.status === 'running' ? 
-                            `<button class="btn btn-sm btn-warning btn-action" onclick="stopTaskGroup('${group.id}')">
-                                <i class="fas fa-stop"></i> 停止
-                            </button>` : ''}
-                            <button class="btn btn-sm btn-primary btn-action" onclick="executeTaskGroup('${group.id}')">
-                                <i class="fas fa-bolt"></i> 执行
-                            </button>
-                            <button class="btn btn-sm btn-danger btn-action" onclick="deleteTaskGroup('${group.id}')">
-                                <i class="fas fa-trash"></i> 删除
-                            </button>
-                        </div>
-                    </td>
-                </tr>
-                `;
-            });
-            
-            taskGroupList.innerHTML = html;
+            taskGroupCache.clear();
+            (data.task_groups || []).forEach(group => taskGroupCache.set(group.id, group));
+            syncState.epoch = data.epoch;
+            syncState.task_groups = data.version;
+            renderTaskGroups();
+            connectEvents();
         })
         .catch(error => {
             console.error('Error loading task groups:', error);
@@ -142,6 +199,57 @@ function loadTaskGroups() {
         });
 }
 
+// 渲染本地缓存的任务组列表
+function renderTaskGroups() {
+    const taskGroups = Array.from(taskGroupCache.values());
+    const taskGroupList = document.getElementById('taskGroupList');
+    
+    if (taskGroups.length === 0) {
+        taskGroupList.innerHTML = '<tr><td colspan="7" class="text-center">暂无任务组数据</td></tr>';
+        return;
+    }
+    
+    let html = '';
+    taskGroups.forEach(group => {
+        html += `
+        <tr data-id="${group.id}">
+            <td>${escapeHtml(group.name)}</td>
+            <td>${group.task_ids.length}</td>
+            <td><span class="task-status status-${group.status}">${getGroupStatusText(group.status)}</span></td>
+            <td>${formatDateTime(group.last_run)}</td>
+            <td>${formatDateTime(group.next_run)}</td>
+            <td>${group.run_count}</td>
+            <td>
+                <div class="action-group">
+                    <button class="btn btn-sm btn-info btn-action" onclick="viewTaskGroupDetail('${group.id}')">
+                        <i class="fas fa-info-circle"></i> 详情
+                    </button>
+                    <button class="btn btn-sm btn-secondary btn-action" onclick="viewTaskLogs('${group.id}', '${escapeHtml(group.name)}')">
+                        <i class="fas fa-list-alt"></i> 日志
+                    </button>
+                    ${group.status !== 'running' ? 
+                    `<button class="btn btn-sm btn-success btn-action" onclick="openStartTaskGroupModal('${group.id}')">
+                        <i class="fas fa-play"></i> 启动
+                    </button>` : ''}
+                    ${group.status === 'running' ? 
+                    `<button class="btn btn-sm btn-warning btn-action" onclick="stopTaskGroup('${group.id}')">
+                        <i class="fas fa-stop"></i> 停止
+                    </button>` : ''}
+                    <button class="btn btn-sm btn-primary btn-action" onclick="executeTaskGroup('${group.id}')">
+                        <i class="fas fa-bolt"></i> 执行
+                    </button>
+                    <button class="btn btn-sm btn-danger btn-action" onclick="deleteTaskGroup('${group.id}')">
+                        <i class="fas fa-trash"></i> 删除
+                    </button>
+                </div>
+            </td>
+        </tr>
+        `;
+    });
+    
+    taskGroupList.innerHTML = html;
+}
+
 // 创建新任务组
 function createTaskGroup() {
     const name = document.getElementById('taskGroupName').value.trim();
@@ -183,8 +291,8 @@ function createTaskGroup() {
         // 提示成功
         showSuccess('任务组创建成功');
         
-        // 刷新任务组列表
-        loadTaskGroups();
+        // 同步任务组列表的变更
+        syncChanges();
         
         // 打开任务组详情，以便添加任务
         viewTaskGroupDetail(data.id);
@@ -292,41 +400,7 @@ function executeTaskGroupFromDetail(groupId) {
     modal.hide();
     
     // 执行任务组
-    fetch(`${API_BASE_URL}/task-groups/${groupId}/execute`, {
-        method: 'POST'
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.error) {
-            showError(data.error);
-            return;
-        }
-        
-        // 首先更新UI状态
-        if (data.task_group) {
-            updateTaskGroupStatusInUI(data.task_group);
-        }
-        
-        // 检查任务组执行情况
-        if (data.task_group && data.task_group.status === 'error') {
-            // 如果任务组状态为错误，显示错误消息
-            showError('任务组执行失败，可能原因：任务组中的任务不存在或执行出错');
-            // 查看日志以获取详细信息
-            setTimeout(() => {
-                viewTaskLogs(groupId, data.task_group.name);
-            }, 1000);
-        } else {
-            // 正常显示成功消息
-            showSuccess(data.message || '任务组开始执行');
-        }
-        
-        // 短暂延迟后刷新列表
-        setTimeout(loadTaskGroups, 1000);
-    })
-    .catch(error => {
-        console.error('Error executing task group:', error);
-        showError('执行任务组失败');
-    });
+    executeTaskGroup(groupId);
 }
 
 // 从详情页面停止任务组
@@ -408,7 +482,7 @@ function loadAvailableTasks() {
             const existingTaskIds = group.task_ids || [];
             
             // 然后获取所有任务
-            return fetch(`${API_BASE_URL}/tasks`)
+            return fetch(`${API_BASE_URL}/tasks?fields=id,name,function`)
                 .then(response => response.json())
                 .then(data => {
                     const availableTasks = data.tasks.filter(task => !existingTaskIds.includes(task.id));
@@ -663,8 +737,8 @@ function startTaskGroup() {
             updateTaskGroupStatusInUI(data);
         }
         
-        // 刷新任务组列表
-        loadTaskGroups();
+        // 同步任务组列表的变更
+        syncChanges();
     })
     .catch(error => {
         console.error('Error starting task group:', error);
@@ -735,26 +809,20 @@ function executeTaskGroup(groupId) {
             return;
         }
         
-        // 首先更新UI状态
-        if (data.task_group) {
-            updateTaskGroupStatusInUI(data.task_group);
-        }
-        
-        // 检查任务组执行情况
-        if (data.task_group && data.task_group.status === 'error') {
-            // 如果任务组状态为错误，显示错误消息
-            showError('任务组执行失败，可能原因：任务组中的任务不存在或执行出错');
-            // 查看日志以获取详细信息
-            setTimeout(() => {
-                viewTaskLogs(groupId, data.task_group.name);
-            }, 1000);
-        } else {
-            // 正常显示成功消息
-            showSuccess(data.message || '任务组开始执行');
-        }
-        
-        // 短暂延迟后刷新列表，以显示最新的运行状态
-        setTimeout(loadTaskGroups, 1000);
+        showSuccess('任务组已提交执行');
+        // 任务组状态的变化由变更流同步到列表，这里只等待运行结果
+        waitForRun(data.run_id)
+            .then(run => {
+                if (run.status === 'success') {
+                    showSuccess('任务组执行完成');
+                } else {
+                    showError(run.error || '任务组执行失败');
+                }
+            })
+            .catch(error => {
+                console.error('Error waiting for run:', error);
+                showError('获取执行结果失败');
+            });
     })
     .catch(error => {
         console.error('Error executing task group:', error);
@@ -821,7 +889,7 @@ function deleteTaskGroup(groupId) {
         }
         
         showSuccess('任务组已删除');
-        loadTaskGroups();
+        syncChanges();
     })
     .catch(error => {
         console.error('Error deleting task group:', error);
@@ -960,55 +1028,15 @@ function updateBodyVisibility() {
 
 // 加载任务列表
 function loadTasks() {
-    fetch(`${API_BASE_URL}/tasks`)
+    fetch(`${API_BASE_URL}/tasks?fields=id,name,function,status,last_run,next_run,run_count`)
         .then(response => response.json())
         .then(data => {
-            const taskList = document.getElementById('taskList');
-            
-            if (!data.tasks || data.tasks.length === 0) {
-                taskList.innerHTML = '<tr><td colspan="7" class="text-center">暂无任务数据</td></tr>';
-                return;
-            }
-            
-            let html = '';
-            data.tasks.forEach(task => {
-                html += `
-                <tr>
-                    <td>${escapeHtml(task.name)}<br><small class="text-muted">ID: ${task.id}</small></td>
-                    <td>${escapeHtml(task.function)}</td>
-                    <td><span class="task-status status-${task.status}">${getStatusText(task.status)}</span></td>
-                    <td>${formatDateTime(task.last_run)}</td>
-                    <td>${formatDateTime(task.next_run)}</td>
-                    <td>${task.run_count}</td>
-                    <td>
-                        <div class="action-group">
-                            <button class="btn btn-sm btn-info btn-action" onclick="viewTaskDetail('${task.id}')">
-                                <i class="fas fa-info-circle"></i> 详情
-                            </button>
-                            <button class="btn btn-sm btn-secondary btn-action" onclick="viewTaskLogs('${task.id}', '${escapeHtml(task.name)}')">
-                                <i class="fas fa-list-alt"></i> 日志
-                            </button>
-                            ${task.status !== 'running' ? 
-                            `<button class="btn btn-sm btn-success btn-action" onclick="openStartTaskModal('${task.id}')">
-                                <i class="fas fa-play"></i> 启动
-                            </button>` : ''}
-                            ${task.status === 'running' ? 
-                            `<button class="btn btn-sm btn-warning btn-action" onclick="stopTask('${task.id}')">
-                                <i class="fas fa-stop"></i> 停止
-                            </button>` : ''}
-                            <button class="btn btn-sm btn-primary btn-action" onclick="executeTask('${task.id}')">
-                                <i class="fas fa-bolt"></i> 执行
-                            </button>
-                            <button class="btn btn-sm btn-danger btn-action" onclick="deleteTask('${task.id}')">
-                                <i class="fas fa-trash"></i> 删除
-                            </button>
-                        </div>
-                    </td>
-                </tr>
-                `;
-            });
-            
-            taskList.innerHTML = html;
+            taskCache.clear();
+            (data.tasks || []).forEach(task => taskCache.set(task.id, task));
+            syncState.epoch = data.epoch;
+            syncState.tasks = data.version;
+            renderTasks();
+            connectEvents();
         })
         .catch(error => {
             console.error('Error loading tasks:', error);
@@ -1016,6 +1044,73 @@ function loadTasks() {
         });
 }
 
+// 渲染本地缓存的任务列表
+function renderTasks() {
+    const tasks = Array.from(taskCache.values());
+    const taskList = document.getElementById('taskList');
+    
+    if (tasks.length === 0) {
+        taskList.innerHTML = '<tr><td colspan="7" class="text-center">暂无任务数据</td></tr>';
+        return;
+    }
+    
+    let html = '';
+    tasks.forEach(task => {
+        html += `
+        <tr>
+            <td>${escapeHtml(task.name)}<br><small class="text-muted">ID: ${task.id}</small></td>
+            <td>${escapeHtml(task.function)}</td>
+            <td><span class="task-status status-${task.status}">${getStatusText(task.status)}</span></td>
+            <td>${formatDateTime(task.last_run)}</td>
+            <td>${formatDateTime(task.next_run)}</td>
+            <td>${task.run_count}</td>
+            <td>
+                <div class="action-group">
+                    <button class="btn btn-sm btn-info btn-action" onclick="viewTaskDetail('${task.id}')">
+                        <i class="fas fa-info-circle"></i> 详情
+                    </button>
+                    <button class="btn btn-sm btn-secondary btn-action" onclick="viewTaskLogs('${task.id}', '${escapeHtml(task.name)}')">
+                        <i class="fas fa-list-alt"></i> 日志
+                    </button>
+                    ${task.status !== 'running' ? 
+                    `<button class="btn btn-sm btn-success btn-action" onclick="openStartTaskModal('${task.id}')">
+                        <i class="fas fa-play"></i> 启动
+                    </button>` : ''}
+                    ${task.status === 'running' ? 
+                    `<button class="btn btn-sm btn-warning btn-action" onclick="stopTask('${task.id}')">
+                        <i class="fas fa-stop"></i> 停止
+                    </button>` : ''}
+                    <button class="btn btn-sm btn-primary btn-action" onclick="executeTask('${task.id}')">
+                        <i class="fas fa-bolt"></i> 执行
+                    </button>
+                    <button class="btn btn-sm btn-danger btn-action" onclick="deleteTask('${task.id}')">
+                        <i class="fas fa-trash"></i> 删除
+                    </button>
+                </div>
+            </td>
+        </tr>
+        `;
+    });
+    
+    taskList.innerHTML = html;
+}
+
+// 在任务详情中显示接下来的几次运行时间
+function loadUpcomingRuns(taskId, count = 5) {
+    fetch(`${API_BASE_URL}/tasks/${taskId}/schedule?count=${count}`)
+        .then(response => response.json())
+        .then(data => {
+            const cell = document.getElementById('taskUpcomingRuns');
+            if (!cell) {
+                return;
+            }
+            cell.innerHTML = data.fires && data.fires.length
+                ? data.fires.map(time => escapeHtml(formatDateTime(time))).join('<br>')
+                : '-';
+        })
+        .catch(error => console.error('Error loading upcoming runs:', error));
+}
+
 // 查看任务详情
 // 查看任务详情
 function viewTaskDetail(taskId) {
@@ -1062,6 +1157,10 @@ function viewTaskDetail(taskId) {
                     <th>下次运行</th>
                     <td>${formatDateTime(task.next_run)}</td>
                 </tr>
+                ${task.status === 'running' ? `<tr>
+                    <th>接下来的运行</th>
+                    <td id="taskUpcomingRuns">加载中...</td>
+                </tr>` : ''}
                 <tr>
                     <th>运行次数</th>
                     <td>${task.run_count}</td>
@@ -1074,6 +1173,9 @@ function viewTaskDetail(taskId) {
             `;
             
             document.getElementById('taskDetailContent').innerHTML = html;
+            if (task.status === 'running') {
+                loadUpcomingRuns(task.id);
+            }
             
             // 添加任务操作按钮
             let actionsHtml = `
@@ -1532,8 +1634,8 @@ function saveTaskChanges() {
         // 刷新任务详情
         viewTaskDetail(taskId);
         
-        // 刷新任务列表
-        loadTasks();
+        // 同步任务列表的变更
+        syncChanges();
     })
     .catch(error => {
         console.error('Error updating task:', error);
@@ -1780,8 +1882,8 @@ function createTask() {
         // 提示成功
         showSuccess('任务创建成功');
         
-        // 刷新任务列表
-        loadTasks();
+        // 同步任务列表的变更
+        syncChanges();
     })
     .catch(error => {
         console.error('Error creating task:', error);
@@ -1862,8 +1964,8 @@ function startTask() {
         // 提示成功
         showSuccess('任务启动成功');
         
-        // 刷新任务列表
-        loadTasks();
+        // 同步任务列表的变更
+        syncChanges();
     })
     .catch(error => {
         console.error('Error starting task:', error);
@@ -1888,7 +1990,7 @@ function stopTask(taskId) {
         }
         
         showSuccess('任务已停止');
-        loadTasks();
+        syncChanges();
     })
     .catch(error => {
         console.error('Error stopping task:', error);
@@ -1908,10 +2010,20 @@ function executeTask(taskId) {
             return;
         }
         
-        showSuccess('任务执行成功: ' + data.result);
-        
-        // 短暂延迟后刷新列表，以显示最新的运行状态
-        setTimeout(loadTasks, 1000);
+        // 任务在服务器后台执行，等待执行结束后显示结果
+        showSuccess('任务已提交执行');
+        waitForRun(data.run_id)
+            .then(run => {
+                if (run.status === 'success') {
+                    showRunResult(run);
+                } else {
+                    showError(run.error || '任务执行失败');
+                }
+            })
+            .catch(error => {
+                console.error('Error waiting for run:', error);
+                showError('获取执行结果失败');
+            });
     })
     .catch(error => {
         console.error('Error executing task:', error);
@@ -1919,6 +2031,37 @@ function executeTask(taskId) {
     });
 }
 
+// 显示运行结果的开头部分，结果较大时只读取前200字节
+function showRunResult(run, maxBytes = 200) {
+    if (!run.result) {
+        showSuccess('任务执行成功');
+        return;
+    }
+    fetch(run.result, { headers: { 'Range': `bytes=0-${maxBytes - 1}` } })
+        .then(response => response.text())
+        .then(text => {
+            const more = run.result_size > maxBytes ? '...' : '';
+            showSuccess('任务执行成功: ' + text + more);
+        })
+        .catch(() => showSuccess('任务执行成功'));
+}
+
+// 轮询立即执行的运行状态，直到执行结束
+function waitForRun(runId, interval = 1000) {
+    return fetch(`${API_BASE_URL}/runs/${runId}`)
+        .then(response => response.json())
+        .then(run => {
+            if (run.error && !run.status) {
+                throw new Error(run.error);
+            }
+            if (run.status === 'queued' || run.status === 'running') {
+                return new Promise(resolve => setTimeout(resolve, interval))
+                    .then(() => waitForRun(runId, interval));
+            }
+            return run;
+        });
+}
+
 // 删除任务
 function deleteTask(taskId) {
     if (!confirm('确定要删除此任务吗？此操作不可恢复。如果该任务已被添加到任务组中，相关任务组也会同步更新。')) {
@@ -1946,8 +2089,8 @@ function deleteTask(taskId) {
             showSuccess('任务已删除');
         }
         
-        // 刷新任务列表
-        loadTasks();
+        // 同步任务列表的变更
+        syncChanges();
     })
     .catch(error => {
         console.error('Error deleting task:', error);
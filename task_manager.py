@@ -3,21 +3,335 @@ import logging
 import datetime
 from flask import jsonify
 from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 import importlib
 import inspect
 import os
 import requests
+from urllib.parse import urlsplit
+from apscheduler.events import EVENT_JOB_MISSED
 from logging.handlers import RotatingFileHandler
 import json
+import re
+import sys
+import time
+import functools
+import threading
+import bisect
+import base64
+import collections
+import copy
+import heapq
+import itertools
+from events import EventBroadcaster
+from job_executor import BoundedExecutor, take_scheduled_time
+from profiling import PROFILE_MODES, find_profile, run_profiled
+from result_store import ResultStore
+from simulator import SimulatedJob, simulate
+from single_flight import SingleFlight
+from triggers import PHASE_ANCHOR, FireTimeCache, ShiftedTrigger, crontab_trigger, load_histogram, phase_offset
+from run_history import RunHandles, RunHistory, new_run_id, result_size
+import metrics
 
 logger = logging.getLogger(__name__)
 
+# 启动任务/任务组时记录的触发器配置项，用于持久化后重建触发器
+TRIGGER_CONFIG_KEYS = ('start_time', 'end_time', 'interval', 'cron', 'misfire_policy', 'misfire_grace_time', 'jitter')
+
+# 错过执行时间（进程卡顿、线程池占满等）后的补偿策略 -> (coalesce, 默认容错秒数)
+# skip: 超出容错时间的执行直接跳过；run_once: 无论延迟多久都补执行一次；run_all: 逐次补执行所有错过的执行
+MISFIRE_POLICIES = {
+    'skip': (False, 1),
+    'run_once': (True, None),
+    'run_all': (False, None)
+}
+
+def synchronized(method):
+    """在TaskManager的写锁内执行方法，所有对任务和任务组状态的修改都通过写锁串行化"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+# 列表查询每页的最大记录数
+MAX_PAGE_SIZE = 1000
+
+# 列表查询最多为多少种（类型, 字段投影）组合缓存JSON片段
+MAX_PROJECTIONS = 16
+
+# 立即执行（手动触发）的任务和任务组使用的线程数，以及线程全忙时最多排队的运行数，超出时返回429
+MANUAL_RUN_WORKERS = int(os.environ.get('MANUAL_RUN_WORKERS', 8))
+MANUAL_RUN_QUEUE = int(os.environ.get('MANUAL_RUN_QUEUE', 32))
+
+# 任务返回值在内存中和溢出到磁盘后最多占用的字节数
+RESULT_MEMORY_LIMIT = int(os.environ.get('RESULT_MEMORY_LIMIT', 32 * 1024 * 1024))
+RESULT_DISK_LIMIT = int(os.environ.get('RESULT_DISK_LIMIT', 512 * 1024 * 1024))
+RESULT_DIR = os.environ.get('RESULT_DIR')  # 结果文件目录，默认为logs/results
+
+# 是否默认合并并发的相同HTTP请求（任务参数single_flight可单独开启或关闭），只对幂等的请求方法生效
+HTTP_SINGLE_FLIGHT = os.environ.get('HTTP_SINGLE_FLIGHT', '').lower() in ('1', 'true', 'yes')
+IDEMPOTENT_HTTP_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# 未指定jitter的任务/任务组错开触发时间的窗口（秒），0表示不错开
+SCHEDULE_JITTER = int(os.environ.get('SCHEDULE_JITTER', 0))
+MAX_JITTER = 86400
+
+# 负载直方图的最大统计时长和最多的时间段数
+MAX_LOAD_WINDOW = 86400
+MAX_LOAD_BUCKETS = 86400
+
+# 容量模拟默认比较的线程池大小、最长的模拟时长（小时）和最多模拟的触发次数
+SIMULATION_POOL_SIZES = (1, 2, 4, 8, 16, 32, 64)
+MAX_SIMULATION_HOURS = 168
+MAX_SIMULATED_RUNS = 5000000
+
+# APScheduler作业的默认容错时间（秒），未配置misfire_policy和misfire_grace_time时使用
+DEFAULT_MISFIRE_GRACE_TIME = 1
+
+# 单个任务预览的最多触发次数，以及全部任务的触发时间表最多返回的条数
+MAX_PREVIEW_COUNT = 1000
+MAX_SCHEDULE_LIMIT = 10000
+
+# 批量操作支持的操作类型和每批最多的操作数
+BATCH_OPERATIONS = ('create', 'update', 'start', 'stop', 'delete')
+MAX_BATCH_SIZE = 1000
+
+# 批量操作中按整数解析的参数（与单个接口的reqparse类型一致）
+BATCH_INT_FIELDS = ('interval', 'misfire_grace_time', 'jitter')
+
+# 导入时每批在一次写锁内处理的行数，以及响应中最多列出的错误数
+IMPORT_CHUNK_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+
+# 变更日志最多保留的条数，客户端落后更多时需要重新获取完整列表
+CHANGE_JOURNAL_SIZE = 10000
+
+# 推送给浏览器的变更事件中包含的字段（与Web界面列表使用的字段相同，可以共用JSON片段缓存）
+EVENT_FIELDS = {
+    'tasks': ('id', 'name', 'function', 'status', 'last_run', 'next_run', 'run_count'),
+    'task_groups': ('id', 'name', 'task_ids', 'status', 'last_run', 'next_run', 'run_count')
+}
+
+# WSGI服务器的处理线程数（start.py --production按--threads设置），以及最多同时保持的变更事件连接数。
+# 每个SSE连接一直占用一个处理线程，连接数限制在线程数的四分之一（最多一半），其余线程处理普通请求
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 16))
+EVENT_MAX_CLIENTS = min(int(os.environ.get('EVENT_MAX_CLIENTS', SERVER_THREADS // 4)), SERVER_THREADS // 2)
+
+# 任务组列表可以返回的字段
+GROUP_FIELDS = ('id', 'name', 'task_ids', 'status', 'job_id', 'created_at', 'last_run', 'next_run', 'run_count',
+                'current_task_index', 'context_bytes', 'context_peak_bytes', 'context')
+
+def encode_cursor(key):
+    """把排序键(创建时间, ID)编码为不透明的分页游标"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解码分页游标，无效时返回None"""
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(created_at, (int, float)) or not isinstance(record_id, str):
+        return None
+    return (created_at, record_id)
+
+# 引用路径中允许的字符：字段名、点号、列表下标、切片和通配符
+REF_PATH_CHARS = r'[\w\.\-\[\]\*:]+'
+
+# 参数中的上下文引用表达式，用于分析任务组中各步骤依赖的上下文键
+CONTEXT_REF_PATTERN = re.compile(
+    r'\$\{(context|http\.response_body|http\.response_json|http\.headers|http\.status):(' + REF_PATH_CHARS + r')\}'
+)
+
+# 路径访问失败时的哨兵值，用于区分"值为None"和"路径不存在"
+MISSING = object()
+
+# 路径片段：[*]、[1:3]、[0]/[-1]，或以点号分隔的字段名（字段名为*时表示通配）
+_PATH_TOKEN_PATTERN = re.compile(r'\[(\*|-?\d*:-?\d*|-?\d+)\]|\.?([^.\[\]]+)')
+
+def split_ref_path(path):
+    """把引用路径拆分为首段（上下文键或任务ID）和剩余的访问路径"""
+    match = re.match(r'[^.\[]*', path)
+    return match.group(0), path[match.end():]
+
+def _context_key_for_ref(kind, path):
+    """根据引用类型和路径计算其依赖的上下文键"""
+    if kind == 'context':
+        return split_ref_path(path)[0]
+    head = path if kind == 'http.response_body' else split_ref_path(path)[0]
+    if kind == 'http.response_json':
+        return 'last_json' if head == 'last' else f"task_{head}_json"
+    # 响应体、响应头和状态码都从完整的结果对象中读取
+    return 'last_result' if head == 'last' else f"task_{head}_result"
+
+def _access_step(obj, kind, arg):
+    """执行单个访问步骤，失败时返回MISSING"""
+    if kind == 'key':
+        if isinstance(obj, dict):
+            return obj.get(arg, MISSING)
+        # 兼容 items.0 这种用点号写的列表下标
+        if isinstance(obj, (list, tuple)) and arg.lstrip('-').isdigit():
+            kind, arg = 'index', int(arg)
+        else:
+            return MISSING
+    if not isinstance(obj, (list, tuple)):
+        return MISSING
+    if kind == 'index':
+        if -len(obj) <= arg < len(obj):
+            return obj[arg]
+        return MISSING
+    return obj[arg]  # slice
+
+@functools.lru_cache(maxsize=1024)
+def compile_path(path):
+    """把访问路径编译为访问器函数
+    
+    支持的语法:
+    - .field / field     字典字段
+    - [0] / [-1] / .0    列表下标
+    - [1:3] / [:5]       列表切片
+    - [*] / .*           通配，对列表元素或字典值逐个应用剩余路径
+    
+    Args:
+        path: 访问路径，例如 ".data.items[*].id"
+        
+    Returns:
+        访问器函数 accessor(obj)，路径不存在时返回MISSING
+        
+    Raises:
+        ValueError: 路径语法无效
+    """
+    steps = []
+    pos = 0
+    while pos < len(path):
+        match = _PATH_TOKEN_PATTERN.match(path, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"无效的路径表达式: {path}")
+        bracket, name = match.groups()
+        if bracket is not None:
+            if bracket == '*':
+                steps.append(('wildcard', None))
+            elif ':' in bracket:
+                start, stop = bracket.split(':')
+                steps.append(('slice', slice(int(start) if start else None, int(stop) if stop else None)))
+            else:
+                steps.append(('index', int(bracket)))
+        elif name == '*':
+            steps.append(('wildcard', None))
+        else:
+            steps.append(('key', name))
+        pos = match.end()
+    steps = tuple(steps)
+    
+    def accessor(obj, start=0):
+        for index in range(start, len(steps)):
+            kind, arg = steps[index]
+            if kind == 'wildcard':
+                if isinstance(obj, dict):
+                    items = obj.values()
+                elif isinstance(obj, (list, tuple)):
+                    items = obj
+                else:
+                    return MISSING
+                values = []
+                for item in items:
+                    value = accessor(item, index + 1)
+                    if value is not MISSING:
+                        values.append(value)
+                return values
+            obj = _access_step(obj, kind, arg)
+            if obj is MISSING:
+                return MISSING
+        return obj
+    
+    return accessor
+
+def collect_context_refs(value, keys=None):
+    """收集参数值（可嵌套）中所有引用表达式依赖的上下文键
+    
+    Args:
+        value: 参数值，可以是字符串、字典或列表
+        keys: 用于累积结果的集合
+        
+    Returns:
+        上下文键集合
+    """
+    if keys is None:
+        keys = set()
+    if isinstance(value, str):
+        for kind, path in CONTEXT_REF_PATTERN.findall(value):
+            keys.add(_context_key_for_ref(kind, path))
+    elif isinstance(value, dict):
+        for item in value.values():
+            collect_context_refs(item, keys)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            collect_context_refs(item, keys)
+    return keys
+
+def estimate_size(value):
+    """粗略估算对象占用的内存字节数（递归统计容器内容）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += sys.getsizeof(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+# 进行中的HTTP请求，用于合并并发的相同请求
+_http_flights = SingleFlight()
+
+def _single_flight_key(method, url, headers, body, timeout, verify):
+    """由请求的全部参数得到合并键，参数无法比较时返回None（不合并）"""
+    try:
+        header_items = tuple(sorted((str(name).lower(), str(value)) for name, value in headers.items()))
+        payload = ('json', json.dumps(body, sort_keys=True)) if isinstance(body, dict) else ('data', body)
+        key = (method, url, header_items, payload, timeout, verify)
+        hash(key)
+    except (TypeError, ValueError):
+        return None
+    return key
+
+def _send_http_request(method, url, headers, body, timeout, verify):
+    """发送HTTP请求并转换为结果字典，请求失败时返回包含error的字典"""
+    started = time.perf_counter()
+    host = urlsplit(url).netloc
+    try:
+        response = requests.request(
+            method=method,
+            url=url,
+            headers=headers,
+            json=body if isinstance(body, dict) else None,
+            data=body if not isinstance(body, dict) and body is not None else None,
+            timeout=timeout,
+            verify=verify
+        )
+    except Exception as e:
+        metrics.HTTP_REQUEST_DURATION.labels(host, 'error').observe(time.perf_counter() - started)
+        return {
+            'error': str(e),
+            'success': False
+        }
+    
+    metrics.HTTP_REQUEST_DURATION.labels(host, response.status_code).observe(time.perf_counter() - started)
+    return {
+        'status_code': response.status_code,
+        'headers': dict(response.headers),
+        'content': response.text,
+        'success': response.status_code < 400
+    }
+
 # HTTP请求函数
-def http_request(url, method='GET', headers=None, body=None, timeout=30, verify=True, task_id=None):
+def http_request(url, method='GET', headers=None, body=None, timeout=30, verify=True, task_id=None,
+                 single_flight=None):
     """执行HTTP请求
     
+    开启single_flight时，并发的相同请求（方法、URL、请求头、请求体、超时和SSL验证均相同）
+    只发送一次，所有调用者共享同一个响应，各自按自己的任务ID记录日志。只对幂等的请求方法生效。
+    
     Args:
         url: 请求URL
         method: 请求方法（GET, POST, PUT, DELETE等）
@@ -26,6 +340,7 @@ def http_request(url, method='GET', headers=None, body=None, timeout=30, verify=
         timeout: 超时时间（秒）
         verify: 是否验证SSL证书
         task_id: 任务ID，用于日志记录
+        single_flight: 是否合并并发的相同请求，默认由HTTP_SINGLE_FLIGHT环境变量决定
         
     Returns:
         包含响应状态码、响应头和响应体的字典
@@ -34,6 +349,8 @@ def http_request(url, method='GET', headers=None, body=None, timeout=30, verify=
     method = method.upper()
     if headers is None:
         headers = {}
+    if single_flight is None:
+        single_flight = HTTP_SINGLE_FLIGHT
     
     # 构建日志前缀，确保所有日志条目包含任务ID
     task_prefix = f"[任务ID: {task_id}] " if task_id else ""
@@ -52,63 +369,149 @@ def http_request(url, method='GET', headers=None, body=None, timeout=30, verify=
     
     logger.info(f"{task_prefix}超时设置: {timeout}秒, SSL验证: {'启用' if verify else '禁用'}")
     
+    send = functools.partial(_send_http_request, method, url, headers, body, timeout, verify)
+    key = _single_flight_key(method, url, headers, body, timeout, verify) \
+        if single_flight and method in IDEMPOTENT_HTTP_METHODS else None
+    if key is None:
+        result = send()
+    else:
+        result, shared = _http_flights.do(key, send)
+        if shared:
+            metrics.HTTP_REQUESTS_DEDUPLICATED.labels(urlsplit(url).netloc).inc()
+            logger.info(f"{task_prefix}已有相同的请求正在进行，共享其响应")
+        # 每个调用者得到自己的副本，任务组修改结果时不会影响其他调用者
+        result = dict(result)
+        if 'headers' in result:
+            result['headers'] = dict(result['headers'])
+    
+    if 'error' in result:
+        logger.error(f"{task_prefix}HTTP请求发生错误: {result['error']}")
+        return result
+    
+    # 记录响应信息
+    logger.info(f"{task_prefix}收到响应: 状态码 {result['status_code']}")
+    logger.info(f"{task_prefix}响应头: {result['headers']}")
+    
+    # 记录响应内容，但限制长度
+    response_text = result['content']
     try:
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=body if isinstance(body, dict) else None,
-            data=body if not isinstance(body, dict) and body is not None else None,
-            timeout=timeout,
-            verify=verify
-        )
-        
-        # 记录响应信息
-        logger.info(f"{task_prefix}收到响应: 状态码 {response.status_code}")
-        logger.info(f"{task_prefix}响应头: {dict(response.headers)}")
-        
-        # 记录响应内容，但限制长度
-        try:
-            # 尝试作为JSON解析
-            response_json = response.json()
-            logger.info(f"{task_prefix}响应内容(JSON): {response_json}")
-            response_text = "已作为JSON处理，详见上方日志"
-        except:
-            # 如果不是JSON，以文本形式记录，并限制长度
-            response_text = response.text
-            if len(response_text) > 2000:
-                logger.info(f"{task_prefix}响应内容(前2000字符): {response_text[:2000]}...")
-                logger.info(f"{task_prefix}响应内容过长，已截断")
-            else:
-                logger.info(f"{task_prefix}响应内容: {response_text}")
-        
+        # 尝试作为JSON解析
+        response_json = json.loads(response_text)
+        logger.info(f"{task_prefix}响应内容(JSON): {response_json}")
+    except ValueError:
+        # 如果不是JSON，以文本形式记录，并限制长度
+        if len(response_text) > 2000:
+            logger.info(f"{task_prefix}响应内容(前2000字符): {response_text[:2000]}...")
+            logger.info(f"{task_prefix}响应内容过长，已截断")
+        else:
+            logger.info(f"{task_prefix}响应内容: {response_text}")
+    
+    logger.info(f"{task_prefix}HTTP请求完成: {'成功' if result['success'] else '失败'}")
+    return result
+
+def format_timestamp(timestamp, aware=False):
+    """把时间戳转换为API和持久化记录中使用的ISO格式字符串
+    
+    Args:
+        timestamp: 时间戳，为None时返回None
+        aware: 是否带本地时区偏移（调度器给出的下次运行时间带时区）
+    """
+    if timestamp is None:
+        return None
+    moment = datetime.datetime.fromtimestamp(timestamp)
+    return (moment.astimezone() if aware else moment).isoformat()
+
+def parse_timestamp(value):
+    """把持久化记录中的ISO格式字符串转换为时间戳（已经是时间戳时原样返回）"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+class TaskRecord:
+    """任务记录
+    
+    使用__slots__存储，时间保存为时间戳，函数名使用intern后的字符串（大量任务共享
+    少数几个函数名）。只在API和持久化的边界通过to_dict()转换为字典。
+    """
+    
+    __slots__ = ('id', 'name', 'function', 'args', 'status', 'job_id', 'created_at', 'last_run',
+                 'next_run', 'run_count') + TRIGGER_CONFIG_KEYS
+    
+    def __init__(self, task_id, name, function_name, args=None):
+        self.id = task_id
+        self.name = name
+        self.function = sys.intern(function_name)
+        self.args = args if args is not None else {}
+        self.status = 'created'  # created, running, stopped
+        self.job_id = None
+        self.created_at = time.time()
+        self.last_run = None
+        self.next_run = None
+        self.run_count = 0
+        for key in TRIGGER_CONFIG_KEYS:
+            setattr(self, key, None)
+    
+    def to_dict(self):
+        """转换为字典表示（API返回和持久化使用相同的格式）"""
         result = {
-            'status_code': response.status_code,
-            'headers': dict(response.headers),
-            'content': response.text,
-            'success': response.status_code < 400
+            'id': self.id,
+            'name': self.name,
+            'function': self.function,
+            'args': self.args,
+            'status': self.status,
+            'job_id': self.job_id,
+            'created_at': format_timestamp(self.created_at),
+            'last_run': format_timestamp(self.last_run),
+            'next_run': format_timestamp(self.next_run, aware=True),
+            'run_count': self.run_count
         }
-        
-        logger.info(f"{task_prefix}HTTP请求完成: {'成功' if result['success'] else '失败'}")
+        # 触发器配置只在设置过时出现
+        for key in TRIGGER_CONFIG_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
         return result
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"{task_prefix}HTTP请求发生错误: {error_msg}")
-        return {
-            'error': error_msg,
-            'success': False
-        }
+    
+    @classmethod
+    def from_record(cls, record):
+        """从持久化的字典恢复任务"""
+        task = cls(record['id'], record['name'], record['function'], record.get('args') or {})
+        task.status = record.get('status', 'created')
+        task.job_id = record.get('job_id')
+        task.created_at = parse_timestamp(record.get('created_at')) or task.created_at
+        task.last_run = parse_timestamp(record.get('last_run'))
+        task.next_run = parse_timestamp(record.get('next_run'))
+        task.run_count = record.get('run_count', 0)
+        for key in TRIGGER_CONFIG_KEYS:
+            if key in record:
+                setattr(task, key, record[key])
+        return task
+    
+    def update(self, key, value):
+        """更新一个可修改的字段（函数名同样intern）"""
+        setattr(self, key, sys.intern(value) if key == 'function' else value)
+    
+    def copy(self):
+        """复制一份记录，用作发布给读接口的只读快照"""
+        clone = TaskRecord.__new__(TaskRecord)
+        for slot in TaskRecord.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        return clone
 
 class TaskGroup:
     """任务组类，用于管理一组按顺序执行的任务"""
     
+    __slots__ = ('id', 'name', 'task_ids', 'status', 'job_id', 'created_at', 'last_run', 'next_run',
+                 'run_count', 'current_task_index', 'scheduler', 'task_manager', 'context', 'context_sizes',
+                 'context_bytes', 'context_peak_bytes', 'live_context_keys') + TRIGGER_CONFIG_KEYS
+    
     def __init__(self, group_id, name, task_ids=None, scheduler=None, task_manager=None):
         self.id = group_id
         self.name = name
         self.task_ids = task_ids or []  # 按顺序存储的任务ID列表
         self.status = 'created'  # created, running, stopped, completed, error
         self.job_id = None
-        self.created_at = datetime.datetime.now().isoformat()
+        self.created_at = time.time()  # 时间均保存为时间戳，转换为字典时再格式化
         self.last_run = None
         self.next_run = None
         self.run_count = 0
@@ -116,86 +519,228 @@ class TaskGroup:
         self.scheduler = scheduler
         self.task_manager = task_manager
         self.context = {}  # 存储任务执行上下文，用于任务间参数传递
+        self.context_sizes = {}  # 上下文中每个键的估算大小（字节）
+        self.context_bytes = 0  # 当前上下文估算总大小
+        self.context_peak_bytes = 0  # 本次执行中上下文的峰值大小
+        self.live_context_keys = []  # 第i个任务执行后仍需保留的上下文键
+        for key in TRIGGER_CONFIG_KEYS:
+            setattr(self, key, None)
     
     def to_dict(self):
         """转换为字典表示"""
         result = {
             'id': self.id,
             'name': self.name,
-            'task_ids': self.task_ids,
+            'task_ids': list(self.task_ids),
             'status': self.status,
             'job_id': self.job_id,
-            'created_at': self.created_at,
-            'last_run': self.last_run,
-            'next_run': self.next_run,
+            'created_at': format_timestamp(self.created_at),
+            'last_run': format_timestamp(self.last_run),
+            'next_run': format_timestamp(self.next_run, aware=True),
             'run_count': self.run_count,
-            'current_task_index': self.current_task_index
+            'current_task_index': self.current_task_index,
+            'context_bytes': self.context_bytes,
+            'context_peak_bytes': self.context_peak_bytes
         }
         
         # 添加上下文信息，但过滤掉可能的大对象
         if self.context:
-            filtered_context = {}
-            for key, value in self.context.items():
-                if key.endswith('_json') and isinstance(value, dict):
-                    # 对于JSON对象，只返回键名
-                    filtered_context[key] = f"JSON对象，包含{len(value)}个字段: {', '.join(value.keys())}"
-                elif key.endswith('_content') and isinstance(value, str) and len(value) > 100:
-                    # 对于长文本内容，只返回前100个字符
-                    filtered_context[key] = value[:100] + "..."
-                elif key.endswith('_result') and isinstance(value, dict):
-                    # 对于HTTP结果对象，只返回状态码和头信息
-                    if 'status_code' in value:
-                        filtered_context[key] = f"HTTP响应，状态码: {value.get('status_code')}"
-                    else:
-                        filtered_context[key] = f"结果对象，包含{len(value)}个字段"
-                else:
-                    # 其他类型的值，直接包含
-                    filtered_context[key] = str(value)
-            
-            result['context'] = filtered_context
+            result['context'] = self.context_summary()
             
         return result
     
+    def context_summary(self):
+        """上下文的摘要（大对象只保留字段名、状态码或前100个字符），对摘要再次调用结果不变"""
+        filtered_context = {}
+        for key, value in self.context.items():
+            if key.endswith('_json') and isinstance(value, dict):
+                # 对于JSON对象，只返回键名
+                filtered_context[key] = f"JSON对象，包含{len(value)}个字段: {', '.join(value.keys())}"
+            elif key.endswith('_content') and isinstance(value, str) and len(value) > 100:
+                # 对于长文本内容，只返回前100个字符
+                filtered_context[key] = value[:100] + "..."
+            elif key.endswith('_result') and isinstance(value, dict):
+                # 对于HTTP结果对象，只返回状态码和头信息
+                if 'status_code' in value:
+                    filtered_context[key] = f"HTTP响应，状态码: {value.get('status_code')}"
+                else:
+                    filtered_context[key] = f"结果对象，包含{len(value)}个字段"
+            else:
+                # 其他类型的值，直接包含
+                filtered_context[key] = str(value)
+        
+        return filtered_context
+    
+    def to_record(self):
+        """转换为用于持久化的字典（不包含执行上下文）
+        
+        存储在后台线程中不加锁地序列化，可变字段需要复制，不能引用任务组本身的列表。
+        """
+        record = {
+            'id': self.id,
+            'name': self.name,
+            'task_ids': list(self.task_ids),
+            'status': self.status,
+            'job_id': self.job_id,
+            'created_at': format_timestamp(self.created_at),
+            'last_run': format_timestamp(self.last_run),
+            'run_count': self.run_count
+        }
+        for key in TRIGGER_CONFIG_KEYS:
+            if getattr(self, key) is not None:
+                record[key] = getattr(self, key)
+        return record
+    
+    def copy(self):
+        """复制一份任务组，用作发布给读接口的只读快照
+        
+        任务列表会被原地修改，复制时固定下来；执行上下文只保留to_dict()使用的摘要，
+        快照不引用上下文中的值，剪除或清空上下文后这些值即可释放。其余字段只会被整体替换。
+        """
+        clone = TaskGroup.__new__(TaskGroup)
+        for slot in TaskGroup.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.task_ids = list(self.task_ids)
+        clone.context = self.context_summary()
+        return clone
+    
+    def same_as(self, view):
+        """与快照的所有字段是否相同（上下文按摘要比较）"""
+        return all(getattr(self, slot) == getattr(view, slot) for slot in TaskGroup.__slots__ if slot != 'context') \
+            and self.context_summary() == view.context
+    
+    @classmethod
+    def from_record(cls, record, scheduler=None, task_manager=None):
+        """从持久化的字典恢复任务组"""
+        task_group = cls(record['id'], record['name'], list(record.get('task_ids') or []),
+                         scheduler=scheduler, task_manager=task_manager)
+        task_group.status = record.get('status', 'created')
+        task_group.job_id = record.get('job_id')
+        task_group.created_at = parse_timestamp(record.get('created_at')) or task_group.created_at
+        task_group.last_run = parse_timestamp(record.get('last_run'))
+        task_group.run_count = record.get('run_count', 0)
+        for key in TRIGGER_CONFIG_KEYS:
+            if key in record:
+                setattr(task_group, key, record[key])
+        return task_group
+    
     def add_task(self, task_id):
-        """添加任务到任务组"""
-        if task_id not in self.task_ids:
-            self.task_ids.append(task_id)
+        """添加任务到任务组（调用方通过TaskManager的反向索引确认任务不在任务组中）"""
+        self.task_ids.append(task_id)
         return self.to_dict()
     
     def remove_task(self, task_id):
-        """从任务组中移除任务"""
-        if task_id in self.task_ids:
-            self.task_ids.remove(task_id)
+        """从任务组中移除任务（调用方通过TaskManager的反向索引确认任务在任务组中）"""
+        self.task_ids.remove(task_id)
         return self.to_dict()
     
     def reorder_tasks(self, task_ids):
         """重新排序任务组中的任务"""
         # 确保所有提供的任务ID都在当前任务组中
-        if all(task_id in self.task_ids for task_id in task_ids) and len(task_ids) == len(self.task_ids):
+        if len(task_ids) == len(self.task_ids) and set(task_ids) == set(self.task_ids):
             self.task_ids = task_ids
         return self.to_dict()
         
     def set_context_value(self, key, value):
         """设置上下文中的值"""
         self.context[key] = value
+        size = estimate_size(value)
+        self.context_bytes += size - self.context_sizes.get(key, 0)
+        self.context_sizes[key] = size
+        if self.context_bytes > self.context_peak_bytes:
+            self.context_peak_bytes = self.context_bytes
         
     def get_context_value(self, key, default=None):
         """获取上下文中的值"""
         return self.context.get(key, default)
         
-    def clear_context(self):
-        """清空上下文"""
+    def clear_context(self, reset_peak=False):
+        """清空上下文
+        
+        Args:
+            reset_peak: 是否同时重置峰值统计（开始新一轮执行时使用）
+        """
         self.context = {}
+        self.context_sizes = {}
+        self.context_bytes = 0
+        if reset_peak:
+            self.context_peak_bytes = 0
+    
+    def plan_context_liveness(self, tasks):
+        """根据后续任务参数中的引用，计算每一步执行后仍需保留的上下文键
+        
+        Args:
+            tasks: 任务字典（任务ID -> 任务对象）
+        """
+        live = set()
+        plan = [frozenset()] * len(self.task_ids)
+        # 从后往前累积：第i步之后需要的键 = 第i+1步及之后所有任务引用的键
+        for index in range(len(self.task_ids) - 1, -1, -1):
+            plan[index] = frozenset(live)
+            task = tasks.get(self.task_ids[index])
+            if task and task.args:
+                collect_context_refs(task.args, live)
+        self.live_context_keys = plan
+    
+    def prune_context(self, index):
+        """丢弃第index个任务执行后不再被引用的上下文键
+        
+        Returns:
+            被丢弃的键列表
+        """
+        if index >= len(self.live_context_keys):
+            return []
+        live = self.live_context_keys[index]
+        dropped = [key for key in self.context if key not in live]
+        for key in dropped:
+            del self.context[key]
+            self.context_bytes -= self.context_sizes.pop(key, 0)
+        return dropped
     
     def get_context(self):
         """获取执行上下文"""
         return self.context
 
 class TaskManager:
+    """任务和任务组管理器
+    
+    任务字典和任务组对象会同时被请求线程和调度器的执行线程修改，所有修改都在
+    写锁（self._lock）内进行，执行任务函数本身不持有写锁。每次修改后把该记录的
+    只读快照发布到_task_views/_group_views，读接口只返回快照，不获取写锁，
+    也不会读到修改到一半的状态。快照发布后不再修改，每次发布递增self.version，并在
+    有限长度的变更日志中记录(版本号, 类型, ID, 操作)，客户端可以只获取某个版本之后的变更。
+    """
+    
     def __init__(self):
         self.tasks = {}
         self.task_groups = {}  # 存储任务组
+        self._lock = threading.RLock()  # 写锁，保护tasks、task_groups及其中的记录
+        self._task_views = {}  # 任务ID -> 任务的只读快照
+        self._group_views = {}  # 任务组ID -> 任务组的只读快照
+        self._task_index = {'status': {}, 'function': {}}  # 任务的二级索引：字段 -> 字段值 -> 任务ID集合
+        self._group_index = {'status': {}}  # 任务组的二级索引
+        self._task_order = []  # 按(创建时间, 任务ID)排序，用于游标分页
+        self._group_order = []  # 按(创建时间, 任务组ID)排序
+        self._memberships = {}  # 任务ID -> 包含该任务的任务组ID（元组，修改时整体替换）
+        self._view_versions = {'tasks': {}, 'task_groups': {}}  # 类型 -> 记录ID -> 当前快照发布时的版本号
+        self._fragment_caches = {}  # (tasks/task_groups, 字段投影) -> 记录ID -> (快照的版本号, JSON片段)
+        self.version = 0  # 快照版本号，每次发布快照时递增
+        self.epoch = uuid.uuid4().hex[:8]  # 版本号序列的标识，重新恢复后更换，不同进程的版本号互不相同
+        self._journal = collections.deque(maxlen=CHANGE_JOURNAL_SIZE)  # (版本号, 类型, ID, 操作)
+        self._journal_base = 0  # 变更日志覆盖该版本号之后的全部变更（日志未被截断时）
+        self._kind_versions = {'tasks': 0, 'task_groups': 0}  # 任务/任务组列表最后一次变化时的版本号
+        self.events = EventBroadcaster(EVENT_MAX_CLIENTS)  # 把变更推送给订阅的浏览器
         self.scheduler = None
+        self.store = None  # 持久化存储，为None时只保存在内存中
+        self.trigger_configs = {}  # 任务/任务组ID -> 启动时使用的触发器配置
+        self._snapshot_since = None  # 只读副本上次从存储读取到的记录写入时间
+        self.run_history = RunHistory()  # 每个任务/任务组最近的运行记录
+        self.manual_executor = BoundedExecutor(MANUAL_RUN_WORKERS, MANUAL_RUN_QUEUE, 'ManualRun')  # 立即执行使用的线程池
+        self.run_handles = RunHandles()  # 立即执行的运行ID -> 运行状态
+        self.results = ResultStore(RESULT_MEMORY_LIMIT, RESULT_DISK_LIMIT, directory=RESULT_DIR)  # 运行ID -> 任务返回值
+        self.misfire_counts = {}  # 任务/任务组ID -> 错过执行的次数
+        self.fire_times = FireTimeCache()  # 触发器配置 -> 展开的触发时间，用于预览
+        self.work_queue = None  # 设置后调度器触发时只把运行请求写入工作队列
         self.task_logger = self._setup_task_logger()
     
     def _setup_task_logger(self):
@@ -216,13 +761,1175 @@ class TaskManager:
             task_logger.addHandler(handler)
             task_logger.setLevel(logging.INFO)
         
-        return task_logger
+        return task_logger
+    
+    def set_scheduler(self, scheduler):
+        """设置调度器"""
+        self.scheduler = scheduler
+        scheduler.add_listener(self._on_job_missed, EVENT_JOB_MISSED)
+    
+    @synchronized
+    def _on_job_missed(self, event):
+        """调度器错过执行时间（超出容错时间）的事件回调"""
+        metrics.SCHEDULER_MISFIRES.inc()
+        owner_id = event.job_id[len('group_'):] if event.job_id.startswith('group_') else event.job_id
+        self.misfire_counts[owner_id] = self.misfire_counts.get(owner_id, 0) + 1
+        self.task_logger.warning(f"错过了计划执行: 作业 {event.job_id}, 计划时间: {event.scheduled_run_time.isoformat()}")
+    
+    def get_schedule_lag(self, owner_id):
+        """获取任务或任务组的调度延迟统计和错过执行次数（只读快照，不获取写锁）"""
+        view = self._task_views.get(owner_id) or self._group_views.get(owner_id)
+        if view is None:
+            return {'error': '任务或任务组不存在'}, 404
+        policy = view.misfire_policy
+        config = self.trigger_configs.get(owner_id) or {}
+        return {
+            'id': owner_id,
+            'misfire_policy': policy,
+            'misfire_grace_time': self._misfire_options(config).get('misfire_grace_time') if config else None,
+            'misfires': self.misfire_counts.get(owner_id, 0),
+            'lag': self.run_history.get_lag_stats(owner_id)
+        }
+    
+    def get_schedule_load(self, window=3600, bucket=1):
+        """统计调度器中所有作业接下来一段时间内每个时间段预计的触发次数
+        
+        Args:
+            window: 统计时长（秒）
+            bucket: 每个时间段的长度（秒）
+        
+        Returns:
+            包含每个时间段触发次数和峰值的字典，或(错误信息, 状态码)
+        """
+        if window <= 0 or window > MAX_LOAD_WINDOW:
+            return {'error': f'window必须在1到{MAX_LOAD_WINDOW}秒之间'}, 400
+        if bucket <= 0 or window / bucket > MAX_LOAD_BUCKETS:
+            return {'error': f'bucket必须大于0，且时间段数不超过{MAX_LOAD_BUCKETS}'}, 400
+        if self.scheduler is None:
+            return {'error': '调度器未设置'}, 503
+        
+        start = datetime.datetime.now(datetime.timezone.utc)
+        jobs = [(job.trigger, getattr(job, 'next_run_time', None)) for job in self.scheduler.get_jobs()]
+        counts = load_histogram(jobs, start, window, bucket)
+        total = sum(counts)
+        peak = max(counts, default=0)
+        return {
+            'start': start.isoformat(),
+            'window': window,
+            'bucket': bucket,
+            'jobs': len(jobs),
+            'total': total,
+            'mean': total / len(counts),
+            'peak': peak,
+            'peak_at': (start + datetime.timedelta(seconds=counts.index(peak) * bucket)).isoformat() if peak else None,
+            'counts': counts
+        }
+    
+    def _scheduled_job(self, owner_id, kind):
+        """获取任务或任务组在调度器中的作业，未调度或已暂停时返回None"""
+        if self.scheduler is None:
+            return None
+        job = self.scheduler.get_job(owner_id if kind == 'task' else f'group_{owner_id}')
+        if job is None or getattr(job, 'next_run_time', None) is None:
+            return None
+        return job
+    
+    def get_fire_preview(self, owner_id, count=10):
+        """获取任务或任务组接下来的触发时间
+        
+        按调度器中作业的触发器展开，展开结果按触发器配置缓存，配置相同的任务共用。
+        
+        Args:
+            owner_id: 任务ID或任务组ID
+            count: 返回的触发次数
+        
+        Returns:
+            包含触发时间列表的字典，或(错误信息, 状态码)
+        """
+        if count <= 0 or count > MAX_PREVIEW_COUNT:
+            return {'error': f'count必须在1到{MAX_PREVIEW_COUNT}之间'}, 400
+        if owner_id in self._task_views:
+            kind, status = 'task', self._task_views[owner_id].status
+        elif owner_id in self._group_views:
+            kind, status = 'task_group', self._group_views[owner_id].status
+        else:
+            return {'error': '任务或任务组不存在'}, 404
+        
+        job = self._scheduled_job(owner_id, kind)
+        fires = []
+        if job is not None:
+            start = datetime.datetime.now(datetime.timezone.utc)
+            fires = [format_timestamp(timestamp, aware=True)
+                     for timestamp in itertools.islice(self.fire_times.iter_fires(job.trigger, start), count)]
+        return {'id': owner_id, 'type': kind, 'status': status, 'fires': fires}
+    
+    def get_fire_schedule(self, start=None, end=None, limit=1000):
+        """获取一段时间内所有任务和任务组的触发时间，按时间顺序合并
+        
+        每个作业的触发时间按需逐个展开，用heapq.merge合并成一个有序序列，
+        达到limit条后不再展开后面的触发时间。
+        
+        Args:
+            start: 开始时间（ISO格式），默认为当前时间，早于当前时间时从当前时间开始
+            end: 结束时间（ISO格式），默认为开始时间后1小时
+            limit: 最多返回的条数
+        
+        Returns:
+            包含触发时间列表的字典，或(错误信息, 状态码)
+        """
+        if limit <= 0 or limit > MAX_SCHEDULE_LIMIT:
+            return {'error': f'limit必须在1到{MAX_SCHEDULE_LIMIT}之间'}, 400
+        try:
+            start_ts = max(parse_timestamp(start) or 0, time.time())
+            end_ts = parse_timestamp(end) if end else start_ts + 3600
+        except ValueError:
+            return {'error': '时间格式无效，请使用ISO格式'}, 400
+        if end_ts <= start_ts:
+            return {'error': '结束时间必须晚于开始时间'}, 400
+        
+        jobs = self.scheduler.get_jobs() if self.scheduler is not None else []
+        start_time = datetime.datetime.fromtimestamp(start_ts, datetime.timezone.utc)
+        streams = []
+        for job in jobs:
+            if getattr(job, 'next_run_time', None) is None:
+                continue
+            kind, owner_id = ('task_group', job.id[len('group_'):]) if job.id.startswith('group_') else ('task', job.id)
+            fires = itertools.takewhile(lambda timestamp: timestamp < end_ts,
+                                        self.fire_times.iter_fires(job.trigger, start_time))
+            streams.append(zip(fires, itertools.repeat(kind), itertools.repeat(owner_id)))
+        items = list(itertools.islice(heapq.merge(*streams), limit + 1))
+        
+        fires = []
+        for timestamp, kind, owner_id in items[:limit]:
+            view = self._task_views.get(owner_id) if kind == 'task' else self._group_views.get(owner_id)
+            name = view.name if view is not None else None
+            fires.append({'time': format_timestamp(timestamp, aware=True), 'type': kind, 'id': owner_id, 'name': name})
+        return {
+            'from': format_timestamp(start_ts, aware=True),
+            'to': format_timestamp(end_ts, aware=True),
+            'fires': fires,
+            'truncated': len(items) > limit
+        }
+    
+    def _average_duration(self, owner_id):
+        """运行历史中的平均执行耗时（秒），没有运行记录时返回None"""
+        return self.run_history.get_stats(owner_id)['mean']
+    
+    def simulate_schedule(self, pool_sizes=None, hours=24, default_duration=1.0):
+        """用虚拟时钟模拟当前处于运行状态的任务和任务组在不同线程池大小下的执行情况
+        
+        使用调度器中作业的触发器（不在调度器中时按_build_trigger()重新构建），展开接下来hours小时内的触发时间，
+        每次运行的耗时使用运行历史中的平均耗时，不执行任何任务。任务组没有运行记录时
+        使用组内任务平均耗时之和。
+        
+        Args:
+            pool_sizes: 要比较的线程池大小列表，默认为SIMULATION_POOL_SIZES
+            hours: 模拟时长（小时）
+            default_duration: 没有运行记录时使用的耗时（秒）
+        
+        Returns:
+            模拟结果字典，或(错误信息, 状态码)
+        """
+        pool_sizes = pool_sizes or SIMULATION_POOL_SIZES
+        if any(size <= 0 for size in pool_sizes):
+            return {'error': '线程池大小必须大于0'}, 400
+        if hours <= 0 or hours > MAX_SIMULATION_HOURS:
+            return {'error': f'hours必须在0到{MAX_SIMULATION_HOURS}之间'}, 400
+        if default_duration < 0:
+            return {'error': 'default_duration不能小于0'}, 400
+        
+        with self._lock:
+            owners = [(task_id, 'task', ()) for task_id in self._task_index['status'].get('running', ())]
+            owners += [(group_id, 'task_group', tuple(self.task_groups[group_id].task_ids))
+                       for group_id in self._group_index['status'].get('running', ())]
+            configs = {owner_id: self.trigger_configs.get(owner_id) for owner_id, _, _ in owners}
+        
+        jobs = []
+        estimated = 0
+        for owner_id, kind, task_ids in owners:
+            config = configs[owner_id]
+            if not config:
+                continue
+            # 优先使用调度器中作业的触发器（保留间隔触发的实际相位），只读副本中重新构建
+            job = self.scheduler.get_job(owner_id if kind == 'task' else f'group_{owner_id}') \
+                if self.scheduler is not None else None
+            trigger = job.trigger if job is not None else self._build_trigger(config, owner_id)
+            options = self._misfire_options(config)
+            if isinstance(trigger, dict) or 'error' in options:
+                continue
+            duration = self._average_duration(owner_id)
+            if duration is None and task_ids:
+                member_durations = [self._average_duration(task_id) for task_id in task_ids]
+                if all(value is not None for value in member_durations):
+                    duration = sum(member_durations)
+            if duration is None:
+                duration = default_duration
+                estimated += 1
+            grace_time = options['misfire_grace_time'] if options else DEFAULT_MISFIRE_GRACE_TIME
+            jobs.append(SimulatedJob(owner_id, kind, trigger, duration, grace_time))
+        
+        start = datetime.datetime.now(datetime.timezone.utc)
+        result = simulate(jobs, pool_sizes, start, start + datetime.timedelta(hours=hours), MAX_SIMULATED_RUNS)
+        if result is None:
+            return {'error': f'模拟时长内的触发次数超过{MAX_SIMULATED_RUNS}次，请缩短模拟时长'}, 400
+        result['estimated_durations'] = estimated
+        return result
+    
+    def set_store(self, store, persist_runs=True):
+        """设置持久化存储
+        
+        Args:
+            store: TaskStore对象
+            persist_runs: 是否同时持久化运行历史
+        """
+        self.store = store
+        if persist_runs:
+            self.run_history.set_store(store)
+    
+    def set_work_queue(self, work_queue):
+        """设置工作队列，之后加入调度器的作业在触发时只写入队列，由工作进程执行
+        
+        Args:
+            work_queue: WorkQueue对象
+        """
+        self.work_queue = work_queue
+    
+    def _enqueue_job(self, owner_id):
+        """生成把运行请求写入工作队列的作业函数"""
+        def enqueue_func():
+            scheduled_time = take_scheduled_time()
+            self.work_queue.enqueue(owner_id, scheduled_time.timestamp() if scheduled_time else time.time())
+        return enqueue_func
+    
+    def execute_queued(self, owner_id, scheduled):
+        """在工作进程中执行一个从工作队列取出的运行请求
+        
+        Args:
+            owner_id: 任务ID或任务组ID
+            scheduled: 计划执行时间（时间戳）
+        
+        Returns:
+            执行失败时返回错误信息，成功返回None
+        """
+        task_group = self.task_groups.get(owner_id)
+        if task_group is not None:
+            return None if self._run_scheduled_group(task_group, scheduled) else '任务组执行失败'
+        
+        task = self.tasks.get(owner_id)
+        if task is None:
+            # 任务在排队期间被删除，丢弃该运行请求
+            self.task_logger.warning(f"任务或任务组已不存在，丢弃排队的运行: {owner_id}")
+            return None
+        func = self._get_function(task.function)
+        if not func:
+            return f"找不到函数: {task.function}"
+        _, error = self._run_scheduled_task(owner_id, func, scheduled)
+        return f"{type(error).__name__}: {error}" if error is not None else None
+    
+    def _publish_task(self, task_id):
+        """发布任务的只读快照并更新索引（在写锁内调用），任务已删除时移除快照"""
+        old = self._task_views.get(task_id)
+        task = self.tasks.get(task_id)
+        if task is None:
+            self._task_views.pop(task_id, None)
+            self._drop_fragments('tasks', task_id)
+            if old is not None:
+                self._reindex(self._task_index, self._task_order, task_id, old.created_at,
+                              self._task_index_values(old), None)
+        else:
+            # 浅拷贝即可：args只会被整体替换，执行时_process_task_args在深拷贝上替换引用
+            view = task.copy()
+            self._task_views[task_id] = view
+            self._reindex(self._task_index, self._task_order, task_id, task.created_at,
+                          self._task_index_values(old) if old is not None else None, self._task_index_values(view))
+        self._record_change('tasks', task_id, self._change_op(
+            (old.status, old.run_count) if old is not None else None,
+            (task.status, task.run_count) if task is not None else None))
+        # 先替换快照再更新版本号，读取时版本号没有变化说明快照与它对应
+        if task is None:
+            self._view_versions['tasks'].pop(task_id, None)
+        else:
+            self._view_versions['tasks'][task_id] = self.version
+    
+    def _publish_group(self, task_group):
+        """发布任务组的只读快照并更新索引（在写锁内调用），任务组已删除时移除快照"""
+        old = self._group_views.get(task_group.id)
+        if task_group.id not in self.task_groups:
+            self._group_views.pop(task_group.id, None)
+            self._drop_fragments('task_groups', task_group.id)
+            if old is not None:
+                self._reindex(self._group_index, self._group_order, task_group.id, task_group.created_at,
+                              {'status': old.status}, None)
+        else:
+            view = task_group.copy()
+            self._group_views[task_group.id] = view
+            self._reindex(self._group_index, self._group_order, task_group.id, task_group.created_at,
+                          {'status': old.status} if old is not None else None, {'status': view.status})
+        old_task_ids = old.task_ids if old is not None else []
+        new_task_ids = task_group.task_ids if task_group.id in self.task_groups else []
+        if old_task_ids != new_task_ids:
+            self._update_memberships(task_group.id, old_task_ids, new_task_ids)
+        self._record_change('task_groups', task_group.id, self._change_op(
+            (old.status, old.run_count) if old is not None else None,
+            (task_group.status, task_group.run_count) if task_group.id in self.task_groups else None))
+        if task_group.id in self.task_groups:
+            self._view_versions['task_groups'][task_group.id] = self.version
+        else:
+            self._view_versions['task_groups'].pop(task_group.id, None)
+    
+    def _update_memberships(self, group_id, old_task_ids, new_task_ids):
+        """任务组的任务列表变化后更新任务到任务组的反向索引（在写锁内调用）
+        
+        每个任务对应的任务组ID保存为不可变的元组，修改时替换整个元组，读取时不需要获取写锁。
+        一个任务通常只属于少数几个任务组，元组比集合占用的内存少得多，查找和修改的开销只与
+        该任务所属的任务组数有关，与任务组总数无关。
+        """
+        old_ids, new_ids = set(old_task_ids), set(new_task_ids)
+        for task_id in old_ids - new_ids:
+            group_ids = tuple(member for member in self._memberships.get(task_id, ()) if member != group_id)
+            if group_ids:
+                self._memberships[task_id] = group_ids
+            else:
+                self._memberships.pop(task_id, None)
+        for task_id in new_ids - old_ids:
+            self._memberships[task_id] = self._memberships.get(task_id, ()) + (group_id,)
+    
+    def _publish_all(self, incremental=False):
+        """重新发布所有任务和任务组的快照并重建索引（恢复或重新加载后调用）
+        
+        Args:
+            incremental: 与当前快照逐条比较，内容没有变化的记录沿用原快照（缓存的JSON片段
+                继续有效），有变化的记录写入变更日志；为False时清空变更日志并更换epoch
+        """
+        if not incremental:
+            task_views = {task_id: task.copy() for task_id, task in self.tasks.items()}
+            group_views = {group_id: task_group.copy() for group_id, task_group in self.task_groups.items()}
+        else:
+            task_views, group_views = {}, {}
+            view_versions = {'tasks': {}, 'task_groups': {}}
+            for task_id, task in self.tasks.items():
+                old = self._task_views.get(task_id)
+                if old is not None and all(getattr(old, slot) == getattr(task, slot) for slot in TaskRecord.__slots__):
+                    task_views[task_id] = old
+                    view_versions['tasks'][task_id] = self._view_versions['tasks'].get(task_id)
+                    continue
+                task_views[task_id] = task.copy()
+                self._record_change('tasks', task_id, self._change_op(
+                    (old.status, old.run_count) if old is not None else None, (task.status, task.run_count)))
+                view_versions['tasks'][task_id] = self.version
+            for group_id, task_group in self.task_groups.items():
+                old = self._group_views.get(group_id)
+                if old is not None and task_group.same_as(old):
+                    group_views[group_id] = old
+                    view_versions['task_groups'][group_id] = self._view_versions['task_groups'].get(group_id)
+                    continue
+                group_views[group_id] = task_group.copy()
+                self._record_change('task_groups', group_id, self._change_op(
+                    (old.status, old.run_count) if old is not None else None,
+                    (task_group.status, task_group.run_count)))
+                view_versions['task_groups'][group_id] = self.version
+            for kind, old_views, new_views in (('tasks', self._task_views, task_views),
+                                               ('task_groups', self._group_views, group_views)):
+                for record_id in old_views.keys() - new_views.keys():
+                    self._drop_fragments(kind, record_id)
+                    self._record_change(kind, record_id, 'delete')
+        task_index, task_order = {'status': {}, 'function': {}}, []
+        for task_id, view in task_views.items():
+            self._reindex(task_index, task_order, task_id, view.created_at, None, self._task_index_values(view))
+        group_index, group_order = {'status': {}}, []
+        for group_id, view in group_views.items():
+            self._reindex(group_index, group_order, group_id, self.task_groups[group_id].created_at,
+                          None, {'status': view.status})
+        memberships = {}
+        for group_id, view in group_views.items():
+            for task_id in view.task_ids:
+                memberships.setdefault(task_id, set()).add(group_id)
+        self._task_views, self._task_index, self._task_order = task_views, task_index, task_order
+        self._group_views, self._group_index, self._group_order = group_views, group_index, group_order
+        self._memberships = {task_id: tuple(group_ids) for task_id, group_ids in memberships.items()}
+        if incremental:
+            self._view_versions = view_versions
+        else:
+            self._fragment_caches = {}
+            self.version += 1
+            self._view_versions = {'tasks': dict.fromkeys(task_views, self.version),
+                                   'task_groups': dict.fromkeys(group_views, self.version)}
+            self.epoch = uuid.uuid4().hex[:8]
+            self._journal.clear()
+            self._journal_base = self.version
+            self._kind_versions = {'tasks': self.version, 'task_groups': self.version}
+            self.events.reset()
+    
+    @staticmethod
+    def _change_op(old_state, new_state):
+        """根据修改前后的(状态, 执行次数)判断变更类型，新增或删除时对应的一方为None"""
+        if old_state is None:
+            return 'create'
+        if new_state is None:
+            return 'delete'
+        if old_state[0] != new_state[0]:
+            return 'status'
+        if old_state[1] != new_state[1]:
+            return 'run'
+        return 'update'
+    
+    def _record_change(self, kind, record_id, op):
+        """递增版本号并写入变更日志（在写锁内调用）"""
+        self.version += 1
+        self._kind_versions[kind] = self.version
+        self._journal.append((self.version, kind, record_id, op))
+        self.events.publish(self.version, kind, record_id, op)
+    
+    def list_etag(self, kind):
+        """任务或任务组列表的ETag，列表中任意记录变化后改变
+        
+        应在生成列表之前获取，这样ETag不会比列表内容新。
+        """
+        return f'{self.epoch}-{self._kind_versions[kind]}'
+    
+    def get_changes(self, since, epoch=None):
+        """获取某个版本之后的变更（不获取写锁）
+        
+        同一条记录的多次变更合并为一条，返回记录当前的内容（已删除的记录为None）。
+        版本号来自其他进程或恢复之前（epoch不同）、或者所需的变更已被移出日志时，
+        返回reset为True，客户端需要重新获取完整列表。
+        
+        Args:
+            since: 客户端已经同步到的版本号
+            epoch: 客户端版本号所属的epoch
+        
+        Returns:
+            包含epoch、当前版本号、reset和变更列表的字典
+        """
+        version = self.version
+        current_epoch = self.epoch
+        journal = list(self._journal)
+        if len(journal) == self._journal.maxlen:
+            covered_from = journal[0][0] - 1
+        else:
+            covered_from = self._journal_base
+        if (epoch and epoch != current_epoch) or since < covered_from or since > version:
+            return {'epoch': current_epoch, 'version': version, 'reset': True, 'changes': []}
+        
+        latest = {}
+        for change_version, kind, record_id, op in journal:
+            if change_version > since:
+                # 重新插入，使合并后的变更按最后一次变更的先后排列
+                latest.pop((kind, record_id), None)
+                latest[(kind, record_id)] = (change_version, op)
+        changes = []
+        for (kind, record_id), (change_version, op) in latest.items():
+            if kind == 'tasks':
+                view = self._task_views.get(record_id)
+                data = view.to_dict() if view is not None else None
+            else:
+                view = self._group_views.get(record_id)
+                data = view.to_dict() if view is not None else None
+            changes.append({'type': kind, 'id': record_id, 'op': op, 'version': change_version, 'data': data})
+            version = max(version, change_version)
+        return {'epoch': current_epoch, 'version': version, 'reset': False, 'changes': changes}
+    
+    def changes_json(self, reset, changes):
+        """生成推送给浏览器的变更事件（不获取写锁）
+        
+        格式与get_changes()相同，记录内容只包含EVENT_FIELDS中的字段，使用列表接口的JSON片段缓存。
+        
+        Args:
+            reset: 是否需要客户端重新获取完整列表
+            changes: [(类型, ID, 版本号, 操作)]
+        
+        Returns:
+            (事件ID, JSON字符串)，事件ID由epoch和版本号组成，客户端重连时据此补发错过的变更
+        """
+        version, epoch = self.version, self.epoch
+        parts = []
+        if not reset:
+            for kind, record_id, change_version, op in changes:
+                # 先读版本号表再读快照表（与_query()相同的顺序）
+                versions = self._view_versions[kind]
+                if kind == 'tasks':
+                    views, to_dict = self._task_views, TaskRecord.to_dict
+                else:
+                    views, to_dict = self._group_views, TaskGroup.to_dict
+                view = views.get(record_id)
+                data = 'null' if view is None else self._fragment(
+                    self._fragment_cache(kind, EVENT_FIELDS[kind]), views, versions, record_id, view,
+                    EVENT_FIELDS[kind], to_dict)
+                parts.append(f'{{"type": "{kind}", "id": {json.dumps(record_id)}, "op": "{op}", '
+                             f'"version": {change_version}, "data": {data}}}')
+                version = max(version, change_version)
+        return (f'{epoch}-{version}', f'{{"epoch": "{epoch}", "version": {version}, '
+                f'"reset": {json.dumps(reset)}, "changes": [{", ".join(parts)}]}}')
+    
+    @staticmethod
+    def _task_index_values(view):
+        return {'status': view.status, 'function': view.function}
+    
+    @staticmethod
+    def _reindex(index, order, record_id, created_at, old_values, new_values):
+        """更新二级索引和排序键（在写锁内调用）
+        
+        Args:
+            index: 字段 -> 字段值 -> 记录ID集合
+            order: 按(创建时间, 记录ID)排序的列表，用于游标分页
+            record_id: 记录ID
+            created_at: 记录的创建时间（时间戳）
+            old_values: 修改前被索引的字段值，新增记录时为None
+            new_values: 修改后被索引的字段值，删除记录时为None
+        """
+        for field, values in index.items():
+            old_value = old_values[field] if old_values is not None else None
+            new_value = new_values[field] if new_values is not None else None
+            if old_values is not None and new_values is not None and old_value == new_value:
+                continue
+            if old_values is not None:
+                ids = values.get(old_value)
+                if ids is not None:
+                    ids.discard(record_id)
+                    if not ids:
+                        del values[old_value]
+            if new_values is not None:
+                values.setdefault(new_value, set()).add(record_id)
+        key = (created_at, record_id)
+        if old_values is None and new_values is not None:
+            bisect.insort(order, key)
+        elif old_values is not None and new_values is None:
+            position = bisect.bisect_left(order, key)
+            if position < len(order) and order[position] == key:
+                del order[position]
+    
+    def _drop_fragments(self, kind, record_id):
+        """删除记录在所有字段投影下缓存的JSON片段（在写锁内调用）"""
+        for (cache_kind, _), cache in list(self._fragment_caches.items()):
+            if cache_kind == kind:
+                cache.pop(record_id, None)
+    
+    def _fragment_cache(self, kind, fields):
+        """获取某种字段投影的JSON片段缓存"""
+        cache = self._fragment_caches.get((kind, fields))
+        if cache is None:
+            # 字段组合数量有上限，超出后不再为新的组合建立缓存
+            cache = {} if len(self._fragment_caches) >= MAX_PROJECTIONS \
+                else self._fragment_caches.setdefault((kind, fields), {})
+        return cache
+    
+    @staticmethod
+    def _fragment(cache, views, versions, record_id, view, fields, to_dict):
+        """返回快照在字段投影下的JSON片段，缓存的片段与当前快照的版本号相同时直接使用缓存
+        
+        缓存中只保存版本号，不引用快照本身，记录修改后旧快照（及其中的大对象）可以立即释放。
+        """
+        version = versions.get(record_id)
+        cached = cache.get(record_id)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        data = to_dict(view)
+        if fields:
+            data = {field: data[field] for field in fields if field in data}
+        fragment = json.dumps(data)
+        # 序列化期间记录可能已被修改或删除，只缓存快照和版本号都没有变化的片段
+        if version is not None and views.get(record_id) is view and versions.get(record_id) == version:
+            cache[record_id] = (version, fragment)
+        return fragment
+    
+    def _query(self, kind, versions, views, records, index, order, filters, member_ids, name_prefix, fields, limit,
+               cursor, get_field, to_dict):
+        """按过滤条件、游标和字段投影查询任务或任务组，返回JSON响应体
+        
+        读取过程不获取写锁：索引集合和排序列表在C层的单次操作中复制后使用。有状态、函数等
+        过滤条件时只从索引集合中取候选记录，不扫描全部记录；索引和快照可能不是同时读取的，
+        候选记录会再用快照核对一次。结果按(创建时间, ID)排序，游标为上一页最后一条记录的排序键。
+        
+        快照发布后不再修改，每次发布时记下当时的版本号：每个快照在每种字段投影下的JSON片段
+        在第一次被读取时生成并按版本号缓存，记录修改后发布了新快照，版本号不同时才重新序列化。
+        列表接口的耗时因此只取决于返回的记录数和发生过修改的记录。
+        
+        Args:
+            kind: tasks或task_groups，也是响应中列表字段的名称
+            versions: 记录ID -> 快照的版本号，必须在views之前读取（发布时先替换快照再更新版本号）
+            views: 记录ID -> 快照
+            records: 记录ID -> 记录对象（用于读取不变的创建时间）
+            index: 字段 -> 字段值 -> 记录ID集合
+            order: 按(创建时间, 记录ID)排序的列表
+            filters: 字段 -> 允许的字段值列表（只包含index中的字段）
+            member_ids: 只在这些ID中查找，为None时不限制
+            name_prefix: 名称前缀
+            fields: 返回的字段元组，为None时返回全部字段
+            limit: 每页记录数，为None时返回全部
+            cursor: 上一页返回的next_cursor
+            get_field: 从快照读取字段值的函数
+            to_dict: 把快照转换为字典的函数
+        
+        Returns:
+            JSON响应体，参数错误时返回(错误信息, 400)
+        """
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            return {'error': f'limit必须在1到{MAX_PAGE_SIZE}之间'}, 400
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if after is None:
+                return {'error': '无效的游标'}, 400
+        
+        version, epoch = self.version, self.epoch
+        candidates = None
+        for field, values in filters.items():
+            ids = set()
+            for value in values:
+                ids |= index[field].get(value, set())
+            candidates = ids if candidates is None else candidates & ids
+        if member_ids is not None:
+            candidates = set(member_ids) if candidates is None else candidates & set(member_ids)
+        
+        if candidates is None:
+            keys = list(order)
+        else:
+            keys = []
+            for record_id in candidates:
+                record = records.get(record_id)
+                if record is not None:
+                    keys.append((record.created_at, record_id))
+            keys.sort()
+        
+        page, next_cursor = [], None
+        for key in keys[bisect.bisect_right(keys, after) if after else 0:]:
+            view = views.get(key[1])
+            if view is None:
+                continue
+            if filters and any(get_field(view, field) not in values for field, values in filters.items()):
+                continue
+            if name_prefix and not get_field(view, 'name').startswith(name_prefix):
+                continue
+            if limit is not None and len(page) == limit:
+                # 还有下一条符合条件的记录时才返回游标
+                next_cursor = encode_cursor(last_key)
+                break
+            page.append((key[1], view))
+            last_key = key
+        
+        cache = self._fragment_cache(kind, fields)
+        parts = [self._fragment(cache, views, versions, record_id, view, fields, to_dict) for record_id, view in page]
+        return (f'{{"{kind}": [{", ".join(parts)}], "version": {version}, "epoch": "{epoch}", '
+                f'"next_cursor": {json.dumps(next_cursor)}}}\n')
+    
+    def _persist_task(self, task_id):
+        """发布任务快照并保存到持久化存储（批量延迟写入）"""
+        self._publish_task(task_id)
+        if self.store is None:
+            return
+        task = self.tasks.get(task_id)
+        if task is None:
+            self.store.delete('tasks', task_id)
+        else:
+            # 存储在后台线程中不加锁地序列化，参数需要复制
+            record = task.to_dict()
+            record['args'] = copy.deepcopy(task.args)
+            self.store.save('tasks', task_id, {'task': record, 'trigger': self.trigger_configs.get(task_id)})
+    
+    def _persist_group(self, task_group):
+        """发布任务组快照并保存到持久化存储（批量延迟写入）"""
+        self._publish_group(task_group)
+        if self.store is None:
+            return
+        if task_group.id not in self.task_groups:
+            self.store.delete('task_groups', task_group.id)
+        else:
+            self.store.save('task_groups', task_group.id,
+                            {'group': task_group.to_record(), 'trigger': self.trigger_configs.get(task_group.id)})
+    
+    def _record_run(self, owner_id, run_id, scheduled, started, result=None, error=None, source='schedule',
+                    profile=None):
+        """记录一次运行的结果到运行历史
+        
+        Args:
+            owner_id: 任务ID或任务组ID
+            run_id: 运行ID
+            scheduled: 计划执行时间（时间戳）
+            started: 开始时间（时间戳）
+            result: 任务返回值
+            error: 执行中抛出的异常
+            source: 触发来源，schedule、manual或group
+            profile: 性能分析文件路径
+        
+        Returns:
+            保存的返回值序列化后的字节数，没有保存时返回None
+        """
+        stored_size = None if result is None else self.results.put(run_id, result)
+        if error is not None:
+            status, error_class = 'error', type(error).__name__
+        elif isinstance(result, dict) and result.get('success') is False:
+            # http_request不抛出异常，而是返回失败结果
+            status, error_class = 'error', 'HTTPError' if 'status_code' in result else 'RequestError'
+        else:
+            status, error_class = 'success', None
+        ended = time.time()
+        self.run_history.record(owner_id, run_id, scheduled, started, ended, status,
+                                result_size(result), error_class, source, profile)
+        
+        task = self.tasks.get(owner_id)
+        function_name = task.function if task else ''
+        metrics.TASK_RUNS.labels(function_name, status).inc()
+        metrics.TASK_DURATION.labels(function_name).observe(ended - started)
+        return stored_size
+    
+    def get_runs(self, owner_id, limit=100):
+        """获取任务或任务组的运行历史及延迟统计"""
+        if owner_id not in self.tasks and owner_id not in self.task_groups:
+            return {'error': '任务或任务组不存在'}, 404
+        runs = self.run_history.get_runs(owner_id, limit)
+        for run in runs:
+            if run['run_id'] in self.results:
+                run['result'] = f"/api/runs/{run['run_id']}/result"
+        return {
+            'runs': runs,
+            'stats': self.run_history.get_stats(owner_id)
+        }
+    
+    def _load_records(self, store):
+        """读取存储中的所有任务和任务组
+        
+        Returns:
+            (任务字典, 任务组字典, 触发器配置字典)
+        """
+        task_records, group_records = store.load_all()
+        tasks, task_groups, trigger_configs = {}, {}, {}
+        for record in task_records:
+            task = TaskRecord.from_record(record['task'])
+            tasks[task.id] = task
+            if record.get('trigger'):
+                trigger_configs[task.id] = record['trigger']
+        for record in group_records:
+            task_group = TaskGroup.from_record(record['group'], scheduler=self.scheduler, task_manager=self)
+            task_groups[task_group.id] = task_group
+            if record.get('trigger'):
+                trigger_configs[task_group.id] = record['trigger']
+        return tasks, task_groups, trigger_configs
+    
+    @synchronized
+    def load_snapshot(self, store, include_runs=True, incremental=False):
+        """从存储重新读取所有任务、任务组和运行历史作为只读副本，不调度任何作业
+        
+        新数据先在局部变量中构建好再整体替换，快照也整体替换，正在处理的读请求不会看到一半的状态。
+        
+        Args:
+            store: TaskStore对象（只读取，不写入）
+            include_runs: 是否同时重新读取运行历史
+            incremental: 只重新解析上次加载之后写入的记录，其余记录沿用当前副本
+                （从进程在每次运行都会写入数据库的情况下定期刷新时使用）
+        """
+        since = self._snapshot_since if incremental else None
+        task_records, group_records, task_ids, group_ids, self._snapshot_since = store.load_since(since)
+        changed_tasks, changed_groups, changed_configs = {}, {}, {}
+        for record in task_records:
+            task = TaskRecord.from_record(record['task'])
+            changed_tasks[task.id] = task
+            changed_configs[task.id] = record.get('trigger')
+        for record in group_records:
+            task_group = TaskGroup.from_record(record['group'], scheduler=self.scheduler, task_manager=self)
+            changed_groups[task_group.id] = task_group
+            changed_configs[task_group.id] = record.get('trigger')
+        
+        if since is not None and not (set(task_ids) - changed_tasks.keys() <= self.tasks.keys()
+                                      and set(group_ids) - changed_groups.keys() <= self.task_groups.keys()):
+            # 当前副本不是由存储加载的（例如刚放弃了主进程身份），重新全量加载
+            return self.load_snapshot(store, include_runs)
+        # 没有变化的记录沿用当前副本；全量加载时since为None，所有记录都在changed中
+        tasks = {task_id: changed_tasks.get(task_id) or self.tasks[task_id] for task_id in task_ids}
+        task_groups = {group_id: changed_groups.get(group_id) or self.task_groups[group_id] for group_id in group_ids}
+        trigger_configs = {}
+        for owner_id in itertools.chain(task_ids, group_ids):
+            config = changed_configs[owner_id] if owner_id in changed_configs else self.trigger_configs.get(owner_id)
+            if config:
+                trigger_configs[owner_id] = config
+        if include_runs:
+            run_history = RunHistory(self.run_history.capacity)
+            run_history.load(store.load_runs())
+            self.run_history = run_history
+        self.tasks, self.task_groups, self.trigger_configs = tasks, task_groups, trigger_configs
+        self._publish_all(incremental=True)
+    
+    @synchronized
+    def apply_run_report(self, report):
+        """应用其他调度节点上报的一次运行
+        
+        更新任务或任务组的执行次数和最后执行时间，并把运行记录写入运行历史。
+        
+        Args:
+            report: 运行记录字典，字段与运行历史的持久化记录相同
+        
+        Returns:
+            是否找到对应的任务或任务组
+        """
+        owner_id = report['owner_id']
+        last_run = report['started']
+        task = self.tasks.get(owner_id)
+        task_group = self.task_groups.get(owner_id)
+        if task is not None:
+            task.run_count += 1
+            task.last_run = last_run
+            self._persist_task(owner_id)
+            metrics.TASK_RUNS.labels(task.function, report['status']).inc()
+            metrics.TASK_DURATION.labels(task.function).observe(report['ended'] - report['started'])
+        elif task_group is not None:
+            task_group.run_count += 1
+            task_group.last_run = last_run
+            task_group.status = 'error' if report['status'] == 'error' else 'completed'
+            self._persist_group(task_group)
+            metrics.GROUP_RUNS.labels(report['status']).inc()
+            metrics.GROUP_DURATION.observe(report['ended'] - report['started'])
+        else:
+            return False
+        
+        self.run_history.record(owner_id, report['run_id'], report['scheduled'], report['started'],
+                                report['ended'], report['status'], report['size'], report['error_class'],
+                                report['source'])
+        return True
+    
+    @synchronized
+    def schedule_saved(self, owner_id):
+        """按保存的触发器配置把任务或任务组加入调度器
+        
+        Args:
+            owner_id: 任务ID或任务组ID
+        
+        Returns:
+            调度器中的作业对象，无法调度时返回包含错误信息的字典
+        """
+        config = self.trigger_configs.get(owner_id)
+        if not config:
+            return {'error': '缺少触发器配置'}
+        trigger = self._build_trigger(config, owner_id)
+        if isinstance(trigger, dict):
+            return trigger
+        job_options = self._misfire_options(config)
+        if 'error' in job_options:
+            return job_options
+        
+        task_group = self.task_groups.get(owner_id)
+        if task_group is not None:
+            return self._schedule_task_group(task_group, trigger, job_options)
+        
+        task = self.tasks.get(owner_id)
+        if task is None:
+            return {'error': '任务或任务组不存在'}
+        func = self._get_function(task.function)
+        if not func:
+            return {'error': f"找不到函数: {task.function}"}
+        return self._schedule_task(owner_id, func, trigger, job_options)
+    
+    @synchronized
+    def restore(self):
+        """从持久化存储恢复任务和任务组，并重新调度之前处于运行状态的任务
+        
+        所有记录通过一次查询读入。应在调度器启动前调用，此时新增的作业只进入
+        调度器的待添加列表，启动时一次性加入作业存储。
+        
+        Returns:
+            包含恢复数量的字典
+        """
+        self.tasks, self.task_groups, self.trigger_configs = self._load_records(self.store)
+        self.run_history.forget_all()
+        if self.run_history.store is not None:
+            self.run_history.load(self.store.load_runs())
+        
+        rescheduled = 0
+        for task_id, task in self.tasks.items():
+            if task.status != 'running':
+                continue
+            job = self.schedule_saved(task_id)
+            if isinstance(job, dict):
+                self.task_logger.error(f"无法恢复任务调度: {task.name} (ID: {task_id}), {job['error']}")
+                task.status = 'stopped'
+                task.next_run = None
+                self._persist_task(task_id)
+                continue
+            task.job_id = job.id
+            task.next_run = None
+            rescheduled += 1
+        
+        for group_id, task_group in self.task_groups.items():
+            # 只有已启动且未停止的任务组保存有触发器配置
+            if group_id not in self.trigger_configs:
+                if task_group.status == 'running':
+                    # 立即执行的任务组在重启时被中断
+                    task_group.status = 'error'
+                    self._persist_group(task_group)
+                continue
+            job = self.schedule_saved(group_id)
+            if isinstance(job, dict):
+                self.task_logger.error(f"无法恢复任务组调度: {task_group.name} (ID: {group_id}), {job['error']}")
+                task_group.status = 'stopped'
+                self._persist_group(task_group)
+                continue
+            task_group.status = 'running'
+            task_group.job_id = job.id
+            rescheduled += 1
+        self._publish_all()
+        
+        self.task_logger.info(f"从持久化存储恢复了 {len(self.tasks)} 个任务、{len(self.task_groups)} 个任务组，重新调度 {rescheduled} 个")
+        return {'tasks': len(self.tasks), 'task_groups': len(self.task_groups), 'rescheduled': rescheduled}
+    
+    # 批量操作和导入导出
+    def _batch_fields(self, operation, keys):
+        """从批量操作中取出指定字段并检查类型（与单个接口的reqparse参数类型一致）
+        
+        Returns:
+            字段字典，类型错误时返回错误信息字符串
+        """
+        fields = {}
+        for key in keys:
+            value = operation.get(key)
+            if value is None:
+                fields[key] = None
+            elif key in BATCH_INT_FIELDS:
+                try:
+                    fields[key] = int(value)
+                except (TypeError, ValueError):
+                    return f'{key}必须是整数'
+            elif key == 'args':
+                if not isinstance(value, dict):
+                    return 'args必须是JSON对象'
+                fields[key] = value
+            elif key == 'task_ids':
+                if not isinstance(value, list):
+                    return 'task_ids必须是列表'
+                fields[key] = value
+            else:
+                fields[key] = str(value)
+        return fields
+    
+    def _apply_operation(self, kind, operation):
+        """执行一个批量操作（在写锁内调用）
+        
+        Returns:
+            与单个接口相同的返回值（结果字典，或(错误信息, 状态码)）
+        """
+        if not isinstance(operation, dict):
+            return {'error': '操作必须是JSON对象'}, 400
+        op = operation.get('op')
+        if op not in BATCH_OPERATIONS:
+            return {'error': f"不支持的操作: {op}，可选操作: {', '.join(BATCH_OPERATIONS)}"}, 400
+        record_id = operation.get('id')
+        if op != 'create' and not isinstance(record_id, str):
+            return {'error': f'{op}操作缺少id'}, 400
+        
+        if kind == 'tasks':
+            if op == 'create':
+                fields = self._batch_fields(operation, ('name', 'function', 'args'))
+                if isinstance(fields, str):
+                    return {'error': fields}, 400
+                if not fields['name'] or not fields['function']:
+                    return {'error': '任务名称和要执行的函数名不能为空'}, 400
+                return self.create_task(fields['name'], fields['function'], fields['args'] or {})
+            if op == 'update':
+                fields = self._batch_fields(operation, ('name', 'function', 'args', 'start_time', 'end_time',
+                                                        'interval', 'cron'))
+                return ({'error': fields}, 400) if isinstance(fields, str) else self.update_task(record_id, fields)
+            if op == 'start':
+                fields = self._batch_fields(operation, TRIGGER_CONFIG_KEYS)
+                return ({'error': fields}, 400) if isinstance(fields, str) else self.start_task(record_id, fields)
+            if op == 'stop':
+                return self.stop_task(record_id)
+            return self.delete_task(record_id)
+        
+        if op == 'create':
+            fields = self._batch_fields(operation, ('name', 'task_ids'))
+            if isinstance(fields, str):
+                return {'error': fields}, 400
+            if not fields['name']:
+                return {'error': '任务组名称不能为空'}, 400
+            return self.create_task_group(fields['name'], fields['task_ids'] or [])
+        if op == 'update':
+            fields = self._batch_fields(operation, ('name', 'task_ids'))
+            if isinstance(fields, str):
+                return {'error': fields}, 400
+            return self.update_task_group(record_id, {key: value for key, value in fields.items() if value is not None})
+        if op == 'start':
+            fields = self._batch_fields(operation, TRIGGER_CONFIG_KEYS)
+            return ({'error': fields}, 400) if isinstance(fields, str) else self.start_task_group(record_id, fields)
+        if op == 'stop':
+            return self.stop_task_group(record_id)
+        return self.delete_task_group(record_id)
+    
+    @synchronized
+    def apply_batch(self, kind, operations):
+        """在一次写锁内依次执行一批任务或任务组操作
+        
+        每个操作与对应的单个接口（创建、更新、启动、停止、删除）行为相同，某个操作失败不影响其他操作。
+        修改合并到同一次批量写入中保存。
+        
+        Args:
+            kind: tasks或task_groups
+            operations: 操作列表，每个操作包含op（create/update/start/stop/delete）、id（创建时不需要）
+                以及对应接口的参数
+        
+        Returns:
+            包含每个操作的状态码和结果、成功数和失败数的字典，参数错误时返回(错误信息, 400)
+        """
+        if not isinstance(operations, list):
+            return {'error': 'operations必须是列表'}, 400
+        if len(operations) > MAX_BATCH_SIZE:
+            return {'error': f'每批最多{MAX_BATCH_SIZE}个操作'}, 400
+        
+        results = []
+        succeeded = 0
+        for index, operation in enumerate(operations):
+            try:
+                result = self._apply_operation(kind, operation)
+            except Exception as e:
+                self.task_logger.error(f"批量操作第 {index} 项执行失败: {str(e)}")
+                result = {'error': f"{type(e).__name__}: {e}"}, 500
+            body, status = result if isinstance(result, tuple) else (result, 200)
+            if status < 400:
+                succeeded += 1
+            results.append({'index': index, 'status': status, 'result': body})
+        
+        self.task_logger.info(f"批量执行了 {len(operations)} 个{'任务' if kind == 'tasks' else '任务组'}操作，成功 {succeeded} 个")
+        return {'results': results, 'succeeded': succeeded, 'failed': len(operations) - succeeded}
+    
+    def export_records(self):
+        """逐行导出所有任务和任务组（JSON lines）
+        
+        每行的格式与持久化存储中的记录相同，另加type字段；任务在前，任务组在后，导入时按顺序处理。
+        任务直接读取只读快照，任务组的持久化记录在一次写锁内生成，之后逐行序列化，不持有写锁。
+        
+        Yields:
+            以换行结尾的JSON字符串
+        """
+        task_views = list(self._task_views.values())
+        with self._lock:
+            trigger_configs = dict(self.trigger_configs)
+            group_records = [task_group.to_record() for task_group in self.task_groups.values()]
+        for view in task_views:
+            yield json.dumps({'type': 'task', 'task': view.to_dict(), 'trigger': trigger_configs.get(view.id)},
+                             ensure_ascii=False) + '\n'
+        for record in group_records:
+            yield json.dumps({'type': 'task_group', 'group': record, 'trigger': trigger_configs.get(record['id'])},
+                             ensure_ascii=False) + '\n'
     
-    def set_scheduler(self, scheduler):
-        """设置调度器"""
-        self.scheduler = scheduler
+    def _import_record(self, record, replace):
+        """导入一条记录（在写锁内调用）
+        
+        Returns:
+            imported、skipped，或错误信息字符串
+        """
+        kind = record.get('type')
+        if kind == 'task':
+            task = TaskRecord.from_record(record['task'])
+            existing = self.tasks.get(task.id)
+            if existing is not None:
+                if not replace:
+                    return 'skipped'
+                if existing.status == 'running':
+                    self.stop_task(task.id)
+            self.tasks[task.id] = task
+            self._import_trigger(task.id, record.get('trigger'))
+            if task.status == 'running':
+                job = self.schedule_saved(task.id)
+                if isinstance(job, dict):
+                    task.status = 'stopped'
+                    task.next_run = None
+                    self.trigger_configs.pop(task.id, None)
+                else:
+                    task.job_id = job.id
+                    task.next_run = job.next_run_time.timestamp() if job.next_run_time else None
+            self._persist_task(task.id)
+            return 'imported'
+        
+        if kind == 'task_group':
+            task_group = TaskGroup.from_record(record['group'], scheduler=self.scheduler, task_manager=self)
+            missing = [task_id for task_id in task_group.task_ids if task_id not in self.tasks]
+            if missing:
+                return f"任务ID {', '.join(missing)} 不存在"
+            existing = self.task_groups.get(task_group.id)
+            if existing is not None:
+                if not replace:
+                    return 'skipped'
+                if existing.status == 'running':
+                    self.stop_task_group(task_group.id)
+            self.task_groups[task_group.id] = task_group
+            self._import_trigger(task_group.id, record.get('trigger'))
+            if task_group.status == 'running':
+                job = self.schedule_saved(task_group.id)
+                if isinstance(job, dict):
+                    task_group.status = 'stopped'
+                    self.trigger_configs.pop(task_group.id, None)
+                else:
+                    task_group.job_id = job.id
+            self._persist_group(task_group)
+            return 'imported'
+        
+        return f'未知的记录类型: {kind}'
+    
+    def _import_trigger(self, owner_id, trigger):
+        if trigger:
+            self.trigger_configs[owner_id] = trigger
+        else:
+            self.trigger_configs.pop(owner_id, None)
+    
+    def import_records(self, lines, replace=False):
+        """逐行导入export_records()导出的任务和任务组
+        
+        按IMPORT_CHUNK_SIZE行一批处理，每批在一次写锁内完成，读取下一批时不持有写锁，
+        导入大文件时不会长时间阻塞其他请求和任务执行，内存占用也只与每批的行数有关。
+        导入时处于运行状态的任务和任务组按导入的触发器配置重新调度。
+        
+        Args:
+            lines: 可迭代的行（str或bytes）
+            replace: ID已存在时是否替换（先停止原来的任务或任务组），为False时跳过
+        
+        Returns:
+            包含导入数量、跳过数量和错误（行号、错误信息）的字典
+        """
+        summary = {'imported': {'tasks': 0, 'task_groups': 0}, 'skipped': 0, 'errors': []}
+        error_count = 0
+        chunk = []
+        
+        def apply(chunk):
+            nonlocal error_count
+            with self._lock:
+                for line_number, record in chunk:
+                    try:
+                        outcome = self._import_record(record, replace)
+                    except Exception as e:
+                        outcome = f"{type(e).__name__}: {e}"
+                    if outcome == 'imported':
+                        summary['imported']['tasks' if record['type'] == 'task' else 'task_groups'] += 1
+                    elif outcome == 'skipped':
+                        summary['skipped'] += 1
+                    else:
+                        error_count += 1
+                        if len(summary['errors']) < MAX_IMPORT_ERRORS:
+                            summary['errors'].append({'line': line_number, 'error': outcome})
+        
+        for line_number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('每行必须是JSON对象')
+            except ValueError as e:
+                error_count += 1
+                if len(summary['errors']) < MAX_IMPORT_ERRORS:
+                    summary['errors'].append({'line': line_number, 'error': f'无效的JSON: {e}'})
+                continue
+            chunk.append((line_number, record))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                apply(chunk)
+                chunk = []
+        if chunk:
+            apply(chunk)
+        
+        summary['error_count'] = error_count
+        self.task_logger.info(f"导入了 {summary['imported']['tasks']} 个任务、{summary['imported']['task_groups']} 个任务组，"
+                              f"跳过 {summary['skipped']} 个，失败 {error_count} 个")
+        return summary
     
     # 任务组相关方法
+    @synchronized
     def create_task_group(self, name, task_ids=None):
         """创建新的任务组
         
@@ -249,28 +1956,55 @@ class TaskManager:
         )
         
         self.task_groups[group_id] = task_group
+        self._persist_group(task_group)
         self.task_logger.info(f"创建了新任务组: {name} (ID: {group_id})")
         
         return {'id': group_id, 'status': 'created'}
     
     def get_all_task_groups(self):
-        """获取所有任务组"""
-        return {'task_groups': [group.to_dict() for group in self.task_groups.values()]}
+        """获取所有任务组（只读快照，不获取写锁）"""
+        version = self.version
+        return {'task_groups': [view.to_dict() for view in self._group_views.values()], 'version': version}
+    
+    def query_task_groups(self, status=None, name_prefix=None, fields=None, limit=None, cursor=None):
+        """分页查询任务组（不获取写锁）
+        
+        Args:
+            status: 状态列表，任务组状态在其中之一时返回
+            name_prefix: 名称前缀
+            fields: 返回的字段列表，为None时返回全部字段
+            limit: 每页记录数，为None时返回全部
+            cursor: 上一页返回的next_cursor
+        
+        Returns:
+            JSON响应体，参数错误时返回(错误信息, 400)
+        """
+        if fields:
+            unknown = [field for field in fields if field not in GROUP_FIELDS]
+            if unknown:
+                return {'error': f"未知字段: {', '.join(unknown)}，可选字段: {', '.join(GROUP_FIELDS)}"}, 400
+        filters = {'status': status} if status else {}
+        return self._query('task_groups', self._view_versions['task_groups'], self._group_views, self.task_groups, self._group_index, self._group_order,
+                           filters, None, name_prefix, tuple(fields) if fields else None, limit, cursor,
+                           getattr, TaskGroup.to_dict)
     
     def get_task_group(self, group_id):
-        """获取特定任务组的详情"""
-        task_group = self.task_groups.get(group_id)
-        if not task_group:
+        """获取特定任务组的详情（只读快照，不获取写锁）"""
+        view = self._group_views.get(group_id)
+        if view is None:
             return {'error': '任务组不存在'}, 404
         
-        # 如果任务组正在运行中，更新下次运行时间
-        if task_group.status == 'running' and task_group.job_id:
-            job = self.scheduler.get_job(task_group.job_id)
+        task_group = view.to_dict()
+        
+        # 如果任务组正在运行中，用调度器中的下次运行时间覆盖快照中的值
+        if task_group['status'] == 'running' and task_group['job_id']:
+            job = self.scheduler.get_job(task_group['job_id'])
             if job:
-                task_group.next_run = job.next_run_time.isoformat() if job.next_run_time else None
+                task_group['next_run'] = job.next_run_time.isoformat() if job.next_run_time else None
         
-        return task_group.to_dict()
+        return task_group
     
+    @synchronized
     def update_task_group(self, group_id, data):
         """更新任务组配置"""
         task_group = self.task_groups.get(group_id)
@@ -294,9 +2028,11 @@ class TaskManager:
             
             task_group.task_ids = data['task_ids']
         
+        self._persist_group(task_group)
         self.task_logger.info(f"更新了任务组配置: {task_group.name} (ID: {group_id})")
         return task_group.to_dict()
     
+    @synchronized
     def delete_task_group(self, group_id):
         """删除任务组"""
         task_group = self.task_groups.get(group_id)
@@ -309,10 +2045,14 @@ class TaskManager:
         
         # 从任务组列表中删除
         del self.task_groups[group_id]
+        self.trigger_configs.pop(group_id, None)
+        self.results.discard(self.run_history.forget(group_id))
+        self._persist_group(task_group)
         
         self.task_logger.info(f"删除了任务组: {task_group.name} (ID: {group_id})")
         return {'status': 'deleted'}
     
+    @synchronized
     def add_task_to_group(self, group_id, task_id):
         """将任务添加到任务组中"""
         task_group = self.task_groups.get(group_id)
@@ -322,20 +2062,28 @@ class TaskManager:
         if task_id not in self.tasks:
             return {'error': '任务不存在'}, 404
         
+        if group_id in self._memberships.get(task_id, ()):
+            return task_group.to_dict()
         result = task_group.add_task(task_id)
+        self._persist_group(task_group)
         self.task_logger.info(f"将任务 {task_id} 添加到任务组: {task_group.name} (ID: {group_id})")
         return result
     
+    @synchronized
     def remove_task_from_group(self, group_id, task_id):
         """从任务组中移除任务"""
         task_group = self.task_groups.get(group_id)
         if not task_group:
             return {'error': '任务组不存在'}, 404
         
+        if group_id not in self._memberships.get(task_id, ()):
+            return task_group.to_dict()
         result = task_group.remove_task(task_id)
+        self._persist_group(task_group)
         self.task_logger.info(f"从任务组 {task_group.name} (ID: {group_id}) 中移除任务 {task_id}")
         return result
     
+    @synchronized
     def reorder_tasks_in_group(self, group_id, task_ids):
         """重新排序任务组中的任务"""
         task_group = self.task_groups.get(group_id)
@@ -344,7 +2092,7 @@ class TaskManager:
         
         # 验证所有任务ID是否在任务组中
         for task_id in task_ids:
-            if task_id not in task_group.task_ids:
+            if group_id not in self._memberships.get(task_id, ()):
                 return {'error': f'任务ID {task_id} 不在任务组中'}, 400
         
         # 验证任务数量是否匹配
@@ -352,9 +2100,11 @@ class TaskManager:
             return {'error': '任务数量不匹配'}, 400
         
         result = task_group.reorder_tasks(task_ids)
+        self._persist_group(task_group)
         self.task_logger.info(f"重新排序任务组 {task_group.name} (ID: {group_id}) 中的任务")
         return result
     
+    @synchronized
     def start_task_group(self, group_id, config):
         """启动任务组
         
@@ -373,39 +2123,22 @@ class TaskManager:
             return {'error': '任务组中没有任务'}, 400
         
         # 构建触发器
-        trigger = self._build_trigger(config)
+        trigger = self._build_trigger(config, group_id)
         # 检查触发器是否为字典类型，如果是则说明返回了错误信息
         if isinstance(trigger, dict) and 'error' in trigger:
             return trigger, 400
         
-        # 定义任务组执行包装函数
-        def group_job_func():
-            task_group.last_run = datetime.datetime.now().isoformat()
-            task_group.run_count += 1
-            task_group.current_task_index = 0
-            
-            # 清空上下文，准备开始新的执行
-            task_group.clear_context()
-            
-            try:
-                self.task_logger.info(f"开始定时执行任务组: {task_group.name} (ID: {group_id})")
-                self._execute_next_task_in_group(task_group)
-            except Exception as e:
-                self.task_logger.error(f"任务组执行出错: {task_group.name} (ID: {group_id}), 错误: {str(e)}")
-                task_group.status = 'error'
+        job_options = self._misfire_options(config)
+        if 'error' in job_options:
+            return job_options, 400
         
-        # 添加任务组到调度器
-        job = self.scheduler.add_job(
-            group_job_func,
-            trigger=trigger,
-            id=f"group_{group_id}",
-            name=f"TaskGroup: {task_group.name}"
-        )
+        job = self._schedule_task_group(task_group, trigger, job_options)
         
         # 更新任务组状态
         task_group.status = 'running'
         task_group.job_id = job.id
-        task_group.next_run = job.next_run_time.isoformat() if job.next_run_time else None
+        task_group.next_run = job.next_run_time.timestamp() if job.next_run_time else None
+        self.trigger_configs[group_id] = {key: config.get(key) for key in TRIGGER_CONFIG_KEYS}
         
         # 存储配置
         trigger_info = ""
@@ -419,10 +2152,94 @@ class TaskManager:
             task_group.start_time = config['start_time']
         if 'end_time' in config and config['end_time']:
             task_group.end_time = config['end_time']
+        if config.get('misfire_policy'):
+            task_group.misfire_policy = config['misfire_policy']
+        if config.get('jitter') is not None:
+            task_group.jitter = config['jitter']
+        self._persist_group(task_group)
             
         self.task_logger.info(f"启动了任务组: {task_group.name} (ID: {group_id}), {trigger_info}, 下次执行时间: {task_group.next_run}")
         return task_group.to_dict()
     
+    def _run_scheduled_group(self, task_group, scheduled=None):
+        """执行一次由调度触发的任务组并记录运行
+        
+        Args:
+            task_group: 任务组对象
+            scheduled: 计划执行时间（时间戳），为None时视为与开始时间相同
+        
+        Returns:
+            任务组是否执行成功
+        """
+        started = time.time()
+        if scheduled is None:
+            scheduled = started
+        else:
+            metrics.SCHEDULER_LAG.observe(started - scheduled)
+        with self._lock:
+            task_group.last_run = time.time()
+            task_group.run_count += 1
+            task_group.current_task_index = 0
+            
+            # 清空上下文，准备开始新的执行
+            task_group.clear_context(reset_peak=True)
+            task_group.plan_context_liveness(self.tasks)
+            self._publish_group(task_group)
+        
+        try:
+            self.task_logger.info(f"开始定时执行任务组: {task_group.name} (ID: {task_group.id})")
+            self._execute_next_task_in_group(task_group)
+        except Exception as e:
+            self.task_logger.error(f"任务组执行出错: {task_group.name} (ID: {task_group.id}), 错误: {str(e)}")
+            with self._lock:
+                task_group.status = 'error'
+        finally:
+            with self._lock:
+                self._persist_group(task_group)
+            self._record_group_run(task_group, scheduled, started, 'schedule')
+        return task_group.status != 'error'
+    
+    def _schedule_task_group(self, task_group, trigger, job_options=None):
+        """把任务组加入调度器
+        
+        Args:
+            task_group: 任务组对象
+            trigger: 触发器对象
+            job_options: 传给调度器的作业选项（错过执行的处理策略）
+            
+        Returns:
+            调度器中的作业对象
+        """
+        group_id = task_group.id
+        
+        # 定义任务组执行包装函数
+        def group_job_func():
+            scheduled_time = take_scheduled_time()
+            self._run_scheduled_group(task_group, scheduled_time.timestamp() if scheduled_time else None)
+        
+        # 队列模式下触发时只把运行请求写入工作队列
+        if self.work_queue is not None:
+            group_job_func = self._enqueue_job(group_id)
+        
+        # 添加任务组到调度器
+        return self.scheduler.add_job(
+            group_job_func,
+            trigger=trigger,
+            id=f"group_{group_id}",
+            name=f"TaskGroup: {task_group.name}",
+            **(job_options or {})
+        )
+    
+    def _record_group_run(self, task_group, scheduled, started, source, run_id=None):
+        """记录一次任务组运行（以任务组最终状态判断成败）"""
+        failed = task_group.status == 'error'
+        status = 'error' if failed else 'success'
+        ended = time.time()
+        self.run_history.record(task_group.id, run_id or new_run_id(), scheduled, started, ended,
+                                status, 0, 'TaskGroupError' if failed else None, source)
+        metrics.GROUP_RUNS.labels(status).inc()
+        metrics.GROUP_DURATION.observe(ended - started)
+    
     def _execute_next_task_in_group(self, task_group):
         """执行任务组中的下一个任务
         
@@ -431,9 +2248,11 @@ class TaskManager:
         """
         # 检查是否所有任务都已执行完毕
         if task_group.current_task_index >= len(task_group.task_ids):
-            task_group.status = 'completed'
-            task_group.clear_context()  # 执行完成后清空上下文
-            self.task_logger.info(f"任务组执行完成: {task_group.name} (ID: {task_group.id})")
+            with self._lock:
+                task_group.status = 'completed'
+                task_group.clear_context()  # 执行完成后清空上下文
+                self._publish_group(task_group)
+            self.task_logger.info(f"任务组执行完成: {task_group.name} (ID: {task_group.id}), 上下文峰值占用约 {task_group.context_peak_bytes} 字节")
             return
         
         # 获取当前要执行的任务ID
@@ -442,77 +2261,99 @@ class TaskManager:
         
         if not task:
             self.task_logger.error(f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务不存在: {task_id}")
-            task_group.status = 'error'
+            with self._lock:
+                task_group.status = 'error'
             return
         
         # 查找并导入函数
-        func = self._get_function(task['function'])
+        func = self._get_function(task.function)
         if not func:
-            self.task_logger.error(f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务函数不存在: {task['function']}")
-            task_group.status = 'error'
+            self.task_logger.error(f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务函数不存在: {task.function}")
+            with self._lock:
+                task_group.status = 'error'
             return
         
+        run_id = new_run_id()
+        started = time.time()
+        recorded = False
+        
         try:
-            self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 正在执行任务 {task_group.current_task_index + 1}/{len(task_group.task_ids)}: {task['name']} (ID: {task_id})")
+            self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 正在执行任务 {task_group.current_task_index + 1}/{len(task_group.task_ids)}: {task.name} (ID: {task_id})")
             
             # 更新任务的执行次数和最后执行时间
-            task['last_run'] = datetime.datetime.now().isoformat()
-            task['run_count'] += 1
+            with self._lock:
+                task.last_run = time.time()
+                task.run_count += 1
+                self._persist_task(task_id)
             
             # 准备任务参数，处理参数传递
             processed_args = self._process_task_args(task, task_group)
             
             # 执行任务
             # 如果是HTTP请求函数，传递任务ID
-            if task['function'] == 'http_request':
+            if task.function == 'http_request':
                 # 复制参数并添加task_id
                 args = processed_args.copy()
                 args['task_id'] = task_id
                 result = func(**args)
             else:
                 result = func(**processed_args)
+            self._record_run(task_id, run_id, started, started, result=result, source='group')
+            recorded = True
             
-            # 将结果存储到任务组上下文中，供后续任务使用
-            task_group.set_context_value('last_result', result)
-            task_group.set_context_value(f'task_{task_id}_result', result)
-            
-            # 如果是HTTP请求任务，存储更多详细信息
-            if task['function'] == 'http_request':
-                # 尝试解析JSON响应
-                try:
-                    if isinstance(result, dict) and 'content' in result:
-                        content = result['content']
-                        try:
-                            json_content = json.loads(content)
-                            task_group.set_context_value('last_json', json_content)
-                            task_group.set_context_value(f'task_{task_id}_json', json_content)
-                        except:
-                            # 如果不是JSON，存储原始内容
-                            task_group.set_context_value('last_content', content)
-                            task_group.set_context_value(f'task_{task_id}_content', content)
-                except:
-                    self.task_logger.warning(f"无法从HTTP请求结果中提取响应内容: {str(result)[:100]}")
+            # 上下文的修改在写锁内进行，与发布任务组快照时的读取互斥
+            with self._lock:
+                # 将结果存储到任务组上下文中，供后续任务使用
+                task_group.set_context_value('last_result', result)
+                task_group.set_context_value(f'task_{task_id}_result', result)
+                
+                # 如果是HTTP请求任务，存储更多详细信息
+                if task.function == 'http_request':
+                    # 尝试解析JSON响应
+                    try:
+                        if isinstance(result, dict) and 'content' in result:
+                            content = result['content']
+                            try:
+                                json_content = json.loads(content)
+                                task_group.set_context_value('last_json', json_content)
+                                task_group.set_context_value(f'task_{task_id}_json', json_content)
+                            except:
+                                # 如果不是JSON，存储原始内容
+                                task_group.set_context_value('last_content', content)
+                                task_group.set_context_value(f'task_{task_id}_content', content)
+                    except:
+                        self.task_logger.warning(f"无法从HTTP请求结果中提取响应内容: {str(result)[:100]}")
             
             # 优化HTTP请求任务结果的记录
-            if task['function'] == 'http_request':
+            if task.function == 'http_request':
                 # HTTP请求结果已经在http_request函数中记录，这里只添加一个执行成功的日志
                 status_code = result.get('status_code', 'N/A')
                 success = '成功' if result.get('success', False) else '失败'
-                self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 中的HTTP请求任务执行完成: {task['name']} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
+                self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 中的HTTP请求任务执行完成: {task.name} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
             else:
                 # 其他类型的任务，记录完整结果
-                self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务执行成功: {task['name']} (ID: {task_id}), 结果: {str(result)[:100]}")
+                self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务执行成功: {task.name} (ID: {task_id}), 结果: {str(result)[:100]}")
             
-            # 移动到下一个任务
-            task_group.current_task_index += 1
+            # 丢弃后续任务不再引用的上下文，避免长任务组同时持有所有响应
+            with self._lock:
+                dropped = task_group.prune_context(task_group.current_task_index)
+                
+                # 移动到下一个任务
+                task_group.current_task_index += 1
+                self._publish_group(task_group)
+            if dropped:
+                self.task_logger.info(f"任务组 {task_group.name} (ID: {task_group.id}) 释放了不再使用的上下文: {', '.join(dropped)}")
             
             # 执行下一个任务
             self._execute_next_task_in_group(task_group)
             
         except Exception as e:
-            error_msg = f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务执行失败: {task['name']} (ID: {task_id}), 错误: {str(e)}"
+            error_msg = f"任务组 {task_group.name} (ID: {task_group.id}) 中的任务执行失败: {task.name} (ID: {task_id}), 错误: {str(e)}"
             self.task_logger.error(error_msg)
-            task_group.status = 'error'
+            if not recorded:
+                self._record_run(task_id, run_id, started, started, error=e, source='group')
+            with self._lock:
+                task_group.status = 'error'
     
     def _process_task_args(self, task, task_group):
         """处理任务参数，支持从上下文中获取值
@@ -527,11 +2368,11 @@ class TaskManager:
         import re
         import json
         
-        # 复制原始参数
-        args = task['args'].copy() if task['args'] else {}
+        # 深拷贝原始参数：headers、body等嵌套值会被原地替换引用，不能修改任务本身的参数模板
+        args = copy.deepcopy(task.args) if task.args else {}
         
         # 如果是HTTP请求任务，特殊处理headers和body
-        if task['function'] == 'http_request':
+        if task.function == 'http_request':
             # 处理整个参数对象
             self._process_http_args(args, task_group)
             return args
@@ -541,8 +2382,8 @@ class TaskManager:
             args[key] = self._process_arg_value(value, task_group)
         
         # 记录参数处理结果
-        if task['args'] != args:
-            self.task_logger.info(f"任务参数已处理，原参数: {task['args']}，处理后: {args}")
+        if task.args != args:
+            self.task_logger.info(f"任务参数已处理，原参数: {task.args}，处理后: {args}")
             
         return args
         
@@ -627,6 +2468,9 @@ class TaskManager:
         - ${context:last_result.status_code} - 引用HTTP响应状态码
         - ${http.response_body:last} - 引用上一次HTTP请求的响应体
         - ${http.response_json:last.key1.key2} - 引用上一次HTTP响应JSON中的嵌套字段
+        - ${http.response_json:last.items[0].id} - 引用JSON数组中的元素（支持负数下标）
+        - ${http.response_json:last.items[1:3]} - 引用JSON数组的切片
+        - ${http.response_json:last.items[*].id} - 通配，返回所有元素的id列表
         - ${http.headers:last.Content-Type} - 引用上一次HTTP响应头中的字段
         
         参数:
@@ -636,138 +2480,78 @@ class TaskManager:
         返回:
             处理后的参数值
         """
-        import re
-        
         # 如果不是字符串，直接返回
         if not isinstance(value, str):
             return value
-            
-        # 检查是否有完整的引用表达式（整个参数值就是一个引用）
-        full_context_match = re.match(r'^\${context:([\w\.-]+)}$', value)
-        if full_context_match:
-            # 这是一个完整引用，直接返回上下文值（可以是任何类型）
-            return self._extract_context_value(full_context_match.group(1), task_group)
-            
-        # 检查HTTP响应体引用
-        full_http_body_match = re.match(r'^\${http\.response_body:([\w\.-]+)}$', value)
-        if full_http_body_match:
-            context_key = full_http_body_match.group(1)
-            # 处理特殊关键字
-            if context_key == 'last':
-                # 获取上一个HTTP请求的响应内容
-                if 'last_result' in task_group.context and isinstance(task_group.context['last_result'], dict):
-                    return task_group.context['last_result'].get('content', '')
-            else:
-                # 获取指定任务的HTTP响应内容
-                task_result_key = f"task_{context_key}_result"
-                if task_result_key in task_group.context and isinstance(task_group.context[task_result_key], dict):
-                    return task_group.context[task_result_key].get('content', '')
-            return value  # 如果没有找到，返回原始值
-            
-        # 检查HTTP JSON响应引用
-        full_http_json_match = re.match(r'^\${http\.response_json:([\w\.-]+)}$', value)
-        if full_http_json_match:
-            json_path = full_http_json_match.group(1)
-            parts = json_path.split('.')
-            
-            # 确定使用哪个上下文键
-            if parts[0] == 'last':
-                json_key = 'last_json'
-                nested_path = parts[1:] if len(parts) > 1 else []
-            else:
-                # 指定任务ID
-                json_key = f"task_{parts[0]}_json"
-                nested_path = parts[1:] if len(parts) > 1 else []
-                
-            # 获取JSON对象
-            if json_key in task_group.context and isinstance(task_group.context[json_key], dict):
-                json_obj = task_group.context[json_key]
-                # 提取嵌套字段
-                try:
-                    for part in nested_path:
-                        if isinstance(json_obj, dict) and part in json_obj:
-                            json_obj = json_obj[part]
-                        else:
-                            return value  # 如果路径无效，返回原始值
-                    return json_obj  # 返回提取的值
-                except:
-                    pass
-            return value  # 如果处理失败，返回原始值
-            
-        # 检查HTTP头部引用
-        full_http_headers_match = re.match(r'^\${http\.headers:([\w\.-]+)}$', value)
-        if full_http_headers_match:
-            header_path = full_http_headers_match.group(1)
-            parts = header_path.split('.')
-            
-            # 确定使用哪个上下文键
-            if parts[0] == 'last':
-                result_key = 'last_result'
-                header_name = parts[1] if len(parts) > 1 else None
-            else:
-                # 指定任务ID
-                result_key = f"task_{parts[0]}_result"
+        
+        # 检查是否有完整的引用表达式（整个参数值就是一个引用），此时保留引用值的原始类型
+        full_match = CONTEXT_REF_PATTERN.fullmatch(value)
+        if full_match:
+            kind, path = full_match.groups()
+            if kind == 'context':
+                return self._extract_context_value(path, task_group)
+            if kind == 'http.response_body':
+                content = self._replace_http_body_ref(path, task_group)
+                return value if content is None else content
+            if kind == 'http.response_json':
+                json_value = self._replace_http_json_ref(path, task_group)
+                return value if json_value is None else json_value
+            if kind == 'http.headers':
+                parts = path.split('.')
+                result_key = 'last_result' if parts[0] == 'last' else f"task_{parts[0]}_result"
                 header_name = parts[1] if len(parts) > 1 else None
-                
-            # 获取响应头
-            if result_key in task_group.context and isinstance(task_group.context[result_key], dict):
-                result = task_group.context[result_key]
-                headers = result.get('headers', {})
-                if header_name:
-                    # 返回特定头部的值
-                    return headers.get(header_name, value)
-                return headers  # 返回所有头部
-            return value  # 如果失败，返回原始值
-        
-        # 处理部分引用（字符串中的嵌入引用）
-        # 匹配所有形式的引用表达式
-        result = value
-        patterns = [
-            (r'\${context:([\w\.-]+)}', self._replace_context_ref),
-            (r'\${http\.response_body:([\w\.-]+)}', self._replace_http_body_ref),
-            (r'\${http\.response_json:([\w\.-]+)}', self._replace_http_json_ref),
-            (r'\${http\.headers:([\w\.-]+)}', self._replace_http_headers_ref),
-            (r'\${http\.status:([\w\.-]+)}', self._replace_http_status_ref)
-        ]
-        
-        for pattern, replacer in patterns:
-            matches = re.findall(pattern, result)
-            for match in matches:
-                placeholder = re.escape(f"${{{pattern.split(':')[0][2:]}:{match}}}")
-                replace_value = replacer(match, task_group)
-                if replace_value is not None:
-                    # 转为字符串替换
-                    result = re.sub(placeholder, str(replace_value), result)
+                result = task_group.context.get(result_key)
+                if isinstance(result, dict):
+                    headers = result.get('headers', {})
+                    if header_name:
+                        # 返回特定头部的值
+                        return headers.get(header_name, value)
+                    return headers  # 返回所有头部
+                return value  # 如果失败，返回原始值
+        
+        # 处理部分引用（字符串中的嵌入引用），引用值转为字符串后替换
+        replacers = {
+            'context': self._replace_context_ref,
+            'http.response_body': self._replace_http_body_ref,
+            'http.response_json': self._replace_http_json_ref,
+            'http.headers': self._replace_http_headers_ref,
+            'http.status': self._replace_http_status_ref
+        }
         
-        return result
+        def replace(match):
+            kind, path = match.groups()
+            replace_value = replacers[kind](path, task_group)
+            return match.group(0) if replace_value is None else str(replace_value)
+        
+        return CONTEXT_REF_PATTERN.sub(replace, value)
     
     def _extract_context_value(self, path, task_group):
         """从上下文中提取值
         
         参数:
-            path: 路径表达式，例如 "last_json.data.id"
+            path: 路径表达式，例如 "last_json.data.id" 或 "last_json.items[0].id"
             task_group: 任务组对象
             
         返回:
             上下文中的值
         """
-        parts = path.split('.')
-        context_key = parts[0]
+        context_key, nested_path = split_ref_path(path)
         
         # 获取上下文中的值
         context_value = task_group.get_context_value(context_key)
         if context_value is None:
             self.task_logger.warning(f"任务组 {task_group.name} 上下文中不存在键 {context_key}")
             return None
-            
-        # 处理嵌套引用
-        result_value = context_value
-        for part in parts[1:]:
-            if isinstance(result_value, dict) and part in result_value:
-                result_value = result_value[part]
-            else:
-                self.task_logger.warning(f"无法从对象中提取属性 {part}")
-                return None
+        
+        # 处理嵌套引用，访问器按路径编译后缓存，直接引用原对象不做复制
+        try:
+            result_value = compile_path(nested_path)(context_value)
+        except ValueError as e:
+            self.task_logger.warning(str(e))
+            return None
+        if result_value is MISSING:
+            self.task_logger.warning(f"无法从对象中提取路径 {nested_path}")
+            return None
                 
         return result_value
         
@@ -808,35 +2592,27 @@ class TaskManager:
         """替换HTTP JSON响应引用
         
         参数:
-            path: 路径表达式
+            path: 路径表达式，例如 "last.data.items[*].id"
             task_group: 任务组对象
             
         返回:
             替换后的值
         """
-        parts = path.split('.')
-        if parts[0] == 'last':
-            json_key = 'last_json'
-            nested_path = parts[1:] if len(parts) > 1 else []
-        else:
-            # 指定任务ID
-            json_key = f"task_{parts[0]}_json"
-            nested_path = parts[1:] if len(parts) > 1 else []
-            
-        # 获取JSON对象
-        if json_key in task_group.context and isinstance(task_group.context[json_key], dict):
-            json_obj = task_group.context[json_key]
-            # 提取嵌套字段
-            try:
-                for part in nested_path:
-                    if isinstance(json_obj, dict) and part in json_obj:
-                        json_obj = json_obj[part]
-                    else:
-                        return None
-                return json_obj
-            except:
-                pass
-        return None
+        task_key, nested_path = split_ref_path(path)
+        json_key = 'last_json' if task_key == 'last' else f"task_{task_key}_json"
+        
+        # 获取JSON对象（对象或数组）
+        json_obj = task_group.context.get(json_key)
+        if not isinstance(json_obj, (dict, list)):
+            return None
+        
+        # 提取嵌套字段
+        try:
+            json_value = compile_path(nested_path)(json_obj)
+        except ValueError as e:
+            self.task_logger.warning(str(e))
+            return None
+        return None if json_value is MISSING else json_value
         
     def _replace_http_headers_ref(self, path, task_group):
         """替换HTTP头部引用
@@ -889,6 +2665,7 @@ class TaskManager:
             return result.get('status_code', None)
         return None
     
+    @synchronized
     def stop_task_group(self, group_id):
         """停止任务组"""
         task_group = self.task_groups.get(group_id)
@@ -905,10 +2682,13 @@ class TaskManager:
         # 更新任务组状态
         task_group.status = 'stopped'
         task_group.next_run = None
+        self.trigger_configs.pop(group_id, None)
+        self._persist_group(task_group)
         
         self.task_logger.info(f"停止了任务组: {task_group.name} (ID: {group_id})")
         return task_group.to_dict()
     
+    @synchronized
     def execute_task_group_now(self, group_id):
         """立即执行任务组"""
         task_group = self.task_groups.get(group_id)
@@ -927,44 +2707,64 @@ class TaskManager:
                 error_msg = f"任务组 {task_group.name} (ID: {group_id}) 中的任务不存在: {task_id}"
                 self.task_logger.error(error_msg)
                 task_group.status = 'error'
+                self._persist_group(task_group)
                 return {
                     'error': error_msg,
                     'status': 'error',
                     'task_group': task_group.to_dict()
                 }, 400
         
+        # 线程池已满时不修改任务组状态，直接拒绝
+        if not self.manual_executor.reserve():
+            metrics.MANUAL_RUNS_REJECTED.labels('task_group').inc()
+            return {'error': '立即执行的任务过多，请稍后重试'}, 429
+        
         # 设置执行状态
         task_group.status = 'running'
-        task_group.last_run = datetime.datetime.now().isoformat()
+        task_group.last_run = time.time()
         task_group.run_count += 1
         task_group.current_task_index = 0
         
         # 清空上下文，准备开始新的执行
-        task_group.clear_context()
+        task_group.clear_context(reset_peak=True)
+        task_group.plan_context_liveness(self.tasks)
+        self._persist_group(task_group)
         
         self.task_logger.info(f"开始立即执行任务组: {task_group.name} (ID: {group_id}), 包含 {len(task_group.task_ids)} 个任务")
         
-        # 在新线程中执行任务组，避免阻塞当前请求
-        import threading
-        def run_group():
-            try:
-                self._execute_next_task_in_group(task_group)
-            except Exception as e:
-                self.task_logger.error(f"任务组执行出错: {task_group.name} (ID: {group_id}), 错误: {str(e)}")
-                task_group.status = 'error'
-        
-        thread = threading.Thread(target=run_group)
-        thread.daemon = True
-        thread.start()
+        # 在立即执行线程池中执行任务组，避免阻塞当前请求
+        run_id = new_run_id()
+        self.run_handles.create(run_id, group_id, 'task_group')
+        self.manual_executor.submit_reserved(self._run_task_group_now, task_group, run_id)
         
         # 返回结果中包含更新后的任务组状态，以便前端能正确显示
         return {
             'status': 'executing', 
             'message': f'正在执行任务组: {task_group.name} (ID: {group_id})',
+            'run_id': run_id,
             'task_group': task_group.to_dict()
-        }
+        }, 202
+    
+    def _run_task_group_now(self, task_group, run_id):
+        """在立即执行线程池中执行一次任务组，结束后更新运行句柄"""
+        started = time.time()
+        self.run_handles.start(run_id)
+        try:
+            self._execute_next_task_in_group(task_group)
+        except Exception as e:
+            self.task_logger.error(f"任务组执行出错: {task_group.name} (ID: {task_group.id}), 错误: {str(e)}")
+            with self._lock:
+                task_group.status = 'error'
+        finally:
+            with self._lock:
+                self._persist_group(task_group)
+            self._record_group_run(task_group, started, started, 'manual', run_id)
+            failed = task_group.status == 'error'
+            self.run_handles.finish(run_id, 'error' if failed else 'success', result=task_group.status,
+                                    error=f'任务组执行失败: {task_group.name}' if failed else None)
 
     # 以下是原来的任务相关方法
+    @synchronized
     def create_task(self, name, function_name, args=None):
         """创建新任务
         
@@ -976,37 +2776,67 @@ class TaskManager:
         Returns:
             包含任务ID的字典
         """
-        if args is None:
-            args = {}
-        
         task_id = str(uuid.uuid4())
-        self.tasks[task_id] = {
-            'id': task_id,
-            'name': name,
-            'function': function_name,
-            'args': args,
-            'status': 'created',
-            'job_id': None,
-            'created_at': datetime.datetime.now().isoformat(),
-            'last_run': None,
-            'next_run': None,
-            'run_count': 0
-        }
+        self.tasks[task_id] = TaskRecord(task_id, name, function_name, args)
+        self._persist_task(task_id)
         
         self.task_logger.info(f"创建了新任务: {name} (ID: {task_id})")
         return {'id': task_id, 'status': 'created'}
     
     def get_all_tasks(self):
-        """获取所有任务"""
-        return {'tasks': list(self.tasks.values())}
+        """获取所有任务（只读快照，不获取写锁）
+        
+        list()在一次C层操作内复制快照字典的值，不会遇到迭代中字典大小变化。
+        先读版本号再复制，返回的快照不早于该版本。快照只在这里转换为字典。
+        """
+        version = self.version
+        return {'tasks': [view.to_dict() for view in list(self._task_views.values())], 'version': version}
+    
+    def query_tasks(self, status=None, function=None, name_prefix=None, group_id=None, fields=None,
+                    limit=None, cursor=None):
+        """分页查询任务（不获取写锁）
+        
+        状态和函数名通过二级索引查找，不扫描全部任务。
+        
+        Args:
+            status: 状态列表，任务状态在其中之一时返回
+            function: 函数名列表
+            name_prefix: 名称前缀
+            group_id: 只返回该任务组中的任务
+            fields: 返回的字段列表，为None时返回全部字段
+            limit: 每页记录数，为None时返回全部
+            cursor: 上一页返回的next_cursor
+        
+        Returns:
+            JSON响应体，参数错误时返回(错误信息, 400)，任务组不存在时返回(错误信息, 404)
+        """
+        if fields:
+            unknown = [field for field in fields if field not in TaskRecord.__slots__]
+            if unknown:
+                return {'error': f"未知字段: {', '.join(unknown)}，可选字段: {', '.join(TaskRecord.__slots__)}"}, 400
+        member_ids = None
+        if group_id:
+            group_view = self._group_views.get(group_id)
+            if group_view is None:
+                return {'error': '任务组不存在'}, 404
+            member_ids = group_view.task_ids
+        filters = {}
+        if status:
+            filters['status'] = status
+        if function:
+            filters['function'] = function
+        return self._query('tasks', self._view_versions['tasks'], self._task_views, self.tasks, self._task_index, self._task_order,
+                           filters, member_ids, name_prefix, tuple(fields) if fields else None, limit, cursor,
+                           getattr, TaskRecord.to_dict)
     
     def get_task(self, task_id):
-        """获取特定任务的详情"""
-        task = self.tasks.get(task_id)
-        if not task:
+        """获取特定任务的详情（只读快照，不获取写锁）"""
+        view = self._task_views.get(task_id)
+        if view is None:
             return {'error': '任务不存在'}, 404
+        task = view.to_dict()
         
-        # 如果任务正在运行中，更新下次运行时间
+        # 如果任务正在运行中，用调度器中的下次运行时间覆盖快照中的值
         if task['status'] == 'running' and task['job_id']:
             job = self.scheduler.get_job(task['job_id'])
             if job:
@@ -1014,6 +2844,29 @@ class TaskManager:
         
         return task
     
+    def get_task_memberships(self, task_id):
+        """获取包含某个任务的所有任务组（通过反向索引查找，不获取写锁）
+        
+        Returns:
+            包含任务ID和任务组列表（ID、名称、状态、任务在组中的位置）的字典
+        """
+        if task_id not in self._task_views:
+            return {'error': '任务不存在'}, 404
+        task_groups = []
+        for group_id in self._memberships.get(task_id, ()):
+            view = self._group_views.get(group_id)
+            if view is None:
+                continue
+            task_groups.append({
+                'id': group_id,
+                'name': view.name,
+                'status': view.status,
+                'position': view.task_ids.index(task_id) if task_id in view.task_ids else None
+            })
+        task_groups.sort(key=lambda group: group['name'])
+        return {'task_id': task_id, 'task_groups': task_groups}
+    
+    @synchronized
     def update_task(self, task_id, data):
         """更新任务配置"""
         task = self.tasks.get(task_id)
@@ -1021,17 +2874,19 @@ class TaskManager:
             return {'error': '任务不存在'}, 404
         
         # 如果任务在运行，先停止
-        if task['status'] == 'running':
+        if task.status == 'running':
             self.stop_task(task_id)
         
         # 更新任务配置
         for key, value in data.items():
             if key in ['name', 'function', 'args', 'start_time', 'end_time', 'interval', 'cron'] and value is not None:
-                task[key] = value
+                task.update(key, value)
         
-        self.task_logger.info(f"更新了任务配置: {task['name']} (ID: {task_id})")
-        return task
+        self._persist_task(task_id)
+        self.task_logger.info(f"更新了任务配置: {task.name} (ID: {task_id})")
+        return self._task_views[task_id].to_dict()
     
+    @synchronized
     def delete_task(self, task_id):
         """删除任务"""
         task = self.tasks.get(task_id)
@@ -1039,24 +2894,30 @@ class TaskManager:
             return {'error': '任务不存在'}, 404
         
         # 如果任务在运行，先停止
-        if task['status'] == 'running':
+        if task.status == 'running':
             self.stop_task(task_id)
         
-        # 从所有包含该任务的任务组中移除该任务
+        # 从所有包含该任务的任务组中移除该任务（通过反向索引查找，不遍历全部任务组）
         affected_groups = []
-        for group_id, task_group in self.task_groups.items():
-            if task_id in task_group.task_ids:
-                task_group.task_ids.remove(task_id)
-                affected_groups.append({
-                    'id': group_id,
-                    'name': task_group.name
-                })
-                self.task_logger.info(f"由于任务被删除，已从任务组 {task_group.name} (ID: {group_id}) 中移除任务 {task_id}")
+        # 先整体移除该任务的索引项，逐个更新任务组时不再重复修改它
+        group_ids = sorted(self._memberships.pop(task_id, ()), key=lambda group_id: self.task_groups[group_id].created_at)
+        for group_id in group_ids:
+            task_group = self.task_groups[group_id]
+            task_group.task_ids = [member_id for member_id in task_group.task_ids if member_id != task_id]
+            self._persist_group(task_group)
+            affected_groups.append({
+                'id': group_id,
+                'name': task_group.name
+            })
+            self.task_logger.info(f"由于任务被删除，已从任务组 {task_group.name} (ID: {group_id}) 中移除任务 {task_id}")
         
         # 从任务列表中删除
         del self.tasks[task_id]
+        self.trigger_configs.pop(task_id, None)
+        self.results.discard(self.run_history.forget(task_id))
+        self._persist_task(task_id)
         
-        self.task_logger.info(f"删除了任务: {task['name']} (ID: {task_id})")
+        self.task_logger.info(f"删除了任务: {task.name} (ID: {task_id})")
         
         # 返回删除结果和受影响的任务组
         return {
@@ -1064,6 +2925,7 @@ class TaskManager:
             'affected_groups': affected_groups
         }
     
+    @synchronized
     def start_task(self, task_id, config):
         """启动任务
         
@@ -1075,153 +2937,315 @@ class TaskManager:
         if not task:
             return {'error': '任务不存在'}, 404
         
-        if task['status'] == 'running':
+        if task.status == 'running':
             return {'error': '任务已在运行中'}, 400
         
         # 构建触发器
-        trigger = self._build_trigger(config)
+        trigger = self._build_trigger(config, task_id)
         # 检查触发器是否为字典类型，如果是则说明返回了错误信息
         if isinstance(trigger, dict) and 'error' in trigger:
             return trigger, 400
         
         # 查找并导入函数
-        func = self._get_function(task['function'])
+        func = self._get_function(task.function)
         if not func:
-            return {'error': f"找不到函数: {task['function']}"}, 400
+            return {'error': f"找不到函数: {task.function}"}, 400
         
-        # 定义任务执行包装函数
-        def job_func():
-            task['last_run'] = datetime.datetime.now().isoformat()
-            task['run_count'] += 1
-            
-            try:
-                self.task_logger.info(f"正在执行任务: {task['name']} (ID: {task_id})")
-                
-                # 如果是HTTP请求函数，传递任务ID
-                if task['function'] == 'http_request':
-                    # 复制参数并添加task_id
-                    args = task['args'].copy()
-                    args['task_id'] = task_id
-                    result = func(**args)
-                else:
-                    result = func(**task['args'])
-                
-                # 优化HTTP请求任务结果的记录
-                if task['function'] == 'http_request':
-                    # HTTP请求结果已经在http_request函数中记录，这里只添加一个执行成功的日志
-                    status_code = result.get('status_code', 'N/A')
-                    success = '成功' if result.get('success', False) else '失败'
-                    self.task_logger.info(f"HTTP请求任务执行完成: {task['name']} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
-                else:
-                    # 其他类型的任务，记录完整结果
-                    self.task_logger.info(f"任务执行成功: {task['name']} (ID: {task_id}), 结果: {result}")
-                
-                return result
-            except Exception as e:
-                self.task_logger.error(f"任务执行失败: {task['name']} (ID: {task_id}), 错误: {str(e)}")
-                return None
+        job_options = self._misfire_options(config)
+        if 'error' in job_options:
+            return job_options, 400
         
-        # 添加任务到调度器
-        job = self.scheduler.add_job(
-            job_func,
-            trigger=trigger,
-            id=task_id,
-            name=task['name']
-        )
+        job = self._schedule_task(task_id, func, trigger, job_options)
         
         # 更新任务状态
-        task['status'] = 'running'
-        task['job_id'] = job.id
-        task['next_run'] = job.next_run_time.isoformat() if job.next_run_time else None
+        task.status = 'running'
+        task.job_id = job.id
+        task.next_run = job.next_run_time.timestamp() if job.next_run_time else None
+        self.trigger_configs[task_id] = {key: config.get(key) for key in TRIGGER_CONFIG_KEYS}
         
         if 'interval' in config and config['interval']:
-            task['interval'] = config['interval']
+            task.interval = config['interval']
         if 'cron' in config and config['cron']:
-            task['cron'] = config['cron']
+            task.cron = config['cron']
         if 'start_time' in config and config['start_time']:
-            task['start_time'] = config['start_time']
+            task.start_time = config['start_time']
         if 'end_time' in config and config['end_time']:
-            task['end_time'] = config['end_time']
+            task.end_time = config['end_time']
+        if config.get('misfire_policy'):
+            task.misfire_policy = config['misfire_policy']
+        if config.get('jitter') is not None:
+            task.jitter = config['jitter']
+        self._persist_task(task_id)
             
-        self.task_logger.info(f"启动了任务: {task['name']} (ID: {task_id})")
-        return task
+        self.task_logger.info(f"启动了任务: {task.name} (ID: {task_id})")
+        return self._task_views[task_id].to_dict()
+    
+    def _run_scheduled_task(self, task_id, func, scheduled=None):
+        """执行一次由调度触发的任务，更新执行次数并记录运行
+        
+        Args:
+            task_id: 任务ID
+            func: 任务函数
+            scheduled: 计划执行时间（时间戳），为None时视为与开始时间相同
+        
+        Returns:
+            (任务返回值, 执行中抛出的异常)
+        """
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None, None
+        run_id = new_run_id()
+        started = time.time()
+        if scheduled is None:
+            scheduled = started
+        else:
+            metrics.SCHEDULER_LAG.observe(started - scheduled)
+        with self._lock:
+            task.last_run = time.time()
+            task.run_count += 1
+            self._persist_task(task_id)
+        
+        try:
+            self.task_logger.info(f"正在执行任务: {task.name} (ID: {task_id})")
+            
+            # 如果是HTTP请求函数，传递任务ID
+            if task.function == 'http_request':
+                # 复制参数并添加task_id
+                args = task.args.copy()
+                args['task_id'] = task_id
+                result = func(**args)
+            else:
+                result = func(**task.args)
+            
+            # 优化HTTP请求任务结果的记录
+            if task.function == 'http_request':
+                # HTTP请求结果已经在http_request函数中记录，这里只添加一个执行成功的日志
+                status_code = result.get('status_code', 'N/A')
+                success = '成功' if result.get('success', False) else '失败'
+                self.task_logger.info(f"HTTP请求任务执行完成: {task.name} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
+            else:
+                # 其他类型的任务，记录完整结果
+                self.task_logger.info(f"任务执行成功: {task.name} (ID: {task_id}), 结果: {result}")
+            
+            self._record_run(task_id, run_id, scheduled, started, result=result)
+            return result, None
+        except Exception as e:
+            self.task_logger.error(f"任务执行失败: {task.name} (ID: {task_id}), 错误: {str(e)}")
+            self._record_run(task_id, run_id, scheduled, started, error=e)
+            return None, e
+    
+    def _schedule_task(self, task_id, func, trigger, job_options=None):
+        """把任务加入调度器
+        
+        Args:
+            task_id: 任务ID
+            func: 任务函数
+            trigger: 触发器对象
+            job_options: 传给调度器的作业选项（错过执行的处理策略）
+            
+        Returns:
+            调度器中的作业对象
+        """
+        task = self.tasks[task_id]
+        
+        # 定义任务执行包装函数
+        def job_func():
+            scheduled_time = take_scheduled_time()
+            result, _ = self._run_scheduled_task(task_id, func, scheduled_time.timestamp() if scheduled_time else None)
+            return result
+        
+        # 队列模式下触发时只把运行请求写入工作队列
+        if self.work_queue is not None:
+            job_func = self._enqueue_job(task_id)
+        
+        # 添加任务到调度器
+        return self.scheduler.add_job(
+            job_func,
+            trigger=trigger,
+            id=task_id,
+            name=task.name,
+            **(job_options or {})
+        )
     
+    @synchronized
     def stop_task(self, task_id):
         """停止任务"""
         task = self.tasks.get(task_id)
         if not task:
             return {'error': '任务不存在'}, 404
         
-        if task['status'] != 'running':
+        if task.status != 'running':
             return {'error': '任务未运行'}, 400
         
         # 从调度器中移除任务
-        self.scheduler.remove_job(task['job_id'])
+        self.scheduler.remove_job(task.job_id)
         
         # 更新任务状态
-        task['status'] = 'stopped'
-        task['next_run'] = None
+        task.status = 'stopped'
+        task.next_run = None
+        self.trigger_configs.pop(task_id, None)
+        self._persist_task(task_id)
         
-        self.task_logger.info(f"停止了任务: {task['name']} (ID: {task_id})")
-        return task
+        self.task_logger.info(f"停止了任务: {task.name} (ID: {task_id})")
+        return self._task_views[task_id].to_dict()
     
-    def execute_task_now(self, task_id):
-        """立即执行一次任务"""
+    def execute_task_now(self, task_id, profile=None):
+        """提交一次立即执行，不等待任务执行完成
+        
+        任务在立即执行线程池中执行，通过get_run()按返回的运行ID查询状态和结果。
+        线程池中正在执行和排队的运行已达上限时返回429。
+        
+        Args:
+            task_id: 任务ID
+            profile: 性能分析模式，cpu或memory，为None时不做分析
+        
+        Returns:
+            包含运行ID的字典和状态码202，或(错误信息, 状态码)
+        """
         task = self.tasks.get(task_id)
         if not task:
             return {'error': '任务不存在'}, 404
         
+        if profile and profile not in PROFILE_MODES:
+            return {'error': f"不支持的分析模式: {profile}，可选值: {', '.join(PROFILE_MODES)}"}, 400
+        
         # 查找并导入函数
-        func = self._get_function(task['function'])
+        func = self._get_function(task.function)
         if not func:
-            return {'error': f"找不到函数: {task['function']}"}, 400
-        
-        # 执行任务
-        task['last_run'] = datetime.datetime.now().isoformat()
-        task['run_count'] += 1
+            return {'error': f"找不到函数: {task.function}"}, 400
+        
+        run_id = new_run_id()
+        if not self.manual_executor.reserve():
+            metrics.MANUAL_RUNS_REJECTED.labels('task').inc()
+            return {'error': '立即执行的任务过多，请稍后重试'}, 429
+        self.run_handles.create(run_id, task_id, 'task')
+        self.manual_executor.submit_reserved(self._run_task_now, task_id, func, run_id, profile)
+        return {'status': 'queued', 'run_id': run_id, 'run': f'/api/runs/{run_id}'}, 202
+    
+    def _run_task_now(self, task_id, func, run_id, profile):
+        """在立即执行线程池中执行一次任务，结束后更新运行句柄"""
+        self.run_handles.start(run_id)
+        started = time.time()
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                self.run_handles.finish(run_id, 'error', error='任务不存在')
+                return
+            task.last_run = started
+            task.run_count += 1
+            self._persist_task(task_id)
+        profile_file = None
         
         try:
-            self.task_logger.info(f"立即执行任务: {task['name']} (ID: {task_id})")
+            self.task_logger.info(f"立即执行任务: {task.name} (ID: {task_id})")
             
             # 如果是HTTP请求函数，传递任务ID
-            if task['function'] == 'http_request':
+            if task.function == 'http_request':
                 # 复制参数并添加task_id
-                args = task['args'].copy()
+                args = task.args.copy()
                 args['task_id'] = task_id
-                result = func(**args)
             else:
-                result = func(**task['args'])
+                args = task.args
+            
+            if profile:
+                result, profile_file = run_profiled(profile, func, args, run_id)
+            else:
+                result = func(**args)
             
             # 优化HTTP请求任务结果的记录
-            if task['function'] == 'http_request':
+            if task.function == 'http_request':
                 # HTTP请求结果已经在http_request函数中记录，这里只添加一个执行成功的日志
                 status_code = result.get('status_code', 'N/A')
                 success = '成功' if result.get('success', False) else '失败'
-                self.task_logger.info(f"HTTP请求任务执行完成: {task['name']} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
+                self.task_logger.info(f"HTTP请求任务执行完成: {task.name} (ID: {task_id}), 状态: {success}, 状态码: {status_code}")
             else:
                 # 其他类型的任务，记录完整结果
-                self.task_logger.info(f"立即执行任务成功: {task['name']} (ID: {task_id}), 结果: {result}")
+                self.task_logger.info(f"立即执行任务成功: {task.name} (ID: {task_id}), 结果: {result}")
             
-            return {'status': 'executed', 'result': str(result)}
+            stored_size = self._record_run(task_id, run_id, started, started, result=result, source='manual',
+                                           profile=profile_file)
+            fields = {}
+            if stored_size is not None:
+                fields['result'] = f'/api/runs/{run_id}/result'
+                fields['result_size'] = stored_size
+            if profile_file:
+                fields['profile'] = f'/api/runs/{run_id}/profile'
+            self.run_handles.finish(run_id, 'success', **fields)
         except Exception as e:
-            error_msg = f"立即执行任务失败: {task['name']} (ID: {task_id}), 错误: {str(e)}"
+            error_msg = f"立即执行任务失败: {task.name} (ID: {task_id}), 错误: {str(e)}"
             self.task_logger.error(error_msg)
-            return {'error': error_msg}, 500
+            # 函数抛出异常时分析文件同样已经写入
+            if profile:
+                profile_file, _ = find_profile(run_id)
+            self._record_run(task_id, run_id, started, started, error=e, source='manual', profile=profile_file)
+            fields = {'error': error_msg}
+            if profile_file:
+                fields['profile'] = f'/api/runs/{run_id}/profile'
+            self.run_handles.finish(run_id, 'error', **fields)
+    
+    def get_run(self, run_id):
+        """获取立即执行的运行状态，返回值通过result字段中的链接获取"""
+        handle = self.run_handles.get(run_id)
+        if handle is None:
+            return {'error': '运行不存在或已过期'}, 404
+        return handle
+    
+    def _misfire_options(self, config):
+        """根据配置中的misfire_policy和misfire_grace_time生成调度器作业选项
+        
+        Args:
+            config: 包含任务配置的字典
+        
+        Returns:
+            作业选项字典或包含错误信息的字典，未配置时返回空字典（使用调度器默认值）
+        """
+        policy = config.get('misfire_policy')
+        grace_time = config.get('misfire_grace_time')
+        if not policy and grace_time is None:
+            return {}
+        if policy and policy not in MISFIRE_POLICIES:
+            return {'error': f"无效的错过执行策略: {policy}，可选值: {', '.join(MISFIRE_POLICIES)}"}
+        if grace_time is not None and grace_time <= 0:
+            return {'error': '容错时间必须大于0秒'}
+        
+        coalesce, default_grace_time = MISFIRE_POLICIES[policy or 'skip']
+        options = {'misfire_grace_time': grace_time if grace_time is not None else default_grace_time}
+        if policy:
+            options['coalesce'] = coalesce
+        return options
     
-    def _build_trigger(self, config):
+    def _build_trigger(self, config, owner_id=None):
         """构建任务触发器
         
+        jitter（未指定时使用SCHEDULE_JITTER）大于0时，按任务/任务组ID的哈希值在该窗口内
+        确定一个固定偏移，同样配置的大量任务不会在同一秒触发：未指定开始时间的间隔触发
+        对齐到以PHASE_ANCHOR为起点的间隔网格再加上偏移（偏移不超过间隔），
+        Cron触发的每次触发时间都推迟该偏移。
+        
         Args:
             config: 包含任务配置的字典
+            owner_id: 任务ID或任务组ID，用于计算错开的偏移
         
         Returns:
             触发器对象或包含错误信息的字典
         """
+        jitter = config.get('jitter')
+        if jitter is None:
+            jitter = SCHEDULE_JITTER
+        if jitter < 0 or jitter > MAX_JITTER:
+            return {'error': f'jitter必须在0到{MAX_JITTER}秒之间'}
+        if owner_id is None:
+            jitter = 0
+        
         # 间隔触发
         if 'interval' in config and config['interval']:
+            start_date = config.get('start_time')
+            if jitter and not start_date:
+                offset = phase_offset(owner_id, min(jitter, config['interval']))
+                start_date = PHASE_ANCHOR + datetime.timedelta(seconds=offset)
             trigger = IntervalTrigger(
                 seconds=config['interval'],
-                start_date=config.get('start_time'),
+                start_date=start_date,
                 end_date=config.get('end_time')
             )
             return trigger
@@ -1229,14 +3253,16 @@ class TaskManager:
         # Cron表达式触发
         if 'cron' in config and config['cron']:
             try:
-                trigger = CronTrigger.from_crontab(
+                trigger = crontab_trigger(
                     config['cron'],
                     start_date=config.get('start_time'),
                     end_date=config.get('end_time')
                 )
-                return trigger
             except ValueError as e:
                 return {'error': f"无效的Cron表达式: {str(e)}"}
+            if jitter:
+                trigger = ShiftedTrigger(trigger, phase_offset(owner_id, jitter))
+            return trigger
         
         # 单次触发
         if 'start_time' in config and config['start_time']:
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TaskStore:
+    """基于SQLite（WAL模式）的任务持久化存储
+
+    保存任务定义、任务组、触发器配置和运行计数。写操作先合并到内存中的
+    待写入表（同一记录多次修改只保留最后一次），由后台线程按固定间隔批量
+    写入数据库，任务执行路径上只有一次字典赋值的开销。
+    """
+
+    TABLES = ('tasks', 'task_groups', 'runs')
+
+    def __init__(self, db_path, flush_interval=1.0):
+        """
+        Args:
+            db_path: SQLite数据库文件路径
+            flush_interval: 批量写入间隔（秒），为0时每次保存立即写入
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for table in self.TABLES:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                'id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+
+        self._db_lock = threading.Lock()  # 串行化对连接的访问
+        self._pending_lock = threading.Lock()
+        self._pending = {}  # (表名, 记录ID) -> 待写入对象，None表示删除
+        self._last_flush_time = 0.0
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name='TaskStoreFlusher', daemon=True)
+            self._flusher.start()
+
+    def save(self, table, record_id, record):
+        """保存记录（延迟到下次批量写入时序列化）"""
+        with self._pending_lock:
+            self._pending[(table, record_id)] = record
+        if not self._flusher:
+            self.flush()
+
+    def delete(self, table, record_id):
+        """删除记录"""
+        with self._pending_lock:
+            self._pending[(table, record_id)] = None
+        if not self._flusher:
+            self.flush()
+
+    def flush(self):
+        """把所有待写入的修改在一个事务中写入数据库
+
+        Returns:
+            写入的记录数
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        # updated_at用于从进程增量重新加载，保证不会因为系统时间回拨而变小
+        now = self._last_flush_time = max(time.time(), self._last_flush_time)
+        upserts = {table: [] for table in self.TABLES}
+        deletes = {table: [] for table in self.TABLES}
+        for (table, record_id), record in pending.items():
+            if record is None:
+                deletes[table].append((record_id,))
+            else:
+                upserts[table].append((record_id, json.dumps(record, ensure_ascii=False, default=str), now))
+
+        with self._db_lock:
+            try:
+                self._conn.execute('BEGIN')
+                for table in self.TABLES:
+                    if upserts[table]:
+                        self._conn.executemany(
+                            f'INSERT INTO {table} (id, data, updated_at) VALUES (?, ?, ?) '
+                            'ON CONFLICT(id) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at',
+                            upserts[table]
+                        )
+                    if deletes[table]:
+                        self._conn.executemany(f'DELETE FROM {table} WHERE id = ?', deletes[table])
+                self._conn.execute('COMMIT')
+            except Exception as e:
+                # BEGIN本身失败（如数据库锁定超时）时没有进行中的事务，ROLLBACK会再抛出异常
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                logger.error(f"持久化写入失败: {str(e)}")
+                # 写入失败的记录放回待写入表，新的修改优先
+                with self._pending_lock:
+                    for key, record in pending.items():
+                        self._pending.setdefault(key, record)
+                return 0
+        return len(pending)
+
+    def load_all(self):
+        """一次性读取所有记录
+
+        Returns:
+            (任务记录列表, 任务组记录列表)
+        """
+        with self._db_lock:
+            tasks = [json.loads(row[0]) for row in self._conn.execute('SELECT data FROM tasks ORDER BY rowid')]
+            groups = [json.loads(row[0]) for row in self._conn.execute('SELECT data FROM task_groups ORDER BY rowid')]
+        return tasks, groups
+
+    def load_since(self, since=None):
+        """读取updated_at不早于since的任务和任务组，以及两个表中现有的全部ID（用于发现删除）
+
+        同一次批量写入的记录updated_at相同，这里按不早于比较，上次读到的最后一批记录
+        会再读一次，但不会遗漏。所有查询在同一个读事务中执行，读到的是同一时刻的数据。
+
+        Args:
+            since: 上次读取返回的时间，为None时读取全部记录
+
+        Returns:
+            (任务记录列表, 任务组记录列表, 任务ID列表, 任务组ID列表, 下次读取使用的since)，
+            ID列表按写入顺序排列
+        """
+        condition, params = ('WHERE updated_at >= ?', (since,)) if since is not None else ('', ())
+        with self._db_lock:
+            self._conn.execute('BEGIN')
+            try:
+                rows = {table: self._conn.execute(
+                    f'SELECT data, updated_at FROM {table} {condition} ORDER BY rowid', params).fetchall()
+                    for table in ('tasks', 'task_groups')}
+                ids = {table: [row[0] for row in self._conn.execute(f'SELECT id FROM {table} ORDER BY rowid')]
+                       for table in ('tasks', 'task_groups')}
+            finally:
+                self._conn.execute('COMMIT')
+        latest = max((row[1] for table_rows in rows.values() for row in table_rows), default=since)
+        return ([json.loads(row[0]) for row in rows['tasks']], [json.loads(row[0]) for row in rows['task_groups']],
+                ids['tasks'], ids['task_groups'], latest)
+
+    def load_runs(self):
+        """按写入顺序读取所有运行记录"""
+        with self._db_lock:
+            return [json.loads(row[0]) for row in self._conn.execute('SELECT data FROM runs ORDER BY rowid')]
+
+    def data_version(self):
+        """获取数据库的数据版本号，其他连接（包括其他进程）提交修改后该值会变化"""
+        with self._db_lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"持久化后台写入出错: {str(e)}")
+
+    def close(self):
+        """写入剩余修改并关闭数据库连接"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """每个测试在临时目录中运行，日志、结果文件和数据库不写入仓库目录"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def manager():
+    """带有已启动调度器的TaskManager"""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from task_manager import TaskManager
+
+    task_manager = TaskManager()
+    scheduler = BackgroundScheduler()
+    task_manager.set_scheduler(scheduler)
+    scheduler.start()
+    yield task_manager
+    scheduler.shutdown(wait=False)
+    task_manager.manual_executor.shutdown()
+
+
+def wait_for_run(task_manager, run_id, timeout=10):
+    """等待立即执行的运行结束，返回运行句柄"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        handle = task_manager.get_run(run_id)
+        if handle['status'] in ('success', 'error'):
+            return handle
+        time.sleep(0.01)
+    raise AssertionError(f'运行 {run_id} 在{timeout}秒内没有结束')
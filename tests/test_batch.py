@@ -0,0 +1,111 @@
+import sqlite3
+
+from task_manager import TaskManager
+from task_store import TaskStore
+
+FAIL_ON_BAD_NAME = (
+    "CREATE TRIGGER reject_bad BEFORE INSERT ON tasks WHEN json_extract(NEW.data, '$.task.name') = 'bad' "
+    "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+)
+
+
+def _stored_names(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT json_extract(data, '$.task.name') FROM tasks"))
+    finally:
+        conn.close()
+
+
+def test_batch_reports_each_item_and_isolates_failures(manager, monkeypatch):
+    existing = manager.create_task('existing', 'hello_world')['id']
+    start_task = TaskManager.start_task
+
+    def start_or_raise(self, task_id, config):
+        if config.get('interval') == 13:
+            raise RuntimeError('boom')
+        return start_task(self, task_id, config)
+
+    monkeypatch.setattr(TaskManager, 'start_task', start_or_raise)
+    body = manager.apply_batch('tasks', [
+        {'op': 'create', 'name': 'a', 'function': 'hello_world'},
+        {'op': 'create', 'name': 'b'},
+        {'op': 'start', 'id': existing, 'interval': 13},
+        {'op': 'start', 'id': existing, 'interval': '60'},
+        {'op': 'delete', 'id': 'missing'},
+        {'op': 'rename', 'id': existing},
+    ])
+
+    assert [result['status'] for result in body['results']] == [200, 400, 500, 200, 404, 400]
+    assert (body['succeeded'], body['failed']) == (2, 4)
+    assert 'RuntimeError: boom' in body['results'][2]['result']['error']
+    assert manager.get_task(existing)['status'] == 'running'
+    assert sorted(task['name'] for task in manager.get_all_tasks()['tasks']) == ['a', 'existing']
+
+
+def test_batch_rejects_malformed_requests(manager):
+    assert manager.apply_batch('tasks', {'op': 'create'})[1] == 400
+    assert manager.apply_batch('tasks', [{'op': 'create'}] * 1001)[1] == 400
+    assert manager.get_all_tasks()['tasks'] == []
+
+
+def test_failed_flush_rolls_back_the_whole_batch(tmp_path):
+    db_path = str(tmp_path / 'tasks.db')
+    task_manager = TaskManager()
+    store = TaskStore(db_path, flush_interval=3600)
+    task_manager.set_store(store)
+    conn = sqlite3.connect(db_path)
+    conn.execute(FAIL_ON_BAD_NAME)
+    conn.commit()
+
+    body = task_manager.apply_batch('tasks', [
+        {'op': 'create', 'name': name, 'function': 'hello_world'} for name in ('a', 'bad', 'c')
+    ])
+    assert body['succeeded'] == 3
+    # 一批修改在同一个事务中写入，其中一条失败时整个事务回滚
+    assert store.flush() == 0
+    assert _stored_names(db_path) == []
+
+    # 失败的修改保留在待写入表中，问题排除后下次写入全部保存
+    conn.execute('DROP TRIGGER reject_bad')
+    conn.commit()
+    conn.close()
+    assert store.flush() == 3
+    assert _stored_names(db_path) == ['a', 'bad', 'c']
+    store.close()
+
+
+def test_export_import_round_trip(manager):
+    first = manager.create_task('first', 'hello_world', {'name': 'A'})['id']
+    second = manager.create_task('second', 'random_number')['id']
+    group_id = manager.create_task_group('g', [second, first])['id']
+    lines = list(manager.export_records())
+    assert len(lines) == 3 and all(line.endswith('\n') for line in lines)
+
+    target = TaskManager()
+    target.set_scheduler(manager.scheduler)
+    summary = target.import_records([line.encode('utf-8') for line in lines] + ['', '{broken', '[1]'])
+    assert summary['imported'] == {'tasks': 2, 'task_groups': 1}
+    assert [error['line'] for error in summary['errors']] == [5, 6]
+    assert target.get_task(first)['args'] == {'name': 'A'}
+    assert target.get_task_group(group_id)['task_ids'] == [second, first]
+
+    # 已存在的ID默认跳过，replace时替换
+    manager.update_task(first, {'name': 'changed'})
+    changed = list(manager.export_records())
+    assert target.import_records(changed)['skipped'] == 3
+    assert target.get_task(first)['name'] == 'first'
+    assert target.import_records(changed, replace=True)['imported'] == {'tasks': 2, 'task_groups': 1}
+    assert target.get_task(first)['name'] == 'changed'
+
+
+def test_import_skips_groups_with_unknown_tasks(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    group_id = manager.create_task_group('g', [task_id])['id']
+    group_line = list(manager.export_records())[-1]
+
+    summary = TaskManager().import_records([group_line])
+    assert summary['imported'] == {'tasks': 0, 'task_groups': 0}
+    assert summary['error_count'] == 1
+    assert task_id in summary['errors'][0]['error']
+    assert group_id in manager.task_groups
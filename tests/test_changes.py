@@ -0,0 +1,58 @@
+import task_manager as task_manager_module
+from task_manager import TaskManager
+
+
+def _ops(body):
+    return [(change['type'], change['id'], change['op']) for change in body['changes']]
+
+
+def test_changes_since_version_are_merged_per_record(manager):
+    kept = manager.create_task('kept', 'hello_world')['id']
+    since = manager.version
+    epoch = manager.epoch
+
+    created = manager.create_task('created', 'hello_world')['id']
+    manager.update_task(kept, {'name': 'renamed'})
+    manager.start_task(kept, {'interval': 3600})
+    removed = manager.create_task('removed', 'hello_world')['id']
+    manager.delete_task(removed)
+
+    body = manager.get_changes(since, epoch)
+    assert body['reset'] is False
+    assert body['version'] == manager.version
+    # 同一条记录的多次变更只返回最后一次，按最后一次变更的先后排列
+    assert _ops(body) == [('tasks', created, 'create'), ('tasks', kept, 'status'), ('tasks', removed, 'delete')]
+    assert body['changes'][1]['data']['name'] == 'renamed'
+    assert body['changes'][2]['data'] is None
+
+    assert manager.get_changes(body['version'], epoch)['changes'] == []
+
+
+def test_stale_or_foreign_versions_require_reset(manager, monkeypatch):
+    manager.create_task('t', 'hello_world')
+    version = manager.version
+    assert manager.get_changes(version, 'other-epoch')['reset'] is True
+    assert manager.get_changes(version + 1, manager.epoch)['reset'] is True
+
+    # 所需的变更已被移出日志
+    monkeypatch.setattr(task_manager_module, 'CHANGE_JOURNAL_SIZE', 3)
+    small = TaskManager()
+    for index in range(5):
+        small.create_task(f't{index}', 'hello_world')
+    assert small.get_changes(0, small.epoch)['reset'] is True
+    assert small.get_changes(1, small.epoch)['reset'] is True
+    assert len(small.get_changes(2, small.epoch)['changes']) == 3
+
+
+def test_list_etag_changes_only_with_its_kind(manager):
+    task_etag = manager.list_etag('tasks')
+    group_etag = manager.list_etag('task_groups')
+    task_id = manager.create_task('t', 'hello_world')['id']
+    assert manager.list_etag('tasks') != task_etag
+    assert manager.list_etag('task_groups') == group_etag
+
+    task_etag = manager.list_etag('tasks')
+    manager.create_task_group('g', [task_id])
+    assert manager.list_etag('tasks') == task_etag
+    assert manager.list_etag('task_groups') != group_etag
+    assert manager.list_etag('tasks').startswith(manager.epoch + '-')
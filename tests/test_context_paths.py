@@ -0,0 +1,58 @@
+import pytest
+
+from task_manager import MISSING, TaskGroup, collect_context_refs, compile_path, split_ref_path
+
+DATA = {
+    'data': {
+        'items': [
+            {'id': 1, 'tags': ['a', 'b']},
+            {'id': 2, 'tags': ['c']},
+            {'id': 3, 'tags': []},
+        ],
+        'meta': {'x': {'v': 1}, 'y': {'v': 2}},
+    }
+}
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('.data.items[0].id', 1),
+    ('.data.items[-1].id', 3),
+    ('.data.items.1.id', 2),
+    ('.data.items[1:3]', [{'id': 2, 'tags': ['c']}, {'id': 3, 'tags': []}]),
+    ('.data.items[:1]', [{'id': 1, 'tags': ['a', 'b']}]),
+    ('.data.items[*].id', [1, 2, 3]),
+    ('.data.items.*.id', [1, 2, 3]),
+    ('.data.items[*].tags[0]', ['a', 'c']),
+    ('.data.items[0:2][*].id', [1, 2]),
+    ('.data.meta[*].v', [1, 2]),
+    ('', DATA),
+])
+def test_compile_path_resolves(path, expected):
+    assert compile_path(path)(DATA) == expected
+
+
+@pytest.mark.parametrize('path', ['.data.items[5]', '.data.missing', '.data.items[0].id.x', '.data.meta[0]'])
+def test_compile_path_missing(path):
+    assert compile_path(path)(DATA) is MISSING
+
+
+def test_compile_path_rejects_invalid_syntax():
+    with pytest.raises(ValueError):
+        compile_path('.data[abc')
+
+
+def test_split_ref_path_and_collected_keys():
+    assert split_ref_path('last_json.items[0].id') == ('last_json', '.items[0].id')
+    assert split_ref_path('task_1_result[*]') == ('task_1_result', '[*]')
+    refs = collect_context_refs({
+        'a': '${context:last_json.items[*].id}',
+        'b': ['${http.response_json:t1.data[1:2]}', '${http.status:last}'],
+    })
+    assert refs == {'last_json', 'task_t1_json', 'last_result'}
+
+
+def test_context_reference_resolves_wildcard(manager):
+    task_group = TaskGroup('g', 'g', [])
+    task_group.set_context_value('last_json', DATA)
+    assert manager._process_arg_value('${context:last_json.data.items[*].id}', task_group) == [1, 2, 3]
+    assert manager._process_arg_value('${context:last_json.data.items[5]}', task_group) is None
@@ -0,0 +1,66 @@
+from conftest import wait_for_run
+from task_manager import TaskGroup, TaskRecord, collect_context_refs
+
+
+def _task(task_id, args=None):
+    return TaskRecord(task_id, task_id, 'hello_world', args)
+
+
+def test_plan_keeps_only_keys_referenced_by_later_steps():
+    tasks = {
+        'a': _task('a'),
+        'b': _task('b', {'name': '${context:task_a_result}'}),
+        'c': _task('c', {'name': '${http.response_json:last.items[0]}'}),
+    }
+    group = TaskGroup('g', 'g', ['a', 'b', 'c'])
+    group.plan_context_liveness(tasks)
+
+    assert group.live_context_keys == [
+        frozenset({'task_a_result', 'last_json'}),
+        frozenset({'last_json'}),
+        frozenset(),
+    ]
+
+
+def test_prune_context_releases_dropped_sizes():
+    group = TaskGroup('g', 'g', ['a', 'b'])
+    group.plan_context_liveness({'a': _task('a'), 'b': _task('b', {'name': '${context:keep}'})})
+    group.set_context_value('keep', 'x' * 100)
+    group.set_context_value('drop', 'y' * 1000)
+    peak = group.context_bytes
+
+    assert group.prune_context(0) == ['drop']
+    assert set(group.context) == {'keep'}
+    assert group.context_bytes == group.context_sizes['keep']
+    assert group.context_peak_bytes == peak
+
+
+def test_pruned_key_is_never_referenced_later(manager, monkeypatch):
+    first = manager.create_task('first', 'hello_world', {'name': 'A'})['id']
+    second = manager.create_task('second', 'hello_world', {'name': f'${{context:task_{first}_result}}'})['id']
+    third = manager.create_task('third', 'hello_world', {'name': '${context:last_result}'})['id']
+    group_id = manager.create_task_group('g', [first, second, third])['id']
+    task_group = manager.task_groups[group_id]
+
+    pruned = []
+    prune_context = TaskGroup.prune_context
+
+    def record_prune(self, index):
+        dropped = prune_context(self, index)
+        pruned.append((index, dropped))
+        return dropped
+
+    monkeypatch.setattr(TaskGroup, 'prune_context', record_prune)
+    body, status = manager.execute_task_group_now(group_id)
+    assert status == 202
+    assert wait_for_run(manager, body['run_id'])['status'] == 'success'
+
+    assert any(dropped for _, dropped in pruned)
+    for index, dropped in pruned:
+        later = set()
+        for task_id in task_group.task_ids[index + 1:]:
+            collect_context_refs(manager.tasks[task_id].args, later)
+        assert not later & set(dropped)
+    # 被引用的值在需要它的步骤执行时仍然存在
+    run = manager.get_runs(second)['runs'][0]
+    assert manager.results.get(run['run_id']).read().decode('utf-8').startswith('"你好，你好，A！')
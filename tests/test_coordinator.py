@@ -0,0 +1,132 @@
+import time
+
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+from flask import Flask, request
+from werkzeug.test import Client
+
+from coordinator import OWNER_ONLY_PATH, FileLock, SchedulerCoordinator
+from task_manager import TaskManager
+from task_store import TaskStore
+
+
+def _app(task_manager):
+    app = Flask(__name__)
+
+    @app.get('/api/tasks')
+    def list_tasks():
+        return {'names': sorted(view.name for view in task_manager._task_views.values()),
+                'served_by': app.config.get('NAME')}
+
+    @app.post('/api/tasks')
+    def create_task():
+        return task_manager.create_task(request.get_json()['name'], 'hello_world'), 201
+
+    @app.get('/api/runs/<run_id>')
+    def get_run(run_id):
+        return {'run_id': run_id, 'served_by': app.config.get('NAME')}
+
+    return app
+
+
+@pytest.fixture
+def node(tmp_path, monkeypatch):
+    """在同一个进程中创建共享数据库和锁文件的多个节点"""
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    created = []
+
+    def create(name, **kwargs):
+        task_manager = TaskManager()
+        scheduler = BackgroundScheduler()
+        task_manager.set_scheduler(scheduler)
+        store = TaskStore(str(tmp_path / 'data' / 'tasks.db'))
+        app = _app(task_manager)
+        app.config['NAME'] = name
+        coordinator = SchedulerCoordinator(app, scheduler, task_manager, store,
+                                           str(tmp_path / 'data' / 'scheduler.lock'), **kwargs)
+        created.append((coordinator, scheduler, task_manager, store))
+        return coordinator
+
+    yield create
+    for coordinator, scheduler, task_manager, store in reversed(created):
+        coordinator.stop()
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
+        task_manager.manual_executor.shutdown()
+        store.close()
+
+
+def test_file_lock_is_exclusive_until_released(tmp_path):
+    first = FileLock(str(tmp_path / 'locks' / 'scheduler.lock'))
+    second = FileLock(str(tmp_path / 'locks' / 'scheduler.lock'))
+    assert first.acquire()
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    first.release()
+    assert second.acquire()
+    assert not first.acquire()
+    second.release()
+
+
+@pytest.mark.parametrize('path, forwarded', [
+    ('/api/runs/abc', True),
+    ('/api/runs/abc/result', True),
+    ('/api/runs/abc/profile', True),
+    ('/api/schedule', True),
+    ('/api/schedule/load', True),
+    ('/api/schedule/simulate', True),
+    ('/api/tasks/t1/schedule', True),
+    ('/api/task-groups/g1/runs', True),
+    ('/api/tasks/t1/lag', True),
+    ('/api/tasks', False),
+    ('/api/tasks/t1', False),
+    ('/api/runs', False),
+    ('/api/runs/abc/other', False),
+    ('/api/schedule/other', False),
+    ('/api/tasks/t1/runs/extra', False),
+    ('/api/changes', False),
+])
+def test_owner_only_paths(path, forwarded):
+    assert bool(OWNER_ONLY_PATH.match(path)) == forwarded
+
+
+def test_control_app_requires_the_owner_token(node):
+    coordinator = node('owner')
+    coordinator.start()
+    client = Client(coordinator._control_app)
+    assert client.get('/api/runs/r1').status_code == 403
+    assert client.get('/api/runs/r1', headers={'X-Scheduler-Token': 'wrong'}).status_code == 403
+    response = client.get('/api/runs/r1', headers={'X-Scheduler-Token': coordinator.token})
+    assert response.status_code == 200
+    assert response.get_json()['run_id'] == 'r1'
+
+
+def test_one_owner_and_follower_forwards_mutations(node):
+    owner = node('owner')
+    owner.start()
+    # 刷新间隔足够长，读请求本身不会触发重新加载
+    follower = node('follower', retry_interval=0.05, refresh_interval=3600)
+    follower.start()
+    assert owner.is_owner and owner.scheduler.running
+    assert not follower.is_owner and not follower.scheduler.running
+
+    client = follower.app.test_client()
+    response = client.post('/api/tasks', json={'name': 'created via follower'})
+    assert response.status_code == 201
+    # 任务在主进程中创建，从进程转发后立即刷新副本，马上能读到自己的修改
+    assert owner.task_manager.get_task(response.get_json()['id'])['name'] == 'created via follower'
+    assert client.get('/api/tasks').get_json() == {'names': ['created via follower'], 'served_by': 'follower'}
+    # 只在主进程内存中的查询转发给主进程
+    assert client.get('/api/runs/r1').get_json()['served_by'] == 'owner'
+
+    # 主进程退出后从进程接管调度
+    owner.stop()
+    deadline = time.monotonic() + 5
+    while not follower.is_owner:
+        assert time.monotonic() < deadline, '从进程没有接管调度'
+        time.sleep(0.02)
+    assert follower.scheduler.running
+    assert client.get('/api/runs/r1').get_json()['served_by'] == 'follower'
+    assert 'created via follower' in [task.name for task in follower.task_manager.tasks.values()]
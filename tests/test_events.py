@@ -0,0 +1,66 @@
+from events import EventBroadcaster, EventSubscription, event_stream
+
+
+def test_repeated_changes_to_a_record_are_coalesced():
+    subscription = EventSubscription(max_pending=10)
+    assert not subscription.wait(0)
+    subscription.push(1, 'tasks', 'a', 'upsert')
+    subscription.push(2, 'tasks', 'b', 'upsert')
+    subscription.push(3, 'tasks', 'a', 'delete')
+    subscription.push(4, 'task_groups', 'a', 'upsert')
+    assert subscription.wait(0)
+
+    # 只保留最后一次变更，并按最后一次变更的先后排列
+    assert subscription.drain() == (False, [
+        ('tasks', 'b', 2, 'upsert'),
+        ('tasks', 'a', 3, 'delete'),
+        ('task_groups', 'a', 4, 'upsert'),
+    ])
+    assert not subscription.wait(0)
+    assert subscription.drain() == (False, [])
+
+
+def test_exceeding_max_pending_resets_the_client():
+    subscription = EventSubscription(max_pending=3)
+    for version in range(1, 4):
+        subscription.push(version, 'tasks', str(version), 'upsert')
+    # 同一条记录的变更不增加待发送数
+    subscription.push(4, 'tasks', '3', 'upsert')
+    assert len(subscription.drain()[1]) == 3
+
+    for version in range(1, 5):
+        subscription.push(version, 'tasks', str(version), 'upsert')
+    # 重置后到下一次发送前的变更都已包含在重新获取的完整列表中
+    subscription.push(5, 'tasks', '5', 'upsert')
+    assert subscription.drain() == (True, [])
+    subscription.push(6, 'tasks', '6', 'upsert')
+    assert subscription.drain() == (False, [('tasks', '6', 6, 'upsert')])
+
+
+def test_broadcaster_limits_clients_and_fans_out():
+    broadcaster = EventBroadcaster(max_clients=2, max_pending=10)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    assert broadcaster.subscribe() is None
+    assert broadcaster.client_count() == 2
+
+    broadcaster.publish(1, 'tasks', 'a', 'upsert')
+    broadcaster.unsubscribe(second)
+    broadcaster.publish(2, 'tasks', 'b', 'upsert')
+    assert first.drain() == (False, [('tasks', 'a', 1, 'upsert'), ('tasks', 'b', 2, 'upsert')])
+    assert second.drain() == (False, [('tasks', 'a', 1, 'upsert')])
+
+    broadcaster.publish(3, 'tasks', 'c', 'upsert')
+    broadcaster.reset()
+    assert first.drain() == (True, [])
+    assert broadcaster.subscribe() is not None
+
+
+def test_event_stream_sends_heartbeats_and_batches():
+    subscription = EventSubscription(max_pending=10)
+    stream = event_stream(subscription, heartbeat=0.01, min_interval=0)
+    assert next(stream) == (False, [])
+    subscription.push(1, 'tasks', 'a', 'upsert')
+    subscription.push(2, 'tasks', 'a', 'upsert')
+    assert next(stream) == (False, [('tasks', 'a', 2, 'upsert')])
+    subscription.reset()
+    assert next(stream) == (True, [])
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+import tasks
+from conftest import wait_for_run
+from job_executor import BoundedExecutor
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """让任务阻塞到测试放行为止的gated任务函数"""
+    event = threading.Event()
+
+    def gated(value=None):
+        if not event.wait(10):
+            raise TimeoutError('gate was never opened')
+        if value == 'fail':
+            raise ValueError('failed on purpose')
+        return {'value': value}
+
+    monkeypatch.setattr(tasks, 'gated', gated, raising=False)
+    return event
+
+
+@pytest.fixture
+def small_executor(manager):
+    manager.manual_executor.shutdown()
+    manager.manual_executor = BoundedExecutor(1, 1, 'ManualRun')
+    return manager.manual_executor
+
+
+def _wait_status(manager, run_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while manager.get_run(run_id)['status'] != status:
+        assert time.monotonic() < deadline, f'运行 {run_id} 没有进入{status}状态'
+        time.sleep(0.01)
+
+
+def test_execute_now_returns_a_handle_and_runs_in_background(manager, gate):
+    task_id = manager.create_task('t', 'gated', {'value': 42})['id']
+    body, status = manager.execute_task_now(task_id)
+    assert status == 202
+    assert body['status'] == 'queued'
+    _wait_status(manager, body['run_id'], 'running')
+
+    gate.set()
+    handle = wait_for_run(manager, body['run_id'])
+    assert handle['status'] == 'success'
+    assert handle['owner_id'] == task_id
+    assert handle['result'] == f"/api/runs/{body['run_id']}/result"
+    assert manager.results.get(body['run_id']).read() == b'{"value": 42}'
+    assert manager.get_task(task_id)['run_count'] == 1
+
+
+def test_failed_run_is_reported_on_the_handle(manager, gate):
+    gate.set()
+    task_id = manager.create_task('t', 'gated', {'value': 'fail'})['id']
+    handle = wait_for_run(manager, manager.execute_task_now(task_id)[0]['run_id'])
+    assert handle['status'] == 'error'
+    assert 'failed on purpose' in handle['error']
+
+
+def test_saturated_executor_rejects_with_429(manager, gate, small_executor):
+    task_id = manager.create_task('t', 'gated')['id']
+    group_id = manager.create_task_group('g', [task_id])['id']
+    rejected = metrics.MANUAL_RUNS_REJECTED.labels('task').value
+    group_rejected = metrics.MANUAL_RUNS_REJECTED.labels('task_group').value
+
+    running = manager.execute_task_now(task_id)[0]['run_id']
+    queued = manager.execute_task_now(task_id)[0]['run_id']
+    _wait_status(manager, running, 'running')
+    assert manager.get_run(queued)['status'] == 'queued'
+
+    assert manager.execute_task_now(task_id)[1] == 429
+    assert manager.execute_task_group_now(group_id)[1] == 429
+    assert metrics.MANUAL_RUNS_REJECTED.labels('task').value == rejected + 1
+    assert metrics.MANUAL_RUNS_REJECTED.labels('task_group').value == group_rejected + 1
+    assert small_executor.in_flight() == 2
+
+    gate.set()
+    assert wait_for_run(manager, running)['status'] == 'success'
+    assert wait_for_run(manager, queued)['status'] == 'success'
+    # 运行结束后释放位置，可以再次提交
+    deadline = time.monotonic() + 5
+    while small_executor.in_flight():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    body, status = manager.execute_task_now(task_id)
+    assert status == 202
+    assert wait_for_run(manager, body['run_id'])['status'] == 'success'
+
+
+def test_unknown_runs_and_tasks(manager):
+    assert manager.get_run('missing')[1] == 404
+    assert manager.execute_task_now('missing')[1] == 404
+    task_id = manager.create_task('t', 'no_such_function')['id']
+    assert manager.execute_task_now(task_id)[1] == 400
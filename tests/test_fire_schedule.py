@@ -0,0 +1,79 @@
+import datetime
+import time
+
+import pytest
+
+
+def _parse(value):
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _gaps(fires):
+    times = [_parse(fire) for fire in fires]
+    return [round(later - earlier) for earlier, later in zip(times, times[1:])]
+
+
+def test_cached_preview_follows_trigger_changes(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    assert manager.get_fire_preview(task_id)['fires'] == []
+    manager.start_task(task_id, {'interval': 3600})
+    assert _gaps(manager.get_fire_preview(task_id, 4)['fires']) == [3600] * 3
+    # 再次预览使用缓存的展开结果
+    assert len(manager.fire_times._entries) == 1
+    assert _gaps(manager.get_fire_preview(task_id, 4)['fires']) == [3600] * 3
+
+    # 修改触发器配置会停止任务，重新启动后读到新配置的触发时间
+    manager.update_task(task_id, {'interval': 60})
+    assert manager.get_fire_preview(task_id)['fires'] == []
+    manager.start_task(task_id, {'interval': 60})
+    assert _gaps(manager.get_fire_preview(task_id, 4)['fires']) == [60] * 3
+
+    manager.stop_task(task_id)
+    manager.start_task(task_id, {'cron': '0 0 * * *'})
+    assert _gaps(manager.get_fire_preview(task_id, 3)['fires']) == [86400] * 2
+    assert manager.get_fire_preview(task_id, 0)[1] == 400
+    assert manager.get_fire_preview('missing')[1] == 404
+
+
+def test_fleet_schedule_is_merged_in_order(manager):
+    fast = manager.create_task('fast', 'hello_world')['id']
+    slow = manager.create_task('slow', 'hello_world')['id']
+    idle = manager.create_task('idle', 'hello_world')['id']
+    group_id = manager.create_task_group('g', [idle])['id']
+    manager.start_task(fast, {'interval': 300})
+    manager.start_task(slow, {'interval': 700})
+    manager.start_task_group(group_id, {'interval': 1000})
+
+    schedule = manager.get_fire_schedule()
+    times = [_parse(fire['time']) for fire in schedule['fires']]
+    assert times == sorted(times)
+    assert _parse(schedule['from']) <= times[0] and times[-1] < _parse(schedule['to'])
+    assert _parse(schedule['to']) - _parse(schedule['from']) == pytest.approx(3600)
+    assert {(fire['type'], fire['id'], fire['name']) for fire in schedule['fires']} == {
+        ('task', fast, 'fast'), ('task', slow, 'slow'), ('task_group', group_id, 'g')}
+    assert [fire['id'] for fire in schedule['fires']].count(fast) == 12
+    assert not schedule['truncated']
+
+    # 恰好取完时不算截断，少取一条时返回相同的前缀
+    total = len(schedule['fires'])
+    exact = manager.get_fire_schedule(schedule['from'], schedule['to'], limit=total)
+    assert exact['fires'] == schedule['fires'] and not exact['truncated']
+    cut = manager.get_fire_schedule(schedule['from'], schedule['to'], limit=total - 1)
+    assert cut['fires'] == schedule['fires'][:-1] and cut['truncated']
+
+
+def test_fleet_schedule_window(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    manager.start_task(task_id, {'interval': 60})
+    # 早于当前时间的开始时间按当前时间计算，返回的from是实际使用的开始时间
+    past = datetime.datetime.fromtimestamp(time.time() - 86400, datetime.timezone.utc).isoformat()
+    schedule = manager.get_fire_schedule(past)
+    assert _parse(schedule['from']) == pytest.approx(time.time(), abs=5)
+    assert len(schedule['fires']) == 60
+
+    future = datetime.datetime.fromtimestamp(time.time() + 7200, datetime.timezone.utc)
+    later = manager.get_fire_schedule(future.isoformat(), (future + datetime.timedelta(minutes=10)).isoformat())
+    assert len(later['fires']) == 10
+    assert manager.get_fire_schedule(past, past)[1] == 400
+    assert manager.get_fire_schedule('yesterday')[1] == 400
+    assert manager.get_fire_schedule(limit=0)[1] == 400
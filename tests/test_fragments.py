@@ -0,0 +1,87 @@
+import gc
+import json
+import weakref
+
+from task_manager import TaskGroup, TaskRecord
+
+
+class Payload(dict):
+    """可以建立弱引用的上下文值"""
+
+
+def _count_to_dict(monkeypatch, cls):
+    calls = []
+    to_dict = cls.to_dict
+
+    def counting(self):
+        calls.append(self.id)
+        return to_dict(self)
+
+    monkeypatch.setattr(cls, 'to_dict', counting)
+    return calls
+
+
+def test_unchanged_records_reuse_cached_fragments(manager, monkeypatch):
+    task_ids = [manager.create_task(f't{index}', 'hello_world')['id'] for index in range(5)]
+    calls = _count_to_dict(monkeypatch, TaskRecord)
+
+    first = json.loads(manager.query_tasks(fields=['id', 'name']))
+    assert len(calls) == 5
+    second = json.loads(manager.query_tasks(fields=['id', 'name']))
+    assert len(calls) == 5
+    assert first['tasks'] == second['tasks']
+
+    # 只有修改过的记录重新序列化，每种字段投影单独缓存
+    manager.update_task(task_ids[2], {'name': 'renamed'})
+    calls.clear()
+    third = json.loads(manager.query_tasks(fields=['id', 'name']))
+    assert calls == [task_ids[2]]
+    assert third['tasks'][2]['name'] == 'renamed'
+    json.loads(manager.query_tasks(fields=['id', 'status']))
+    assert len(calls) == 6
+
+
+def test_deleted_records_leave_the_cache(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    manager.query_tasks()
+    manager.delete_task(task_id)
+    assert json.loads(manager.query_tasks())['tasks'] == []
+    assert all(task_id not in cache for cache in manager._fragment_caches.values())
+
+
+def test_cached_fragments_do_not_keep_pruned_context_alive(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    group_id = manager.create_task_group('g', [task_id])['id']
+    task_group = manager.task_groups[group_id]
+    payload = Payload(items=list(range(1000)))
+    reference = weakref.ref(payload)
+    with manager._lock:
+        task_group.set_context_value('task_x_json', payload)
+        manager._persist_group(task_group)
+    del payload
+
+    # 快照中只有上下文摘要
+    summary = manager._group_views[group_id].context['task_x_json']
+    assert summary == 'JSON对象，包含1个字段: items'
+    for fields in (None, ['id', 'context'], ['id', 'name']):
+        body = json.loads(manager.query_task_groups(fields=fields))
+        assert body['task_groups'][0]['id'] == group_id
+
+    with manager._lock:
+        task_group.clear_context()
+        manager._persist_group(task_group)
+    gc.collect()
+    assert reference() is None
+    assert 'context' not in json.loads(manager.query_task_groups())['task_groups'][0]
+
+
+def test_group_view_summary_matches_to_dict():
+    task_group = TaskGroup('g', 'g', [])
+    task_group.set_context_value('last_content', 'x' * 500)
+    task_group.set_context_value('last_result', {'status_code': 200, 'content': 'y' * 500})
+    task_group.set_context_value('count', 3)
+    view = task_group.copy()
+    assert view.to_dict()['context'] == task_group.to_dict()['context']
+    assert task_group.same_as(view)
+    task_group.set_context_value('count', 4)
+    assert not task_group.same_as(view)
@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from task_manager import TaskManager
+from triggers import PHASE_ANCHOR, ShiftedTrigger, crontab_trigger, phase_offset
+
+UTC = datetime.timezone.utc
+NOW = datetime.datetime(2026, 3, 1, 12, 0, 7, tzinfo=UTC)
+
+
+def _fire_times(trigger, count=5, now=NOW):
+    fires = []
+    fire_time = trigger.get_next_fire_time(None, now)
+    while fire_time is not None and len(fires) < count:
+        fires.append(fire_time)
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+    return fires
+
+
+def test_phase_offset_is_stable_and_within_window():
+    offsets = [phase_offset(f'task-{index}', 60) for index in range(1000)]
+    assert offsets == [phase_offset(f'task-{index}', 60) for index in range(1000)]
+    assert all(0 <= offset < 60 for offset in offsets)
+    # 偏移分散在整个窗口内
+    assert len({int(offset) for offset in offsets}) == 60
+    assert phase_offset('task-0', 0) == 0.0
+    assert phase_offset('task-0', 0.5) < 0.5
+
+
+def test_interval_jitter_gives_same_fire_times_in_every_process():
+    config = {'interval': 300, 'jitter': 60}
+    first = _fire_times(TaskManager()._build_trigger(config, 'task-a'))
+    second = _fire_times(TaskManager()._build_trigger(config, 'task-a'))
+    assert first == second
+    assert [(later - earlier).total_seconds() for earlier, later in zip(first, first[1:])] == [300] * 4
+    # 对齐到以PHASE_ANCHOR为起点的间隔网格再加上偏移
+    phase = (first[0] - PHASE_ANCHOR).total_seconds() % 300
+    assert phase == pytest.approx(phase_offset('task-a', 60))
+
+    other = _fire_times(TaskManager()._build_trigger(config, 'task-b'))
+    assert other[0] != first[0]
+
+
+def test_interval_jitter_is_capped_by_interval_and_keeps_explicit_start():
+    task_manager = TaskManager()
+    trigger = task_manager._build_trigger({'interval': 10, 'jitter': 3600}, 'task-a')
+    assert (trigger.start_date - PHASE_ANCHOR).total_seconds() == pytest.approx(phase_offset('task-a', 10))
+
+    start = datetime.datetime(2026, 3, 1, 12, 0, 0, tzinfo=UTC)
+    trigger = task_manager._build_trigger({'interval': 10, 'jitter': 60, 'start_time': start}, 'task-a')
+    assert trigger.start_date == start
+
+
+def test_cron_jitter_shifts_every_fire_time():
+    task_manager = TaskManager()
+    plain = _fire_times(crontab_trigger('*/5 * * * *', timezone=UTC))
+    shifted = task_manager._build_trigger({'cron': '*/5 * * * *', 'jitter': 120}, 'task-a')
+    assert isinstance(shifted, ShiftedTrigger)
+    shifted.trigger = crontab_trigger('*/5 * * * *', timezone=UTC)
+    offset = datetime.timedelta(seconds=phase_offset('task-a', 120))
+    fires = _fire_times(shifted, now=plain[0] + offset)
+    assert fires == [fire + offset for fire in plain]
+
+
+def test_shifted_trigger_respects_end_date():
+    end = datetime.datetime(2026, 3, 1, 12, 15, 0, tzinfo=UTC)
+    trigger = ShiftedTrigger(crontab_trigger('*/5 * * * *', end_date=end, timezone=UTC), 30)
+    fires = _fire_times(trigger, count=10)
+    # 12:15的触发推迟后晚于结束时间，不再触发
+    assert [fire.strftime('%H:%M:%S') for fire in fires] == ['12:00:30', '12:05:30', '12:10:30']
+
+
+def test_invalid_or_disabled_jitter():
+    task_manager = TaskManager()
+    assert 'error' in task_manager._build_trigger({'interval': 60, 'jitter': -1}, 'task-a')
+    assert 'error' in task_manager._build_trigger({'interval': 60, 'jitter': 86401}, 'task-a')
+    # 没有任务ID时不错开
+    assert task_manager._build_trigger({'interval': 60, 'jitter': 30}).start_date != PHASE_ANCHOR
+    trigger = task_manager._build_trigger({'cron': '0 * * * *', 'jitter': 0}, 'task-a')
+    assert not isinstance(trigger, ShiftedTrigger)
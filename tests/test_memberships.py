@@ -0,0 +1,64 @@
+def _expected_memberships(manager):
+    """按全部任务组的任务列表重新计算的反向索引"""
+    memberships = {}
+    for group_id, task_group in manager.task_groups.items():
+        for task_id in set(task_group.task_ids):
+            memberships.setdefault(task_id, set()).add(group_id)
+    return memberships
+
+
+def _assert_consistent(manager):
+    assert {task_id: set(group_ids) for task_id, group_ids in manager._memberships.items()} == \
+        _expected_memberships(manager)
+    assert all(manager._memberships.values())
+
+
+def _groups_of(manager, task_id):
+    return [(group['name'], group['position']) for group in manager.get_task_memberships(task_id)['task_groups']]
+
+
+def test_reverse_index_follows_task_deletes_and_group_edits(manager):
+    a, b, c = (manager.create_task(name, 'hello_world')['id'] for name in 'abc')
+    g1 = manager.create_task_group('g1', [a, b])['id']
+    g2 = manager.create_task_group('g2', [b, c])['id']
+    _assert_consistent(manager)
+    assert _groups_of(manager, b) == [('g1', 1), ('g2', 0)]
+
+    # 删除任务时从所有任务组中移除，索引项一并删除
+    result = manager.delete_task(b)
+    assert [group['id'] for group in result['affected_groups']] == [g1, g2]
+    assert manager.task_groups[g1].task_ids == [a]
+    assert manager.task_groups[g2].task_ids == [c]
+    assert b not in manager._memberships
+    _assert_consistent(manager)
+
+    # 修改任务组的任务列表只更新新增和移除的任务
+    manager.update_task_group(g1, {'task_ids': [c, a]})
+    _assert_consistent(manager)
+    assert _groups_of(manager, c) == [('g1', 0), ('g2', 0)]
+    assert _groups_of(manager, a) == [('g1', 1)]
+
+    manager.update_task_group(g2, {'task_ids': []})
+    manager.remove_task_from_group(g1, a)
+    _assert_consistent(manager)
+    assert a not in manager._memberships
+    assert _groups_of(manager, c) == [('g1', 0)]
+
+    manager.add_task_to_group(g2, a)
+    manager.delete_task_group(g1)
+    _assert_consistent(manager)
+    assert _groups_of(manager, a) == [('g2', 0)]
+    assert _groups_of(manager, c) == []
+    assert manager.get_task_memberships(b)[1] == 404
+
+
+def test_rebuilt_index_matches_incremental_updates(manager):
+    a, b = (manager.create_task(name, 'hello_world')['id'] for name in 'ab')
+    g1 = manager.create_task_group('g1', [a, b])['id']
+    manager.create_task_group('g2', [b])
+    manager.update_task_group(g1, {'task_ids': [b]})
+    incremental = dict(manager._memberships)
+    with manager._lock:
+        manager._publish_all()
+    assert {task_id: set(ids) for task_id, ids in manager._memberships.items()} == \
+        {task_id: set(ids) for task_id, ids in incremental.items()}
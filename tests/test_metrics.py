@@ -0,0 +1,70 @@
+import math
+import threading
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_exposition_has_help_type_and_escaped_labels():
+    counter = Counter('demo_total', '示例计数', ('path', 'status'))
+    counter.labels('a"b\\c\nd', 'ok').inc()
+    counter.labels('a"b\\c\nd', 'ok').inc(2)
+    assert counter.collect() == [
+        '# HELP demo_total 示例计数',
+        '# TYPE demo_total counter',
+        'demo_total{path="a\\"b\\\\c\\nd",status="ok"} 3',
+    ]
+
+
+def test_unlabelled_metrics_render_without_braces():
+    registry = Registry()
+    counter = registry.register(Counter('plain_total', '计数'))
+    gauge = registry.register(Gauge('plain_value', '数值'))
+    counter.inc()
+    gauge.set(1.5)
+    assert registry.render() == (
+        '# HELP plain_total 计数\n# TYPE plain_total counter\nplain_total 1\n'
+        '# HELP plain_value 数值\n# TYPE plain_value gauge\nplain_value 1.5\n')
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    histogram = Histogram('latency_seconds', '耗时', ('host',), buckets=(1, 0.1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.labels('h').observe(value)
+    assert histogram.collect()[2:] == [
+        'latency_seconds_bucket{host="h",le="0.1"} 2',
+        'latency_seconds_bucket{host="h",le="1"} 3',
+        'latency_seconds_bucket{host="h",le="+Inf"} 4',
+        'latency_seconds_sum{host="h"} 3.65',
+        'latency_seconds_count{host="h"} 4',
+    ]
+    assert histogram.collect()[1] == '# TYPE latency_seconds histogram'
+
+
+def test_gauge_function_is_read_at_export_and_errors_become_nan():
+    gauge = Gauge('depth', '深度', ('queue',))
+    items = []
+    gauge.labels('q').set_function(lambda: len(items))
+    items.extend([1, 2])
+    assert gauge.collect()[2] == 'depth{queue="q"} 2'
+
+    def broken():
+        raise RuntimeError('gone')
+
+    gauge.labels('q').set_function(broken)
+    assert math.isnan(gauge.labels('q').get())
+    assert gauge.collect()[2] == 'depth{queue="q"} nan'
+
+
+def test_concurrent_increments_are_not_lost():
+    counter = Counter('hits_total', '计数', ('kind',))
+
+    def work():
+        for _ in range(10000):
+            counter.labels('k').inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.labels('k').value == 40000
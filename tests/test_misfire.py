@@ -0,0 +1,81 @@
+import datetime
+import time
+
+import pytest
+from apscheduler.events import EVENT_JOB_MISSED, JobExecutionEvent
+
+import metrics
+from task_manager import TaskManager
+
+
+@pytest.mark.parametrize('config, expected', [
+    ({}, {}),
+    ({'misfire_policy': 'skip'}, {'misfire_grace_time': 1, 'coalesce': False}),
+    ({'misfire_policy': 'run_once'}, {'misfire_grace_time': None, 'coalesce': True}),
+    ({'misfire_policy': 'run_all'}, {'misfire_grace_time': None, 'coalesce': False}),
+    ({'misfire_policy': 'run_once', 'misfire_grace_time': 30}, {'misfire_grace_time': 30, 'coalesce': True}),
+    # 只配置容错时间时不修改调度器的coalesce默认值
+    ({'misfire_grace_time': 5}, {'misfire_grace_time': 5}),
+])
+def test_misfire_options(config, expected):
+    assert TaskManager()._misfire_options(config) == expected
+
+
+@pytest.mark.parametrize('config', [{'misfire_policy': 'later'}, {'misfire_grace_time': 0}])
+def test_invalid_misfire_options(config):
+    assert 'error' in TaskManager()._misfire_options(config)
+
+
+def test_policy_reaches_the_scheduler_job(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    assert manager.start_task(task_id, {'interval': 3600, 'misfire_policy': 'run_once'})['status'] == 'running'
+    job = manager.scheduler.get_job(task_id)
+    assert job.coalesce is True
+    assert job.misfire_grace_time is None
+
+    other_id = manager.create_task('t2', 'hello_world')['id']
+    assert manager.start_task(other_id, {'interval': 3600, 'misfire_policy': 'later'})[1] == 400
+    assert manager.get_task(other_id)['status'] != 'running'
+
+
+def _missed(job_id):
+    scheduled = datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc)
+    return JobExecutionEvent(EVENT_JOB_MISSED, job_id, 'default', scheduled)
+
+
+def test_missed_jobs_are_counted_per_owner(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    group_id = manager.create_task_group('g', [task_id])['id']
+    before = metrics.SCHEDULER_MISFIRES._default.value
+
+    manager._on_job_missed(_missed(task_id))
+    manager._on_job_missed(_missed(task_id))
+    manager._on_job_missed(_missed(f'group_{group_id}'))
+
+    assert metrics.SCHEDULER_MISFIRES._default.value == before + 3
+    assert manager.get_schedule_lag(task_id)['misfires'] == 2
+    assert manager.get_schedule_lag(group_id)['misfires'] == 1
+
+
+def test_schedule_lag_reports_policy_and_scheduled_run_delay(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    assert manager.get_schedule_lag(task_id) == {
+        'id': task_id, 'misfire_policy': None, 'misfire_grace_time': None, 'misfires': 0,
+        'lag': {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+    }
+    manager.start_task(task_id, {'interval': 3600, 'misfire_policy': 'skip', 'misfire_grace_time': 10})
+    observed = sum(metrics.SCHEDULER_LAG._default.counts)
+
+    func = manager._get_function('hello_world')
+    manager._run_scheduled_task(task_id, func, time.time() - 2)
+    # 没有计划时间的运行按零延迟记录，不计入调度延迟指标
+    manager._run_scheduled_task(task_id, func)
+
+    lag = manager.get_schedule_lag(task_id)
+    assert lag['misfire_policy'] == 'skip'
+    assert lag['misfire_grace_time'] == 10
+    assert lag['lag']['count'] == 2
+    assert lag['lag']['max'] >= 2
+    assert lag['lag']['p50'] < 1
+    assert sum(metrics.SCHEDULER_LAG._default.counts) == observed + 1
+    assert manager.get_schedule_lag('missing')[1] == 404
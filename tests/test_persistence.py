@@ -0,0 +1,100 @@
+import sqlite3
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from task_manager import TaskGroup, TaskManager
+from task_store import TaskStore
+
+
+def _open(db_path):
+    task_manager = TaskManager()
+    scheduler = BackgroundScheduler()
+    task_manager.set_scheduler(scheduler)
+    task_manager.set_store(TaskStore(db_path, flush_interval=0))
+    return task_manager, scheduler
+
+
+def test_persist_and_reload_round_trip(tmp_path):
+    db_path = str(tmp_path / 'tasks.db')
+    first, scheduler = _open(db_path)
+    scheduler.start()
+    running = first.create_task('running', 'hello_world', {'name': '张三', 'nested': {'k': [1, 2]}})['id']
+    idle = first.create_task('idle', 'random_number', {'min_val': 5})['id']
+    assert first.start_task(running, {'interval': 3600, 'misfire_policy': 'skip'})['status'] == 'running'
+    group_id = first.create_task_group('g', [idle, running])['id']
+    assert first.start_task_group(group_id, {'cron': '0 3 * * *'})['status'] == 'running'
+    expected_tasks = {task_id: first.get_task(task_id) for task_id in (running, idle)}
+    scheduler.shutdown(wait=False)
+    first.store.close()
+
+    second, scheduler = _open(db_path)
+    assert second.restore() == {'tasks': 2, 'task_groups': 1, 'rescheduled': 2}
+    scheduler.start()
+    try:
+        for task_id, expected in expected_tasks.items():
+            restored = second.get_task(task_id)
+            for key in ('name', 'function', 'args', 'status', 'created_at', 'run_count'):
+                assert restored[key] == expected[key]
+        assert second.tasks[running].interval == 3600
+        assert second.tasks[running].misfire_policy == 'skip'
+        assert scheduler.get_job(running) is not None
+
+        group = second.get_task_group(group_id)
+        assert group['task_ids'] == [idle, running]
+        assert group['status'] == 'running'
+        assert scheduler.get_job(f'group_{group_id}') is not None
+        assert second.get_task_memberships(running)['task_groups'][0]['position'] == 1
+    finally:
+        scheduler.shutdown(wait=False)
+        second.store.close()
+
+
+def test_deleted_records_stay_deleted(tmp_path):
+    db_path = str(tmp_path / 'tasks.db')
+    first, _ = _open(db_path)
+    kept = first.create_task('kept', 'hello_world')['id']
+    removed = first.create_task('removed', 'hello_world')['id']
+    first.delete_task(removed)
+    first.store.close()
+
+    second, _ = _open(db_path)
+    second.restore()
+    assert set(second.tasks) == {kept}
+    second.store.close()
+
+
+def test_group_record_does_not_share_membership_list():
+    group = TaskGroup('g', 'g', ['a', 'b'])
+    record = group.to_record()
+    group.task_ids.append('c')
+    group.task_ids.reverse()
+    assert record['task_ids'] == ['a', 'b']
+
+
+class LockedConnection:
+    """BEGIN时报告数据库被锁定的连接"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *args):
+        if sql == 'BEGIN':
+            raise sqlite3.OperationalError('database is locked')
+        return self.conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_failed_begin_keeps_pending_records(tmp_path):
+    store = TaskStore(str(tmp_path / 'tasks.db'), flush_interval=3600)
+    store.save('tasks', 'a', {'task': {'id': 'a'}})
+    store.save('tasks', 'b', {'task': {'id': 'b'}})
+    conn = store._conn
+    store._conn = LockedConnection(conn)
+    assert store.flush() == 0
+
+    store._conn = conn
+    assert store.flush() == 2
+    assert sorted(record['task']['id'] for record in store.load_all()[0]) == ['a', 'b']
+    store.close()
@@ -0,0 +1,59 @@
+import os
+import tracemalloc
+
+import pytest
+
+from conftest import wait_for_run
+from profiling import cpu_profile_text, find_profile, remove_profile, run_profiled
+
+
+def build_table(rows):
+    return [list(range(10)) for _ in range(rows)]
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def test_cpu_profile_is_written_and_readable(tmp_path):
+    result, path = run_profiled('cpu', build_table, {'rows': 100}, 'r1', directory=str(tmp_path))
+    assert len(result) == 100
+    assert path == str(tmp_path / 'r1.prof')
+    assert find_profile('r1', str(tmp_path)) == (path, 'cpu')
+    assert 'build_table' in cpu_profile_text(path)
+
+
+def test_memory_profile_reports_peak_and_stops_tracing(tmp_path):
+    assert not tracemalloc.is_tracing()
+    result, path = run_profiled('memory', build_table, {'rows': 1000}, 'r2', directory=str(tmp_path))
+    assert len(result) == 1000
+    assert not tracemalloc.is_tracing()
+    with open(path, encoding='utf-8') as f:
+        report = f.read()
+    assert report.startswith('峰值内存: ')
+    assert 'test_profiling.py' in report
+    assert find_profile('r2', str(tmp_path)) == (path, 'memory')
+    remove_profile(path)
+    remove_profile(path)
+    assert find_profile('r2', str(tmp_path)) == (None, None)
+
+
+@pytest.mark.parametrize('mode', ['cpu', 'memory'])
+def test_failed_run_still_writes_profile(tmp_path, mode):
+    with pytest.raises(ValueError, match='boom'):
+        run_profiled(mode, fail, {'message': 'boom'}, 'r3', directory=str(tmp_path))
+    assert find_profile('r3', str(tmp_path))[1] == mode
+    with pytest.raises(ValueError):
+        run_profiled('disk', build_table, {'rows': 1}, 'r4', directory=str(tmp_path))
+
+
+def test_execute_now_with_profile(manager):
+    task_id = manager.create_task('t', 'hello_world')['id']
+    body, status = manager.execute_task_now(task_id, profile='cpu')
+    assert status == 202
+    handle = wait_for_run(manager, body['run_id'])
+    assert handle['status'] == 'success'
+    assert handle['profile'] == f"/api/runs/{body['run_id']}/profile"
+    path, mode = find_profile(body['run_id'])
+    assert mode == 'cpu' and os.path.exists(path)
+    assert manager.execute_task_now(task_id, profile='disk')[1] == 400
@@ -0,0 +1,86 @@
+import json
+
+
+def _query(manager, **kwargs):
+    return json.loads(manager.query_tasks(**kwargs))
+
+
+def _pages(manager, limit, **kwargs):
+    pages, cursor = [], None
+    while True:
+        body = _query(manager, limit=limit, cursor=cursor, **kwargs)
+        pages.append([task['name'] for task in body['tasks']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_cover_every_task_once(manager):
+    for index in range(10):
+        manager.create_task(f't{index}', 'hello_world')
+    names = [task['name'] for task in _query(manager)['tasks']]
+    assert sorted(names) == sorted(f't{index}' for index in range(10))
+
+    pages = _pages(manager, 3)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == names
+    # 最后一页恰好取完时不返回游标
+    assert [len(page) for page in _pages(manager, 5)] == [5, 5]
+
+
+def test_cursor_survives_inserts_and_deletes_between_pages(manager):
+    ids = [manager.create_task(f't{index}', 'hello_world')['id'] for index in range(6)]
+    first = _query(manager, limit=3)
+    assert [task['id'] for task in first['tasks']] == ids[:3]
+
+    # 游标是上一页最后一条记录的排序键，删除该记录或新增记录都不影响后续页
+    manager.delete_task(ids[2])
+    manager.delete_task(ids[3])
+    added = manager.create_task('new', 'hello_world')['id']
+    second = _query(manager, limit=3, cursor=first['next_cursor'])
+    assert [task['id'] for task in second['tasks']] == ids[4:] + [added]
+    assert second['next_cursor'] is None
+
+
+def test_filters_use_indexes_and_combine(manager):
+    a = manager.create_task('alpha-1', 'hello_world')['id']
+    b = manager.create_task('alpha-2', 'no_such_function')['id']
+    c = manager.create_task('beta-1', 'hello_world')['id']
+    manager.create_task('beta-2', 'no_such_function')
+    group_id = manager.create_task_group('g', [c, a])['id']
+    manager.start_task(a, {'interval': 3600})
+    manager.start_task(c, {'interval': 3600})
+
+    def names(**kwargs):
+        return [task['name'] for task in _query(manager, **kwargs)['tasks']]
+
+    assert names(status=['running']) == ['alpha-1', 'beta-1']
+    assert names(status=['running', 'created']) == names()
+    assert names(function=['no_such_function']) == ['alpha-2', 'beta-2']
+    assert names(name_prefix='alpha') == ['alpha-1', 'alpha-2']
+    assert names(status=['running'], name_prefix='beta') == ['beta-1']
+    assert names(function=['hello_world'], group_id=group_id) == ['alpha-1', 'beta-1']
+    assert names(status=['stopped']) == []
+
+    # 状态变化后索引随之更新
+    manager.stop_task(a)
+    manager.update_task(b, {'name': 'beta-3'})
+    assert names(status=['running']) == ['beta-1']
+    assert names(status=['stopped']) == ['alpha-1']
+    assert names(name_prefix='beta') == ['beta-3', 'beta-1', 'beta-2']
+    assert manager.query_tasks(group_id='missing')[1] == 404
+
+
+def test_field_projection(manager):
+    task_id = manager.create_task('t', 'hello_world', {'x': 1})['id']
+    full = _query(manager)
+    assert full['tasks'][0] == manager.get_task(task_id)
+    assert set(full) == {'tasks', 'version', 'epoch', 'next_cursor'}
+
+    projected = _query(manager, fields=['id', 'args'])
+    assert projected['tasks'] == [{'id': task_id, 'args': {'x': 1}}]
+    assert projected['version'] == full['version']
+
+    assert manager.query_tasks(fields=['id', 'secret'])[1] == 400
+    assert manager.query_tasks(limit=0)[1] == 400
+    assert manager.query_tasks(cursor='not-a-cursor')[1] == 400
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+import result_store
+from result_store import ResultStore, encode_result
+
+VALUE = 'x' * 38  # 序列化后40字节
+
+
+def _store(tmp_path, **kwargs):
+    kwargs.setdefault('compress_threshold', 1 << 20)
+    return ResultStore(directory=str(tmp_path / 'results'), **kwargs)
+
+
+def test_least_recently_read_result_spills_to_disk(tmp_path):
+    store = _store(tmp_path, memory_limit=100)
+    store.put('r1', VALUE)
+    store.put('r2', VALUE)
+    assert store.get('r1').data is not None
+    store.put('r3', VALUE)
+
+    assert store.memory_bytes() == 80
+    assert os.path.exists(store.path('r2'))
+    assert not os.path.exists(store.path('r1'))
+    spilled = store.get('r2')
+    assert spilled.data is None
+    assert spilled.read() == encode_result(VALUE)
+    assert store.disk_bytes() == os.path.getsize(store.path('r2'))
+
+
+def test_disk_cap_evicts_oldest_files_including_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, 'DIRECTORY_SCAN_INTERVAL', 0)
+    record_bytes = result_store._HEADER.size + len(encode_result(VALUE))
+    other = _store(tmp_path, memory_limit=0, disk_limit=10 * record_bytes)
+    for index in range(3):
+        other.put(f'foreign{index}', VALUE)
+        os.utime(other.path(f'foreign{index}'), (1000 + index, 1000 + index))
+
+    store = _store(tmp_path, memory_limit=0, disk_limit=4 * record_bytes)
+    # 启动时扫描到其他进程写入的文件
+    assert store.disk_bytes() == 3 * record_bytes
+    store.put('own0', VALUE)
+    store.put('own1', VALUE)
+
+    assert store.disk_bytes() == 4 * record_bytes
+    assert not os.path.exists(store.path('foreign0'))
+    assert store.get('foreign0') is None
+    assert store.get('foreign1').read() == encode_result(VALUE)
+    assert sorted(name[:-len('.result')] for name in os.listdir(store.directory)) == [
+        'foreign1', 'foreign2', 'own0', 'own1']
+
+
+def test_result_larger_than_disk_cap_is_not_saved(tmp_path):
+    store = _store(tmp_path, memory_limit=0, disk_limit=30)
+    assert store.put('r1', VALUE) is None
+    assert store.get('r1') is None
+
+
+def test_discard_removes_memory_disk_and_unscanned_files(tmp_path):
+    store = _store(tmp_path, memory_limit=50)
+    store.put('memory', VALUE)
+    store.put('disk', VALUE)
+    other = _store(tmp_path, memory_limit=0)
+    other.put('foreign', VALUE)
+
+    store.discard(['memory', 'disk', 'foreign', 'missing'])
+    assert store.memory_bytes() == 0
+    assert store.disk_bytes() == 0
+    assert os.listdir(store.directory) == []
+    assert 'memory' not in store and 'foreign' not in store
+
+
+@pytest.mark.parametrize('memory_limit', [1 << 20, 0])
+@pytest.mark.parametrize('compress_threshold', [10, 1 << 20])
+def test_range_reads_match_serialized_bytes(tmp_path, monkeypatch, memory_limit, compress_threshold):
+    monkeypatch.setattr(result_store, 'READ_CHUNK_SIZE', 64)
+    result = [{'index': index, 'text': '数据' * (index % 7)} for index in range(200)]
+    expected = encode_result(result)
+    store = _store(tmp_path, memory_limit=memory_limit, compress_threshold=compress_threshold)
+    assert store.put('r', result) == len(expected)
+
+    stored = store.get('r')
+    assert stored.compressed == (compress_threshold == 10)
+    assert stored.read() == expected
+    for start, stop in [(0, 1), (63, 65), (100, 1000), (len(expected) - 5, None), (len(expected), None)]:
+        assert stored.read(start, stop) == expected[start:stop]
+    assert all(len(chunk) <= 64 for chunk in stored.iter_range(10, 900))
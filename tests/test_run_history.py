@@ -0,0 +1,54 @@
+import pytest
+
+from run_history import RunHistory, percentile
+from task_store import TaskStore
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_stats_and_lag():
+    history = RunHistory(capacity=100)
+    for index in range(100):
+        # 耗时1..100毫秒，每10次有一次失败；前50次由调度器触发，延迟0..49毫秒
+        started = 1000.0 + index
+        history.record('t', f'r{index}', started - index / 1000 if index < 50 else started, started,
+                       started + (index + 1) / 1000, 'error' if index % 10 == 0 else 'success',
+                       source='schedule' if index < 50 else 'manual')
+
+    stats = history.get_stats('t')
+    assert stats['count'] == 100
+    assert stats['error_rate'] == pytest.approx(0.1)
+    assert stats['p50'] == pytest.approx(0.050)
+    assert stats['p99'] == pytest.approx(0.099)
+
+    lag = history.get_lag_stats('t')
+    assert lag['count'] == 50
+    assert lag['max'] == pytest.approx(0.049)
+    assert lag['p50'] == pytest.approx(0.024)
+
+
+def test_ring_keeps_latest_runs_and_deletes_evicted_rows(tmp_path):
+    store = TaskStore(str(tmp_path / 'tasks.db'), flush_interval=0)
+    history = RunHistory(capacity=3)
+    history.set_store(store)
+    for index in range(5):
+        history.record('t', f'r{index}', index, index, index + 1, 'success')
+
+    assert [run['run_id'] for run in history.get_runs('t')] == ['r4', 'r3', 'r2']
+    assert sorted(row['run_id'] for row in store.load_runs()) == ['r2', 'r3', 'r4']
+
+    reloaded = RunHistory(capacity=3)
+    reloaded.load(store.load_runs())
+    assert [run['run_id'] for run in reloaded.get_runs('t', limit=2)] == ['r4', 'r3']
+
+    assert history.forget('t') == ['r4', 'r3', 'r2']
+    assert history.get_runs('t') == []
+    assert store.load_runs() == []
+    store.close()
@@ -0,0 +1,82 @@
+import collections
+
+import pytest
+
+from sharding import HashRing, RunReportConsumer, ShardTable
+
+TTL = 10
+
+
+@pytest.fixture
+def table(tmp_path):
+    shard_table = ShardTable(str(tmp_path / 'tasks.db'))
+    yield shard_table
+    shard_table.close()
+
+
+def test_lease_is_exclusive_until_it_expires(table):
+    assert table.sync_leases('n1', {'a', 'b'}, now=100, ttl=TTL) == {'a', 'b'}
+    # 租约有效期内其他节点获取不到
+    assert table.sync_leases('n2', {'a'}, now=105, ttl=TTL) == set()
+    # 持有者续期后到期时间顺延
+    assert table.sync_leases('n1', {'a', 'b'}, now=108, ttl=TTL) == {'a', 'b'}
+    assert table.sync_leases('n2', {'a'}, now=115, ttl=TTL) == set()
+    # 持有者停止续期，过期后被接管
+    assert table.sync_leases('n2', {'a'}, now=119, ttl=TTL) == {'a'}
+    # 原持有者再次同步时只剩下没有被接管的租约
+    assert table.sync_leases('n1', {'a', 'b'}, now=120, ttl=TTL) == {'b'}
+
+
+def test_released_and_left_leases_are_taken_over_immediately(table):
+    table.sync_leases('n1', {'a', 'b'}, now=100, ttl=TTL)
+    assert table.sync_leases('n1', {'b'}, now=101, ttl=TTL) == {'b'}
+    assert table.sync_leases('n2', {'a'}, now=101, ttl=TTL) == {'a'}
+
+    table.heartbeat('n1', 101)
+    table.leave('n1')
+    assert table.sync_leases('n2', {'a', 'b'}, now=102, ttl=TTL) == {'a', 'b'}
+
+
+def test_live_nodes_follow_heartbeats(table):
+    table.heartbeat('n1', 100)
+    table.heartbeat('n2', 105)
+    assert table.live_nodes(now=106, ttl=TTL) == ['n1', 'n2']
+    assert table.live_nodes(now=112, ttl=TTL) == ['n2']
+
+
+def test_reports_are_taken_once_in_order(table):
+    table.add_reports([{'run_id': 'r1'}, {'run_id': 'r2'}])
+    table.add_reports([{'run_id': 'r3'}])
+    assert [report['run_id'] for report in table.take_reports(limit=2)] == ['r1', 'r2']
+    assert [report['run_id'] for report in table.take_reports()] == ['r3']
+    assert table.take_reports() == []
+
+
+def test_bad_report_does_not_discard_the_rest_of_the_batch(tmp_path):
+    applied = []
+
+    class Manager:
+        def apply_run_report(self, report):
+            if report['run_id'] == 'bad':
+                raise KeyError('owner_id')
+            applied.append(report['run_id'])
+
+    consumer = RunReportConsumer(Manager(), str(tmp_path / 'tasks.db'))
+    consumer.table.add_reports([{'run_id': 'r1'}, {'run_id': 'bad'}, {'run_id': 'r2'}])
+    assert consumer.consume() == 3
+    assert applied == ['r1', 'r2']
+    assert consumer.consume() == 0
+    consumer.table.close()
+
+
+def test_hash_ring_moves_only_the_leaving_nodes_keys():
+    keys = [f'task-{index}' for index in range(2000)]
+    before = HashRing(['n1', 'n2', 'n3'])
+    after = HashRing(['n1', 'n2'])
+    owners = {key: before.node_for(key) for key in keys}
+
+    assert set(collections.Counter(owners.values())) == {'n1', 'n2', 'n3'}
+    for key in keys:
+        if owners[key] != 'n3':
+            assert after.node_for(key) == owners[key]
+    assert HashRing([]).node_for('x') is None
@@ -0,0 +1,67 @@
+import datetime
+
+import pytest
+from apscheduler.triggers.interval import IntervalTrigger
+
+from simulator import SimulatedJob, _delay_stats, _demand, _simulate_pool, simulate
+
+
+def _job(owner_id, duration, grace_time=None):
+    return SimulatedJob(owner_id, 'task', None, duration, grace_time)
+
+
+def test_job_that_overruns_its_interval_skips_fires():
+    jobs = [_job('slow', 25)]
+    arrivals = [(float(fire_time), 0) for fire_time in range(0, 60, 10)]
+    pool = _simulate_pool(arrivals, jobs, 1, 0.0, 60.0)
+    # 0秒和30秒的运行各占用25秒，期间的触发被跳过，不排队也不算错过执行
+    assert pool['executed'] == 2
+    assert pool['skipped'] == 4
+    assert pool['missed'] == 0
+    assert pool['miss_rate'] == 0.0
+    assert pool['mean_concurrency'] == pytest.approx(50 / 60)
+    assert pool['queue_delay'] == {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    assert _demand(arrivals, jobs, 0.0, 60.0) == {'mean_concurrency': pytest.approx(50 / 60), 'peak_concurrency': 1}
+
+
+def test_saturated_pool_misses_runs_that_wait_past_grace_time():
+    jobs = [_job('a', 10, grace_time=5), _job('b', 10, grace_time=5), _job('c', 10)]
+    arrivals = [(0.0, 0), (0.0, 1), (0.0, 2), (5.0, 1)]
+    pool = _simulate_pool(arrivals, jobs, 1, 0.0, 100.0)
+    # b排队10秒超过容错时间被判定为错过，到原本开始执行的时间之前的触发被跳过；c不限容错时间，排队后执行
+    assert (pool['executed'], pool['missed'], pool['skipped']) == (2, 1, 1)
+    assert pool['miss_rate'] == 0.25
+    assert pool['utilization'] == pytest.approx(0.2)
+    assert pool['queue_delay']['max'] == 10
+    assert pool['queue_delay']['p50'] == 10
+    assert pool['queue_delay']['mean'] == pytest.approx(20 / 3)
+
+    wider = _simulate_pool(arrivals, jobs, 3, 0.0, 100.0)
+    assert (wider['executed'], wider['missed'], wider['skipped']) == (3, 0, 1)
+    assert wider['queue_delay']['max'] == 0.0
+    assert _demand(arrivals, jobs, 0.0, 100.0)['peak_concurrency'] == 3
+
+
+def test_delay_percentiles_count_zero_delay_runs():
+    assert _delay_stats([], 0) == {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    assert _delay_stats([], 3) == {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    stats = _delay_stats([1.0, 2.0, 3.0, 4.0, 5.0], 95)
+    assert stats == {'mean': 0.15, 'p50': 0.0, 'p95': 0.0, 'p99': 4.0, 'max': 5.0}
+    assert _delay_stats([1.0, 2.0, 3.0, 4.0], 96)['p99'] == 3.0
+    assert _delay_stats([7.0], 1)['p50'] == 0.0
+    assert _delay_stats([7.0], 0)['p50'] == 7.0
+
+
+def test_simulate_recommends_smallest_pool_without_misses():
+    start = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+    end = start + datetime.timedelta(minutes=1)
+    jobs = [SimulatedJob(f'j{index}', 'task', IntervalTrigger(seconds=10, start_date=start), 6, 1)
+            for index in range(3)]
+    result = simulate(jobs, [4, 1, 2, 2], start, end, max_runs=100)
+    assert result['fires'] == 18
+    assert [pool['pool_size'] for pool in result['pools']] == [1, 2, 4]
+    # 三个作业同时触发，排队6秒超过1秒的容错时间
+    assert [pool['missed'] for pool in result['pools']] == [12, 6, 0]
+    assert result['recommended_pool_size'] == 4
+    assert result['demand']['peak_concurrency'] == 3
+    assert simulate(jobs, [1], start, end, max_runs=17) is None
@@ -0,0 +1,185 @@
+import http.server
+import threading
+import time
+
+import pytest
+
+import metrics
+from single_flight import SingleFlight
+from task_manager import http_request
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.gate = threading.Event()
+        self.hits = []
+        self.hits_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/data'
+
+    def wait_hits(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.hits) < count:
+            assert time.monotonic() < deadline, f'服务器只收到{len(self.hits)}个请求'
+            time.sleep(0.01)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        with self.server.hits_lock:
+            self.server.hits.append((self.command, self.headers.get('X-Variant'), body))
+        self.server.gate.wait(10)
+        payload = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv('NO_PROXY', '127.0.0.1')
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    server = Server()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+def _start(results, **kwargs):
+    def call():
+        results.append(http_request(**kwargs))
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread
+
+
+def test_concurrent_identical_gets_send_one_request(server):
+    host = server.url.split('/')[2]
+    deduplicated = metrics.HTTP_REQUESTS_DEDUPLICATED.labels(host).value
+    results = []
+    threads = [_start(results, url=server.url, headers={'X-Variant': 'a'}, single_flight=True)]
+    server.wait_hits(1)
+    threads += [_start(results, url=server.url, headers={'x-variant': 'a'}, single_flight=True) for _ in range(4)]
+    # 等后到的调用进入等待
+    time.sleep(0.3)
+    server.gate.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(server.hits) == 1
+    assert len(results) == 5
+    assert all(result['status_code'] == 200 and result['content'] == '{"ok": true}' for result in results)
+    assert metrics.HTTP_REQUESTS_DEDUPLICATED.labels(host).value == deduplicated + 4
+    # 每个调用者拿到独立的结果副本
+    results[0]['headers']['X-Changed'] = '1'
+    assert all('X-Changed' not in result['headers'] for result in results[1:])
+
+    # 进行中的请求结束后不再合并
+    http_request(url=server.url, headers={'X-Variant': 'a'}, single_flight=True)
+    assert len(server.hits) == 2
+
+
+@pytest.mark.parametrize('first, second', [
+    ({'headers': {'X-Variant': 'a'}}, {'headers': {'X-Variant': 'b'}}),
+    ({'method': 'PUT', 'body': {'k': 1}}, {'method': 'PUT', 'body': {'k': 2}}),
+    ({'method': 'POST', 'body': {'k': 1}}, {'method': 'POST', 'body': {'k': 1}}),
+    ({'timeout': 30}, {'timeout': 29}),
+    ({}, {'single_flight': False}),
+])
+def test_requests_that_differ_or_are_not_idempotent_are_not_merged(server, first, second):
+    results = []
+    threads = [_start(results, url=server.url, **dict({'single_flight': True}, **first))]
+    server.wait_hits(1)
+    threads.append(_start(results, url=server.url, **dict({'single_flight': True}, **second)))
+    # 第一个请求仍在进行中，第二个请求同样到达服务器
+    server.wait_hits(2)
+    server.gate.set()
+    for thread in threads:
+        thread.join(10)
+    assert [result['status_code'] for result in results] == [200, 200]
+
+
+def test_single_flight_shares_result_only_while_in_flight():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return {'value': len(calls)}
+
+    outcomes = []
+    leader = threading.Thread(target=lambda: outcomes.append(flights.do('k', slow)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: outcomes.append(flights.do('k', slow))) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    other = flights.do('other', lambda: 'other')
+    time.sleep(0.2)
+    assert flights.in_flight() == 1
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(10)
+
+    assert other == ('other', False)
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert all(result == {'value': 1} for result, _ in outcomes)
+    assert flights.in_flight() == 0
+    assert flights.do('k', slow) == ({'value': 2}, False)
+
+
+def test_single_flight_propagates_errors_to_waiters():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(10)
+        raise ConnectionError('down')
+
+    errors = []
+
+    def call():
+        try:
+            flights.do('k', failing)
+        except ConnectionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert [str(error) for error in errors] == ['down'] * 3
+    # 失败后键被移除，下一次调用重新执行
+    assert flights.do('k', lambda: 'ok') == ('ok', False)
@@ -0,0 +1,85 @@
+import threading
+
+from conftest import wait_for_run
+from task_manager import TaskGroup
+
+HEADERS = {'X-Status': '${context:last_result.status_code}'}
+BODY = {'items': ['${context:last_result}'], 'fixed': 1}
+
+
+def test_resolving_http_args_leaves_template_untouched(manager):
+    task_id = manager.create_task('h', 'http_request', {
+        'url': 'http://127.0.0.1:1/', 'headers': dict(HEADERS), 'body': {'items': list(BODY['items']), 'fixed': 1},
+    })['id']
+    task = manager.tasks[task_id]
+    task_group = TaskGroup('g', 'g', [task_id])
+    task_group.set_context_value('last_result', {'status_code': 200})
+
+    args = manager._process_task_args(task, task_group)
+    assert args['headers'] == {'X-Status': 200}
+    assert args['body'] == {'items': [{'status_code': 200}], 'fixed': 1}
+    assert task.args['headers'] == HEADERS
+    assert task.args['body'] == BODY
+    assert manager.get_task(task_id)['args']['headers'] == HEADERS
+
+
+def test_group_run_does_not_rewrite_member_args(manager):
+    first = manager.create_task('first', 'hello_world', {'name': 'A'})['id']
+    template = {'name': {'prev': ['${context:last_result}']}}
+    second = manager.create_task('second', 'hello_world', {'name': {'prev': ['${context:last_result}']}})['id']
+    group_id = manager.create_task_group('g', [first, second])['id']
+
+    body, status = manager.execute_task_group_now(group_id)
+    assert status == 202
+    assert wait_for_run(manager, body['run_id'])['status'] == 'success'
+    assert manager.tasks[second].args == template
+    assert manager.get_task(second)['args'] == template
+
+
+def test_published_views_are_isolated_from_writes(manager):
+    task_id = manager.create_task('t', 'hello_world', {'name': 'A'})['id']
+    other = manager.create_task('o', 'hello_world')['id']
+    group_id = manager.create_task_group('g', [task_id])['id']
+    task_view = manager._task_views[task_id]
+    group_view = manager._group_views[group_id]
+    version = manager.version
+
+    manager.update_task(task_id, {'name': 'renamed', 'args': {'name': 'B'}})
+    manager.update_task_group(group_id, {'task_ids': [task_id, other]})
+    # 写入发布新的快照，之前拿到的快照保持不变
+    assert manager.version > version
+    assert (task_view.name, task_view.args) == ('t', {'name': 'A'})
+    assert group_view.task_ids == [task_id]
+    assert manager.get_task_group(group_id)['task_ids'] == [task_id, other]
+
+    # 修改返回的字典不会影响快照
+    returned = manager.get_task_group(group_id)
+    returned['task_ids'].append('x')
+    assert manager.get_task_group(group_id)['task_ids'] == [task_id, other]
+
+
+def test_reads_during_concurrent_writes(manager):
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                body = manager.get_all_tasks()
+                assert len(body['tasks']) == len({task['id'] for task in body['tasks']})
+            except Exception as error:
+                errors.append(error)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    task_ids = [manager.create_task(f't{index}', 'hello_world')['id'] for index in range(200)]
+    for task_id in task_ids[::2]:
+        manager.delete_task(task_id)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(manager.get_all_tasks()['tasks']) == 100
@@ -0,0 +1,117 @@
+import types
+
+import pytest
+
+import work_queue
+from work_queue import WorkQueue
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    work = WorkQueue(str(tmp_path / 'tasks.db'), visibility_timeout=30, max_attempts=3, retry_delay=5)
+    yield work
+    work.close()
+
+
+def test_acked_item_is_not_redelivered(queue, clock):
+    queue.enqueue('t1', 999.0)
+    queue.enqueue('t2', 999.5)
+    claimed = queue.claim('w1', limit=1)
+    assert [(owner_id, attempts) for _, owner_id, _, attempts in claimed] == [('t1', 1)]
+    # 已领取的请求在可见性超时内不会被其他工作进程领取
+    assert [owner_id for _, owner_id, _, _ in queue.claim('w2', limit=5)] == ['t2']
+
+    queue.complete(claimed[0][0], 'w1')
+    clock.now += 100
+    # 超时后只有未确认的t2被重新投递
+    assert [(owner_id, attempts) for _, owner_id, _, attempts in queue.claim('w3', limit=5)] == [('t2', 2)]
+
+
+def test_unacked_item_is_redelivered_after_visibility_timeout(queue, clock):
+    queue.enqueue('t1', 999.0)
+    item_id = queue.claim('w1')[0][0]
+    clock.now += 29
+    assert queue.claim('w2') == []
+    # 续期后可见性超时从续期时刻重新计算
+    queue.extend([item_id], 'w1')
+    clock.now += 29
+    assert queue.claim('w2') == []
+    clock.now += 2
+    assert queue.claim('w2') == [(item_id, 't1', 999.0, 2)]
+
+    # 超时后被接管，原工作进程的确认和续期不再生效
+    queue.complete(item_id, 'w1')
+    queue.extend([item_id], 'w1')
+    assert queue.stats()['in_flight'] == 1
+    queue.complete(item_id, 'w2')
+    assert queue.stats()['in_flight'] == 0
+
+
+def test_failed_item_backs_off_until_max_attempts(queue, clock):
+    queue.enqueue('t1', 999.0)
+    item_id, _, _, attempts = queue.claim('w1')[0]
+    assert queue.fail(item_id, 'w1', attempts, 'boom') is True
+    clock.now += 4.9
+    assert queue.claim('w1') == []
+    clock.now += 0.1
+    item_id, _, _, attempts = queue.claim('w1')[0]
+    assert attempts == 2
+
+    # 第二次重试等待时间翻倍
+    assert queue.fail(item_id, 'w1', attempts, 'boom') is True
+    clock.now += 9.9
+    assert queue.claim('w1') == []
+    clock.now += 0.1
+    item_id, _, _, attempts = queue.claim('w1')[0]
+    assert attempts == 3
+
+    assert queue.fail(item_id, 'w1', attempts, 'boom') is False
+    clock.now += 1000
+    assert queue.claim('w1') == []
+    stats = queue.stats(window=2000)
+    assert (stats['pending'], stats['in_flight'], stats['failed_last_window']) == (0, 0, 1)
+
+
+def test_item_that_keeps_losing_its_worker_is_failed(queue, clock):
+    queue.enqueue('t1', 999.0)
+    for attempt in range(1, 4):
+        claimed = queue.claim(f'w{attempt}')
+        assert [attempts for _, _, _, attempts in claimed] == [attempt]
+        # 工作进程崩溃，既没有确认也没有报告失败
+        clock.now += 31
+
+    assert queue.claim('w4') == []
+    stats = queue.stats(window=200)
+    assert (stats['pending'], stats['in_flight'], stats['failed_last_window']) == (0, 0, 1)
+    error = queue._conn.execute('SELECT error FROM work_queue').fetchone()[0]
+    assert error.startswith('工作进程丢失')
+
+
+def test_stats_report_backlog_and_throughput(queue, clock):
+    for index in range(4):
+        queue.enqueue(f't{index}', 999.0)
+    clock.now += 10
+    claimed = queue.claim('w1', limit=2)
+    for item_id, _, _, _ in claimed:
+        queue.complete(item_id, 'w1')
+
+    stats = queue.stats(window=10)
+    assert stats['pending'] == 2
+    assert stats['in_flight'] == 0
+    assert stats['oldest_wait'] == 10
+    assert stats['completed_per_sec'] == 0.2
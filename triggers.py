@@ -0,0 +1,306 @@
+import bisect
+import collections
+import datetime
+import hashlib
+import math
+import threading
+
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+# 错开间隔触发的相位时使用的固定起点，所有进程和重启前后的相位一致
+PHASE_ANCHOR = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+# 负载直方图中每个触发器最多展开的触发次数
+MAX_HISTOGRAM_FIRES = 100000
+
+# 触发时间缓存每次向后展开的最大触发次数，以及已经过去的触发时间超过多少个时重新展开
+FIRE_CHUNK_SIZE = 64
+MAX_STALE_FIRES = 1024
+
+
+def phase_offset(owner_id, window):
+    """根据任务/任务组ID的哈希值计算[0, window)秒内的固定偏移（毫秒精度）"""
+    if not window or window <= 0:
+        return 0.0
+    digest = hashlib.sha1(owner_id.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % int(window * 1000) / 1000
+
+
+def crontab_trigger(expr, start_date=None, end_date=None, timezone=None):
+    """按标准crontab表达式（分 时 日 月 周）创建触发器
+
+    CronTrigger.from_crontab()不接受开始和结束时间，这里按相同的方式拆分字段后直接构造。
+
+    Raises:
+        ValueError: 表达式字段数不正确或字段值无效
+    """
+    values = expr.split()
+    if len(values) != 5:
+        raise ValueError(f'需要5个字段，实际为{len(values)}个')
+    return CronTrigger(minute=values[0], hour=values[1], day=values[2], month=values[3],
+                       day_of_week=values[4], start_date=start_date, end_date=end_date, timezone=timezone)
+
+
+class ShiftedTrigger(BaseTrigger):
+    """把另一个触发器的所有触发时间推迟固定的秒数"""
+
+    def __init__(self, trigger, offset):
+        self.trigger = trigger
+        self.offset = datetime.timedelta(seconds=offset)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        previous = previous_fire_time - self.offset if previous_fire_time else None
+        next_time = self.trigger.get_next_fire_time(previous, now - self.offset)
+        if next_time is None:
+            return None
+        next_time += self.offset
+        end_date = getattr(self.trigger, 'end_date', None)
+        if end_date is not None and next_time > end_date:
+            return None
+        return next_time
+
+    def __str__(self):
+        return f'{self.trigger} +{self.offset.total_seconds():g}s'
+
+    def __repr__(self):
+        return f'<ShiftedTrigger ({self.trigger!r}, offset={self.offset.total_seconds():g})>'
+
+
+def _enumerate(trigger, first, end, limit=MAX_HISTOGRAM_FIRES):
+    """从第一次触发时间起展开end之前的所有触发时间（时间戳）"""
+    fires = []
+    fire_time = first
+    while fire_time is not None and len(fires) < limit:
+        timestamp = fire_time.timestamp()
+        if timestamp >= end:
+            break
+        fires.append(timestamp)
+        fire_time = trigger.get_next_fire_time(fire_time, fire_time)
+    return fires
+
+
+def load_histogram(jobs, start, window, bucket):
+    """统计一段时间内每个时间段预计的触发次数
+
+    同一间隔、落在同一时间段的间隔触发器，以及相同Cron表达式只是偏移不同的触发器，
+    只展开一次触发时间再乘以数量，大量相同配置的任务不会逐个展开。
+
+    Args:
+        jobs: (触发器, 下次触发时间)的可迭代对象
+        start: 统计的开始时间（aware datetime）
+        window: 统计的时长（秒）
+        bucket: 每个时间段的长度（秒）
+
+    Returns:
+        每个时间段的触发次数列表
+    """
+    start_ts = start.timestamp()
+    end_ts = start_ts + window
+    counts = [0] * math.ceil(window / bucket)
+    steps = collections.Counter()  # (间隔的时间段数, 第一次触发的时间段, 触发次数) -> 数量
+    shifted = collections.Counter()  # (基础触发器的键, 偏移秒数) -> 数量
+    bases = {}  # 基础触发器的键 -> (基础触发器, 最大偏移秒数)
+    singles = []  # 无法合并的触发器
+
+    for trigger, next_run in jobs:
+        if next_run is None or next_run.timestamp() >= end_ts:
+            continue
+        first = next_run.timestamp()
+        if isinstance(trigger, IntervalTrigger) and (trigger.interval_length / bucket).is_integer():
+            interval = trigger.interval_length
+            if first < start_ts:
+                first += math.ceil((start_ts - first) / interval) * interval
+            stop = end_ts if trigger.end_date is None else min(end_ts, trigger.end_date.timestamp() + 1e-6)
+            if first < stop:
+                steps[(int(interval // bucket), int((first - start_ts) // bucket),
+                       math.ceil((stop - first) / interval))] += 1
+        elif isinstance(trigger, (CronTrigger, ShiftedTrigger)):
+            base, offset = (trigger.trigger, trigger.offset.total_seconds()) \
+                if isinstance(trigger, ShiftedTrigger) else (trigger, 0.0)
+            key = (repr(base), base.start_date, base.end_date)
+            shifted[(key, offset)] += 1
+            max_offset = bases.get(key, (None, 0.0))[1]
+            bases[key] = (base, max(max_offset, offset))
+        elif isinstance(trigger, DateTrigger):
+            if first >= start_ts:
+                counts[int((first - start_ts) // bucket)] += 1
+        else:
+            singles.append((trigger, next_run))
+
+    for (step, first_bucket, fires), count in steps.items():
+        for index in range(first_bucket, min(first_bucket + fires * step, len(counts)), step):
+            counts[index] += count
+
+    base_fires = {}
+    for key, (base, max_offset) in bases.items():
+        base_start = start - datetime.timedelta(seconds=max_offset)
+        base_fires[key] = _enumerate(base, base.get_next_fire_time(None, base_start), end_ts)
+    for (key, offset), count in shifted.items():
+        for timestamp in base_fires[key]:
+            timestamp += offset
+            if start_ts <= timestamp < end_ts:
+                counts[int((timestamp - start_ts) // bucket)] += count
+
+    for trigger, next_run in singles:
+        for timestamp in _enumerate(trigger, next_run, end_ts):
+            if timestamp >= start_ts:
+                counts[int((timestamp - start_ts) // bucket)] += 1
+    return counts
+
+
+def expand_fire_times(triggers, start, end, limit):
+    """展开多个触发器在[start, end)内的触发时间
+
+    间隔触发器直接按间隔计算；相同Cron表达式只是偏移不同的触发器只展开一次再加上各自的偏移。
+
+    Args:
+        triggers: 触发器列表
+        start: 开始时间（aware datetime）
+        end: 结束时间（aware datetime）
+        limit: 每个触发器最多展开的触发次数
+
+    Returns:
+        与triggers一一对应的触发时间戳列表
+    """
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    results = [None] * len(triggers)
+    bases = {}  # 基础触发器的键 -> (基础触发器, 最大偏移秒数, [(下标, 偏移秒数)])
+    for index, trigger in enumerate(triggers):
+        if isinstance(trigger, IntervalTrigger):
+            first = trigger.get_next_fire_time(None, start)
+            if first is None:
+                results[index] = []
+                continue
+            first_ts = first.timestamp()
+            stop = end_ts if trigger.end_date is None else min(end_ts, trigger.end_date.timestamp() + 1e-6)
+            count = min(limit, max(0, math.ceil((stop - first_ts) / trigger.interval_length)))
+            results[index] = [first_ts + k * trigger.interval_length for k in range(count)]
+        elif isinstance(trigger, (CronTrigger, ShiftedTrigger)):
+            base, offset = (trigger.trigger, trigger.offset.total_seconds()) \
+                if isinstance(trigger, ShiftedTrigger) else (trigger, 0.0)
+            key = (repr(base), base.start_date, base.end_date)
+            _, max_offset, members = bases.get(key, (base, 0.0, []))
+            members.append((index, offset))
+            bases[key] = (base, max(max_offset, offset), members)
+        else:
+            results[index] = _enumerate(trigger, trigger.get_next_fire_time(None, start), end_ts, limit)
+
+    for base, max_offset, members in bases.values():
+        base_start = start - datetime.timedelta(seconds=max_offset)
+        fires = _enumerate(base, base.get_next_fire_time(None, base_start), end_ts, limit)
+        end_date = base.end_date.timestamp() if base.end_date is not None else math.inf
+        for index, offset in members:
+            shifted = [timestamp + offset for timestamp in fires]
+            results[index] = [timestamp for timestamp in shifted
+                              if start_ts <= timestamp < end_ts and timestamp <= end_date][:limit]
+    return results
+
+
+def trigger_key(trigger):
+    """由触发器的配置得到缓存键，配置相同的触发器（如相同的Cron表达式）共用一个键
+
+    Returns:
+        缓存键，不支持的触发器类型返回None
+    """
+    if isinstance(trigger, IntervalTrigger):
+        return ('interval', trigger.interval_length, trigger.start_date, trigger.end_date)
+    if isinstance(trigger, CronTrigger):
+        return ('cron', repr(trigger), trigger.start_date, trigger.end_date)
+    if isinstance(trigger, ShiftedTrigger):
+        base = trigger_key(trigger.trigger)
+        return None if base is None else ('shifted', base, trigger.offset)
+    if isinstance(trigger, DateTrigger):
+        return ('date', trigger.run_date)
+    return None
+
+
+class _FireSeries:
+    """一个触发器从某个时间起按顺序展开的触发时间，需要更多时按块向后展开"""
+
+    __slots__ = ('trigger', 'start', 'fires', 'next_time', 'lock')
+
+    def __init__(self, trigger, start):
+        self.trigger = trigger
+        self.start = start.timestamp()
+        self.fires = []  # 只追加，读取时不需要加锁
+        self.next_time = trigger.get_next_fire_time(None, start)
+        self.lock = threading.Lock()
+
+    def extend(self, size):
+        """再展开最多size个触发时间
+
+        Returns:
+            是否还有更多的触发时间
+        """
+        with self.lock:
+            fire_time = self.next_time
+            if fire_time is None:
+                return False
+            if isinstance(self.trigger, IntervalTrigger):
+                interval = self.trigger.interval_length
+                first = fire_time.timestamp()
+                count = size
+                if self.trigger.end_date is not None:
+                    end = self.trigger.end_date.timestamp()
+                    count = min(size, max(0, math.ceil((end + 1e-6 - first) / interval)))
+                self.fires.extend(first + k * interval for k in range(count))
+                self.next_time = fire_time + datetime.timedelta(seconds=interval * count) if count == size else None
+                return True
+            for _ in range(size):
+                if fire_time is None:
+                    break
+                self.fires.append(fire_time.timestamp())
+                fire_time = self.trigger.get_next_fire_time(fire_time, fire_time)
+            self.next_time = fire_time
+            return True
+
+
+class FireTimeCache:
+    """按触发器配置缓存展开后的触发时间
+
+    缓存键由触发器本身的配置得到（trigger_key），任务的触发器配置修改或重新启动后
+    得到的是新的键，不会读到旧配置的触发时间；不再使用的键按LRU顺序淘汰。
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # 缓存键 -> _FireSeries
+        self._lock = threading.Lock()
+
+    def _series(self, trigger, start):
+        key = trigger_key(trigger)
+        if key is None:
+            return _FireSeries(trigger, start)
+        start_ts = start.timestamp()
+        with self._lock:
+            series = self._entries.get(key)
+            # 缓存的时间段从更晚的时间开始，或还没有展开到开始时间（请求指定了未来的开始时间），
+            # 或已经过去的触发时间过多时重新展开
+            next_time = series.next_time if series is not None else None
+            if series is None or series.start > start_ts \
+                    or next_time is not None and next_time.timestamp() < start_ts \
+                    or bisect.bisect_left(series.fires, start_ts) > MAX_STALE_FIRES:
+                series = self._entries[key] = _FireSeries(trigger, start)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return series
+
+    def iter_fires(self, trigger, start):
+        """按顺序产生不早于start的触发时间（时间戳），按需向后展开"""
+        series = self._series(trigger, start)
+        position = bisect.bisect_left(series.fires, start.timestamp())
+        while True:
+            if position < len(series.fires):
+                yield series.fires[position]
+                position += 1
+            # 第一次只展开一个，之后逐次加倍，合并大量触发器时只为实际用到的时间付出计算
+            elif not series.extend(min(FIRE_CHUNK_SIZE, max(1, len(series.fires)))):
+                return
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
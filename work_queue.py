@@ -0,0 +1,270 @@
+import concurrent.futures
+import logging
+import sqlite3
+import threading
+import time
+
+from sharding import ReportSink, ShardTable
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """基于SQLite的持久化工作队列
+
+    调度器触发时写入运行请求，工作进程领取后在可见性超时内执行。领取的请求
+    在超时前没有完成（工作进程崩溃或卡住）会重新变为可领取；执行失败的请求
+    按指数退避重试，超过最大次数后标记为失败。完成的请求保留一段时间用于
+    计算吞吐量。
+    """
+
+    def __init__(self, db_path, visibility_timeout=300, max_attempts=3, retry_delay=5, retention=600):
+        """
+        Args:
+            db_path: SQLite数据库文件路径（可与任务数据库相同）
+            visibility_timeout: 领取后的可见性超时（秒），工作进程执行期间会定期续期
+            max_attempts: 最大执行次数
+            retry_delay: 第一次重试的等待时间（秒），之后每次翻倍
+            retention: 已完成请求的保留时间（秒）
+        """
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS work_queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, owner_id TEXT NOT NULL, scheduled REAL NOT NULL, '
+            "enqueued REAL NOT NULL, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+            'visible_at REAL NOT NULL, claimed_by TEXT, finished_at REAL, error TEXT)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS work_queue_ready ON work_queue (status, visible_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS work_queue_finished ON work_queue (finished_at)')
+        self._lock = threading.Lock()
+        self._last_purge = 0
+
+    def enqueue(self, owner_id, scheduled):
+        """写入一个运行请求
+
+        Args:
+            owner_id: 任务ID或任务组ID
+            scheduled: 计划执行时间（时间戳）
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO work_queue (owner_id, scheduled, enqueued, visible_at) VALUES (?, ?, ?, ?)',
+                (owner_id, scheduled, now, now)
+            )
+
+    def claim(self, worker_id, limit=1):
+        """领取可执行的运行请求（待执行的，或领取后超时未完成的）
+
+        领取后超时未完成、且已达到最大执行次数的请求（工作进程在执行时崩溃或被杀死）
+        不再重新投递，在同一事务中标记为失败，否则会导致工作进程反复崩溃。
+
+        Returns:
+            [(请求ID, 任务/任务组ID, 计划执行时间, 已执行次数)]
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    "UPDATE work_queue SET status = 'failed', finished_at = ?, error = ? "
+                    "WHERE status = 'claimed' AND visible_at <= ? AND attempts >= ?",
+                    (now, '工作进程丢失：领取后超时未完成，已达到最大执行次数', now, self.max_attempts)
+                )
+                rows = self._conn.execute(
+                    "SELECT id, owner_id, scheduled, attempts FROM work_queue "
+                    "WHERE status IN ('pending', 'claimed') AND visible_at <= ? ORDER BY id LIMIT ?",
+                    (now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE work_queue SET status = 'claimed', claimed_by = ?, attempts = attempts + 1, "
+                        "visible_at = ? WHERE id = ?",
+                        [(worker_id, now + self.visibility_timeout, row[0]) for row in rows]
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(item_id, owner_id, scheduled, attempts + 1) for item_id, owner_id, scheduled, attempts in rows]
+
+    def extend(self, item_ids, worker_id):
+        """为仍在执行的请求续期可见性超时"""
+        if not item_ids:
+            return
+        visible_at = time.time() + self.visibility_timeout
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE work_queue SET visible_at = ? WHERE id = ? AND status = 'claimed' AND claimed_by = ?",
+                [(visible_at, item_id, worker_id) for item_id in item_ids]
+            )
+
+    def complete(self, item_id, worker_id):
+        """标记请求执行完成"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE work_queue SET status = 'done', finished_at = ? WHERE id = ? AND claimed_by = ?",
+                (time.time(), item_id, worker_id)
+            )
+        self._purge()
+
+    def fail(self, item_id, worker_id, attempts, error):
+        """标记请求执行失败，未超过最大次数时退避后重试
+
+        Returns:
+            是否会重试
+        """
+        now = time.time()
+        retry = attempts < self.max_attempts
+        with self._lock:
+            if retry:
+                self._conn.execute(
+                    "UPDATE work_queue SET status = 'pending', visible_at = ?, error = ? WHERE id = ? AND claimed_by = ?",
+                    (now + self.retry_delay * 2 ** (attempts - 1), error, item_id, worker_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE work_queue SET status = 'failed', finished_at = ?, error = ? WHERE id = ? AND claimed_by = ?",
+                    (now, error, item_id, worker_id)
+                )
+        self._purge()
+        return retry
+
+    def _purge(self):
+        """清理超过保留时间的已完成和失败请求（最多每分钟一次）"""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        with self._lock:
+            self._conn.execute('DELETE FROM work_queue WHERE finished_at < ?', (now - self.retention,))
+
+    def stats(self, window=60):
+        """队列统计
+
+        Args:
+            window: 计算吞吐量的时间窗口（秒）
+
+        Returns:
+            包含待执行数、执行中数、失败数、最早请求的等待时间和吞吐量的字典
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM work_queue WHERE status IN ('pending', 'claimed') GROUP BY status"))
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued) FROM work_queue WHERE status IN ('pending', 'claimed')").fetchone()[0]
+            done, failed = self._conn.execute(
+                "SELECT COALESCE(SUM(status = 'done'), 0), COALESCE(SUM(status = 'failed'), 0) "
+                "FROM work_queue WHERE finished_at >= ?", (now - window,)).fetchone()
+        return {
+            'pending': counts.get('pending', 0),
+            'in_flight': counts.get('claimed', 0),
+            'oldest_wait': round(now - oldest, 3) if oldest else 0,
+            'completed_per_sec': round(done / window, 3),
+            'failed_last_window': failed,
+            'window': window
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueueWorker:
+    """工作进程：从工作队列领取运行请求并执行
+
+    任务定义从共享数据库读取（数据库版本变化时重新加载），运行结果写入上报表，
+    由运行API的主进程合并到任务状态和运行历史中。
+    """
+
+    def __init__(self, task_manager, store, work_queue, worker_id, threads=4, poll_interval=0.5):
+        """
+        Args:
+            task_manager: 工作进程自己的TaskManager（不设置持久化存储）
+            store: 共享的TaskStore，只用于读取任务定义
+            work_queue: WorkQueue对象
+            worker_id: 工作进程ID
+            threads: 同时执行的请求数
+            poll_interval: 队列为空时的轮询间隔（秒）
+        """
+        self.task_manager = task_manager
+        self.store = store
+        self.work_queue = work_queue
+        self.worker_id = worker_id
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.reports = ShardTable(store.db_path)
+        self._sink = ReportSink()
+        self.task_manager.run_history.set_store(self._sink)
+        # 结果直接写入磁盘，API进程按运行ID从同一目录读取
+        self.task_manager.results.memory_limit = 0
+        self._pool = concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix='QueueWorker')
+        self._in_flight = {}  # 请求ID -> Future
+        self._data_version = None
+        self._last_extend = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        """循环领取并执行运行请求，直到stop()被调用"""
+        logger.info(f"工作进程 {self.worker_id} 已启动，并发数 {self.threads}")
+        try:
+            while not self._stopped.is_set():
+                self._refresh()
+                self._reap()
+                claimed = []
+                free = self.threads - len(self._in_flight)
+                if free > 0:
+                    claimed = self.work_queue.claim(self.worker_id, free)
+                    for item in claimed:
+                        self._in_flight[item[0]] = self._pool.submit(self._execute, *item)
+                if time.monotonic() - self._last_extend > self.work_queue.visibility_timeout / 3:
+                    self.work_queue.extend(list(self._in_flight), self.worker_id)
+                    self._last_extend = time.monotonic()
+                self._flush_reports()
+                if not claimed:
+                    self._stopped.wait(self.poll_interval)
+        finally:
+            # 等待执行中的请求完成，未领取的请求留给其他工作进程
+            self._pool.shutdown(wait=True)
+            self._reap()
+            self._flush_reports()
+            self.reports.close()
+            logger.info(f"工作进程 {self.worker_id} 已退出")
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh(self):
+        version = self.store.data_version()
+        if version != self._data_version:
+            self.task_manager.load_snapshot(self.store, include_runs=False)
+            self._data_version = version
+
+    def _reap(self):
+        for item_id in [item_id for item_id, future in self._in_flight.items() if future.done()]:
+            del self._in_flight[item_id]
+
+    def _flush_reports(self):
+        reports = self._sink.drain()
+        if reports:
+            self.reports.add_reports(reports)
+
+    def _execute(self, item_id, owner_id, scheduled, attempts):
+        try:
+            error = self.task_manager.execute_queued(owner_id, scheduled)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if error is None:
+            self.work_queue.complete(item_id, self.worker_id)
+        elif self.work_queue.fail(item_id, self.worker_id, attempts, error):
+            logger.warning(f"运行请求 {item_id}（{owner_id}）第 {attempts} 次执行失败，稍后重试: {error}")
+        else:
+            logger.error(f"运行请求 {item_id}（{owner_id}）执行 {attempts} 次均失败: {error}")